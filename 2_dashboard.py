@@ -3,28 +3,34 @@
 # 新增：系主任一頁式（競品Top5、決策問題Top10、內容缺口、下月行動清單）+ 原戰情室 + Prompt 注入
 
 import os
-import re
 import json
-import hashlib
 from collections import Counter
-from urllib.parse import urlparse
 
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
-
-# ---- 可選：requests / bs4（深度解析用）----
-try:
-    import requests
-    HAS_REQUESTS = True
-except ImportError:
-    HAS_REQUESTS = False
-
-try:
-    from bs4 import BeautifulSoup
-    HAS_BS4 = True
-except ImportError:
-    HAS_BS4 = False
+import plotly.io as pio
+
+from geo_utils import safe_str, clip_text, domain_of, _dedup_keep_order
+from deep_analysis import (
+    HAS_REQUESTS,
+    get_domain_health,
+    humanize_number_output,
+    build_rational_citation_paragraphs,
+)
+from fetch_engine import FetchEngine
+from batch_deep import run_batch, summary_table
+from data_loader import (DATA_FILE, dept_colleges, dept_digests, diff_manifests, file_version, load_manifest,
+                         load_school_data, previous_manifest, sidecar_path)
+from filter_index import FilterIndex
+from competitors import CompetitorIndex
+from aggregates import AggregateStore, prefer_volume_col, volume_label
+from onepager_export import build_onepager_markdown, export_onepagers_zip
+from keyword_index import KeywordIndex, cache_files_version, load_keyword_index
+from keyword_clusters import cluster_summary
+from url_index import UrlIndex
+from profiler import Profiler, bind, run_table, stage
 
 
 # =========================
@@ -32,71 +38,16 @@ except ImportError:
 # =========================
 st.set_page_config(page_title="全台招生 GEO/AI 戰情室", layout="wide")
 
-CACHE_DIR = "serp_cache"
-os.makedirs(CACHE_DIR, exist_ok=True)
-
-HEADERS = {
-    "User-Agent": (
-        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"
-    ),
-    "Accept-Language": "zh-TW,zh;q=0.9,en;q=0.6",
-}
-
-FAQ_HINTS = ["常見問題", "FAQ", "問答", "Q&A", "QA", "問題"]
-SELF_BRAND_TOKENS = ["中華醫事", "華醫", "中華醫事科技大學"]
+# 分段計時（profiler.py）：側欄「效能剖析」打開才記錄；關閉時每個 stage 只多一次 contextvar 查詢
+if "_profiler" not in st.session_state:
+    st.session_state["_profiler"] = Profiler()
+profiler = st.session_state["_profiler"]
+profiler.begin(enabled=bool(st.session_state.get("prof_on", False)))
 
 
 # =========================
 # 1) 工具函數
 # =========================
-def safe_str(x, default="無"):
-    if x is None:
-        return default
-    s = str(x)
-    return s if s.strip() else default
-
-def clip_text(s, n=180):
-    s = safe_str(s, "")
-    return (s[:n] + "…") if len(s) > n else s
-
-def domain_of(url: str) -> str:
-    try:
-        return urlparse(url).netloc.lower()
-    except Exception:
-        return ""
-
-def _dedup_keep_order(items, max_n=10):
-    seen = set()
-    out = []
-    for x in items:
-        x = str(x).strip()
-        if not x or x in seen:
-            continue
-        out.append(x)
-        seen.add(x)
-        if len(out) >= max_n:
-            break
-    return out
-
-def _to_int_safe(s):
-    try:
-        return int(s)
-    except Exception:
-        return None
-
-def _to_float_safe(s):
-    try:
-        return float(s)
-    except Exception:
-        return 0.0
-
-def prefer_volume_col(scope_df: pd.DataFrame) -> str:
-    """優先用 Trends_Score（新版主要指標），沒有再 fallback Search_Volume"""
-    if "Trends_Score" in scope_df.columns and scope_df["Trends_Score"].sum() > 0:
-        return "Trends_Score"
-    return "Search_Volume"
-
 def source_tag(s: str) -> str:
     s = safe_str(s, "無").lower()
     if s == "autocomplete":
@@ -137,650 +88,127 @@ gsc_df = load_optional_csv(GSC_FILE)
 
 # =========================
 # 3) 深度解析（可選）：抓 Top3 頁面，挖「數字線索」與「結構」
+#    解析邏輯在 deep_analysis.py；這裡只保留一個跨 session 共用的抓取引擎
 # =========================
-def cache_key(url: str) -> str:
-    return hashlib.md5(url.encode("utf-8")).hexdigest()
-
-def load_cached_page(url: str):
-    fp = os.path.join(CACHE_DIR, cache_key(url) + ".json")
-    if os.path.exists(fp):
-        try:
-            with open(fp, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception:
-            return None
-    return None
-
-def save_cached_page(url: str, data: dict):
-    fp = os.path.join(CACHE_DIR, cache_key(url) + ".json")
-    try:
-        with open(fp, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-    except Exception:
-        pass
-
-def fetch_html(url: str, timeout=10) -> str:
-    if not HAS_REQUESTS:
-        return ""
-    try:
-        r = requests.get(url, headers=HEADERS, timeout=timeout, allow_redirects=True)
-        ct = (r.headers.get("Content-Type") or "").lower()
-        if r.status_code >= 400:
-            return ""
-        if "text/html" not in ct and "application/xhtml" not in ct:
-            return ""
-        return r.text or ""
-    except Exception:
-        return ""
-
-NUM_PATTERN = r"\d+(?:\.\d+)?%?"
-MONEY_PATTERN = r"(\d+(?:\.\d+)?)(\s*萬|\s*元|\s*[kK])"
-RANGE_PATTERN = r"(\d+(?:\.\d+)?)[\s]*[~～\-–—][\s]*(\d+(?:\.\d+)?)"
-
-KW_SALARY = ["薪", "薪資", "月薪", "年薪", "起薪", "待遇", "元", "萬", "k", "K"]
-KW_SCORE = ["分數", "級分", "錄取", "門檻", "最低", "統測", "繁星", "甄選", "落點", "PR", "倍率", "級距"]
-KW_CREDITS = ["學分", "必修", "選修", "總學分", "畢業學分", "課程地圖", "課表"]
-KW_PASS = ["及格", "通過", "合格", "及格率", "通過率", "合格率", "錄取率", "國考", "證照", "考科"]
-
-def classify_number_clues(text: str) -> dict:
-    clues = {"salary": [], "score": [], "credits": [], "passrate": []}
-    if not text:
-        return clues
-    t = text.replace("％", "%")
-
-    for m in re.finditer(NUM_PATTERN, t):
-        val = m.group(0)
-        s = max(0, m.start() - 26)
-        e = min(len(t), m.end() + 26)
-        ctx = t[s:e].strip()
-        if len(ctx) > 95:
-            ctx = ctx[:95] + "…"
-
-        if ("%" in val or "%" in ctx) and any(k in ctx for k in KW_PASS):
-            clues["passrate"].append(ctx)
-            continue
-        if any(k in ctx for k in KW_CREDITS) or ("學分" in ctx):
-            clues["credits"].append(ctx)
-            continue
-        if any(k in ctx for k in KW_SALARY):
-            clues["salary"].append(ctx)
-            continue
-        if any(k in ctx for k in KW_SCORE):
-            clues["score"].append(ctx)
-            continue
-
-    for k in clues:
-        clues[k] = _dedup_keep_order(clues[k], max_n=12)
-    return clues
-
-def _normalize_money(num_str, unit):
-    try:
-        x = float(num_str)
-    except Exception:
-        return None
-    u = unit.lower()
-    if "萬" in u:
-        return int(x * 10000)
-    if "k" in u:
-        return int(x * 1000)
-    if "元" in u:
-        return int(x)
-    return None
-
-def summarize_salary(clues_salary: list) -> dict:
-    if not clues_salary:
-        return {"found": False, "type": "無", "range": None, "points": [], "note": ""}
-
-    types = {"月薪": 0, "年薪": 0, "起薪": 0}
-    ranges = []
-    points = []
-
-    for ctx in clues_salary[:12]:
-        points.append(ctx)
-        for t in types:
-            if t in ctx:
-                types[t] += 1
-
-        rm = re.search(RANGE_PATTERN, ctx)
-        if rm and any(k in ctx for k in ["萬", "元", "k", "K", "薪", "月薪", "年薪", "起薪"]):
-            a, b = rm.group(1), rm.group(2)
-            unit = "元" if "元" in ctx else ("萬" if "萬" in ctx else ("k" if ("k" in ctx or "K" in ctx) else "元"))
-            va = _normalize_money(a, unit)
-            vb = _normalize_money(b, unit)
-            if va and vb:
-                lo, hi = min(va, vb), max(va, vb)
-                if 15000 <= lo <= 200000 and 15000 <= hi <= 200000:
-                    ranges.append((lo, hi, ctx))
-
-    best_type = max(types, key=lambda k: types[k])
-    if types[best_type] == 0:
-        best_type = "薪資"
-
-    summary_range = None
-    if ranges:
-        lo, hi, _ = ranges[0]
-        summary_range = (lo, hi)
-
-    return {
-        "found": True,
-        "type": best_type,
-        "range": summary_range,
-        "points": _dedup_keep_order(points, max_n=6),
-        "note": "用『區間 + 年資/職務』寫法最像人，也最不容易被質疑。"
-    }
-
-def summarize_score(clues_score: list) -> dict:
-    if not clues_score:
-        return {"found": False, "points": [], "note": ""}
-    points = _dedup_keep_order(clues_score, max_n=6)
-    return {
-        "found": True,
-        "points": points,
-        "note": "門檻會浮動，最穩的寫法是『近 2–3 年區間』＋標註入學管道＋引用官方簡章。"
-    }
-
-def summarize_credits(clues_credits: list) -> dict:
-    if not clues_credits:
-        return {"found": False, "total": None, "required": None, "elective": None, "points": [], "note": ""}
-
-    text = " ".join(clues_credits[:10])
-    total = required = elective = None
-    m_total = re.search(r"(總學分|畢業學分)[^\d]{0,6}(\d{2,3})", text)
-    if m_total:
-        total = _to_int_safe(m_total.group(2))
-    m_req = re.search(r"(必修)[^\d]{0,6}(\d{2,3})", text)
-    if m_req:
-        required = _to_int_safe(m_req.group(2))
-    m_ele = re.search(r"(選修)[^\d]{0,6}(\d{2,3})", text)
-    if m_ele:
-        elective = _to_int_safe(m_ele.group(2))
-
-    return {
-        "found": True,
-        "total": total,
-        "required": required,
-        "elective": elective,
-        "points": _dedup_keep_order(clues_credits, max_n=6),
-        "note": "學分/課程用『課程地圖 + 表格』呈現最有效，並標註來源（系網/課程系統）。"
-    }
-
-def summarize_passrate(clues_pass: list) -> dict:
-    if not clues_pass:
-        return {"found": False, "rates": [], "points": [], "note": ""}
-    points = _dedup_keep_order(clues_pass, max_n=6)
-    rates = []
-    for ctx in points:
-        for p in re.findall(r"\d+(?:\.\d+)?%", ctx):
-            rates.append(p)
-    rates = _dedup_keep_order(rates, max_n=6)
-    return {
-        "found": True,
-        "rates": rates,
-        "points": points,
-        "note": "通過率/及格率要交代『年份、口徑、母數』並標註來源（考選部/校方公開成果）。"
-    }
-
-def humanize_number_output(agg_clues: dict) -> dict:
-    return {
-        "salary": summarize_salary(agg_clues.get("salary", [])),
-        "score": summarize_score(agg_clues.get("score", [])),
-        "credits": summarize_credits(agg_clues.get("credits", [])),
-        "passrate": summarize_passrate(agg_clues.get("passrate", [])),
-    }
-
-def build_rational_citation_paragraphs(human: dict) -> str:
-    paras = []
-
-    sal = human.get("salary", {})
-    if sal.get("found"):
-        r = sal.get("range")
-        if r:
-            lo, hi = r
-            lo_w = round(lo / 10000, 1)
-            hi_w = round(hi / 10000, 1)
-            line = f"薪資不要寫成單點：比較像人會寫的方式是『區間』，大概 **{lo_w}～{hi_w} 萬/月**（依地區、班別、職務而動）。"
-        else:
-            line = "薪資建議用『區間 + 年資/職務』描述，避免單一數字造成誤解。"
-
-        paras.append(
-            "### 薪資（建議引用段落）\n"
-            f"{line}\n"
-            "- **引用建議**：104 職缺薪資區間、醫院/機構徵才公告（註明年份/職務）。"
-        )
-
-    sc = human.get("score", {})
-    if sc.get("found"):
-        paras.append(
-            "### 分數/門檻（建議引用段落）\n"
-            "錄取門檻每年會動，最穩的寫法是：**整理近 2–3 年區間**，並標註『入學管道』（統測分發/甄選/繁星）。\n"
-            "- **引用建議**：官方招生簡章、分發/甄選入學公告。"
-        )
+@st.cache_resource(show_spinner=False)
+def get_fetch_engine() -> FetchEngine:
+    return FetchEngine(max_workers=8, per_host=2, timeout=10)
 
-    cr = human.get("credits", {})
-    if cr.get("found"):
-        t = cr.get("total")
-        req = cr.get("required")
-        ele = cr.get("elective")
-        rows = []
-        if t: rows.append(f"- 畢業總學分：{t}")
-        if req: rows.append(f"- 必修：{req}")
-        if ele: rows.append(f"- 選修：{ele}")
-        detail = "\n".join(rows) if rows else "- 建議直接貼『學分結構表 + 課程地圖』，讀者會更安心。"
-
-        paras.append(
-            "### 學分/課程（建議引用段落）\n"
-            "課程資訊用表格最清楚：把『學分結構』＋『年級學習路徑』講清楚。\n"
-            f"{detail}\n"
-            "- **引用建議**：系網課程規劃、課程查詢系統、招生簡章附錄。"
-        )
 
-    pr = human.get("passrate", {})
-    if pr.get("found"):
-        rates = pr.get("rates") or []
-        rate_line = "片段出現的 % 包含：" + "、".join(rates) + "（仍需核對年份與口徑）。" if rates else \
-                    "若要寫通過率/及格率，務必補齊年份與來源，否則容易被質疑。"
-
-        paras.append(
-            "### 國考/證照通過率（建議引用段落）\n"
-            f"{rate_line}\n"
-            "- **引用建議**：考選部/官方公告、校方公開成果（附年份/母數）。"
-        )
-
-    if not paras:
-        return (
-            "### 建議引用段落（通用）\n"
-            "如果 Top3 缺少可查證數據，建議用『官方來源 + 表格整理 + FAQ』補齊，文章更容易被 AI 摘錄。"
-        )
-
-    return "\n\n".join(paras)
-
-@st.cache_data(show_spinner=False)
-def parse_competitor_page(url: str) -> dict:
-    cached = load_cached_page(url)
-    if cached:
-        return cached
-
-    html = fetch_html(url)
-    if not html:
-        data = {"url": url, "ok": 0, "reason": "fetch_failed"}
-        save_cached_page(url, data)
-        return data
-
-    # 沒 bs4 → 退化版
-    if not HAS_BS4:
-        text = re.sub(r"<script[\s\S]*?</script>", " ", html, flags=re.I)
-        text = re.sub(r"<style[\s\S]*?</style>", " ", text, flags=re.I)
-        text = re.sub(r"<[^>]+>", " ", text)
-        text = re.sub(r"\s+", " ", text).strip()
-
-        has_faq = 1 if any(h.lower() in text.lower() for h in FAQ_HINTS) else 0
-        number_clues = classify_number_clues(text)
-
-        data = {
-            "url": url, "ok": 1,
-            "title": "", "meta_desc": "",
-            "h1": "", "h2": [], "h3": [],
-            "has_table": 0,
-            "has_list": 0,
-            "has_faq": has_faq,
-            "number_clues": number_clues,
-            "bullets": [],
-            "text_preview": text[:900],
-        }
-        save_cached_page(url, data)
-        return data
-
-    soup = BeautifulSoup(html, "html.parser")
-    for tag in soup(["script", "style", "noscript"]):
-        tag.decompose()
-
-    title = soup.title.get_text(strip=True) if soup.title else ""
-    meta = soup.find("meta", attrs={"name": "description"})
-    meta_desc = meta.get("content", "").strip() if meta else ""
-
-    h1_tag = soup.find("h1")
-    h1 = h1_tag.get_text(" ", strip=True) if h1_tag else ""
-    h2 = [x.get_text(" ", strip=True) for x in soup.find_all("h2")][:25]
-    h3 = [x.get_text(" ", strip=True) for x in soup.find_all("h3")][:25]
-
-    has_table = 1 if soup.find("table") else 0
-    has_list = 1 if soup.find(["ul", "ol"]) else 0
-
-    text = soup.get_text(" ", strip=True)
-    has_faq = 1 if any(h in text for h in FAQ_HINTS) else 0
-
-    bullets = []
-    for ul in soup.find_all(["ul", "ol"])[:3]:
-        for li in ul.find_all("li")[:8]:
-            t = li.get_text(" ", strip=True)
-            if 8 <= len(t) <= 90:
-                bullets.append(t)
-    bullets = _dedup_keep_order(bullets, max_n=14)
-
-    number_clues = classify_number_clues(text)
-
-    data = {
-        "url": url, "ok": 1,
-        "title": title,
-        "meta_desc": meta_desc,
-        "h1": h1,
-        "h2": h2,
-        "h3": h3,
-        "has_table": has_table,
-        "has_list": has_list,
-        "has_faq": has_faq,
-        "number_clues": number_clues,
-        "bullets": bullets,
-        "text_preview": text[:900],
-    }
-    save_cached_page(url, data)
-    return data
+def fetch_status_icon(info: dict) -> str:
+    """✅ 成功 / ⏭️ 網域在黑名單或斷路器打開（沒抓）/ ⚠️ 抓取或解析失敗"""
+    if info.get("ok") == 1:
+        return "✅"
+    return "⏭️" if info.get("reason") in ("denied", "circuit_open") else "⚠️"
 
 
 # =========================
 # 4) 讀取 school_data.csv（對齊新版 powergeo.py）
+#    整理邏輯在 data_loader.py；同一版檔案（mtime + 內容雜湊）所有 session 共用同一份 df
+#    用 cache_resource 而不是 cache_data：不必每次 rerun 反序列化整張表，df 一律唯讀
+#    df 只有熱欄位；Evidence / Rank*_Snippet 在 cold_store，戰情室選中一筆才查
 # =========================
+@st.cache_resource(show_spinner="載入 school_data.csv…", max_entries=2)
+def load_school_data_shared(path: str, version: str):
+    return load_school_data(path, version=version)
+
 try:
-    df = pd.read_csv("school_data.csv")
+    with stage("load_data"):
+        data_version = file_version(DATA_FILE)
+        df, cold_store = load_school_data_shared(DATA_FILE, data_version)
 except FileNotFoundError:
     st.error("❌ 找不到 school_data.csv，請先執行 powergeo.py 產生資料。")
     st.stop()
 
-TEXT_DEFAULTS = {
-    "College": "無",
-    "Department": "無",
-    "Keyword": "無",
-    "Keyword_Source": "無",
-    "Seed_Term": "無",
-    "Evidence": "無",
-    "Keyword_Type": "一般",
-    "Strategy_Tag": "無",
-    "Rank1_Title": "無", "Rank1_Link": "#", "Rank1_Snippet": "",
-    "Rank2_Title": "無", "Rank2_Link": "#", "Rank2_Snippet": "",
-    "Rank3_Title": "無", "Rank3_Link": "#", "Rank3_Snippet": "",
-}
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_filter_index(version: str, _df: pd.DataFrame) -> FilterIndex:
+    """sidebar 篩選用的 bitmap / 排序索引，跟 df 同一個版本 key"""
+    return FilterIndex(_df)
 
-NUM_DEFAULTS = {
-    "Trends_Score": 0.0,
-    "Trends_Fetched": 0,
-    "Search_Volume": 0,
-    "Opportunity_Score": 0.0,
-    "AI_Potential": 0,
-    "Authority_Count": 0,
-    "Forum_Count": 0,
-    "Answerable_Avg": 0.0,
-    "Citable_Score": 0.0,
-    "Fetch_OK_Count": 0,
-    "Schema_Hit_Count": 0,
-    "Has_FAQ": 0,
-    "Has_Table": 0,
-    "Has_List": 0,
-    "Has_Headings": 0,
-    "Page_Word_Count_Max": 0,
-    "Result_Count": 0,
-}
-
-for c, v in TEXT_DEFAULTS.items():
-    if c not in df.columns:
-        df[c] = v
+with stage("filter_index"):
+    fidx = get_filter_index(data_version, df)
 
-for c, v in NUM_DEFAULTS.items():
-    if c not in df.columns:
-        df[c] = v
 
-for c in TEXT_DEFAULTS.keys():
-    df[c] = df[c].fillna(TEXT_DEFAULTS[c]).astype(str)
+# 跟上一版比：哪些科系的 row 有新增 / 刪除 / 變動（沒有上一版 → None，全部重算）
+# 同一個行程裡上一版的 CompetitorIndex 放在 build_history，換版時沒變的科系直接沿用
+@st.cache_resource(show_spinner=False)
+def get_build_history() -> dict:
+    return {}
 
-for c in NUM_DEFAULTS.keys():
-    df[c] = pd.to_numeric(df[c], errors="coerce").fillna(NUM_DEFAULTS[c])
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_data_changes(version: str, _df: pd.DataFrame):
+    manifest = load_manifest(DATA_FILE, version) or {
+        "version": version, "departments": dept_digests(_df), "colleges": dept_colleges(_df)}
+    prev = previous_manifest(DATA_FILE, version)
+    return diff_manifests(prev, manifest) if prev else None
 
-df = df.sort_values(["College", "Department", "Opportunity_Score"], ascending=[True, True, False])
+with stage("change_tracking"):
+    build_history = get_build_history()
+    data_changes = get_data_changes(data_version, df)
 
 
 # =========================
 # 5) 從 SERP Title 抽「學校名」→ 競品Top5
+#    抽取 / 計分在 competitors.py；整份資料一次建好，每個科系的 Top5 預先算好
 # =========================
-SCHOOL_SUFFIX = r"(?:大學|科技大學|醫學院|學院|專科學校|護理健康大學|護理專科學校|醫護管理專科學校|護專|醫專)"
-SCHOOL_REGEX = re.compile(rf"([\u4e00-\u9fff]{{2,12}}{SCHOOL_SUFFIX})")
-
-def extract_school_names(text: str):
-    if not text:
-        return []
-    found = SCHOOL_REGEX.findall(text)
-    out = []
-    for f in found:
-        f = f.strip()
-        if not f:
-            continue
-        # 排除自己
-        if any(t in f for t in SELF_BRAND_TOKENS):
-            continue
-        out.append(f)
-    return out
-
-def competitor_top5_from_dept(dept_df: pd.DataFrame):
-    counter = Counter()
-    examples = {}
-
-    for _, r in dept_df.iterrows():
-        for i in range(1, 4):
-            t = safe_str(r.get(f"Rank{i}_Title", ""))
-            link = safe_str(r.get(f"Rank{i}_Link", "#"))
-            d = domain_of(link)
-
-            for name in extract_school_names(t):
-                counter[name] += 2
-                examples.setdefault(name, []).append(t)
-
-            # domain 也算競品線索（沒抓到校名時）
-            if d and d not in ["#", ""]:
-                counter[d] += 1
-                examples.setdefault(d, []).append(t)
-
-    # 把明顯不是競品的 domain 先壓掉
-    noise_domains = ["dcard.tw", "ptt.cc", "facebook.com", "youtube.com", "104.com.tw", "instagram.com"]
-    for nd in noise_domains:
-        for k in list(counter.keys()):
-            if nd in k:
-                counter[k] -= 2
-
-    items = []
-    for name, cnt in counter.most_common(20):
-        if cnt <= 0:
-            continue
-        # 排除本校字樣
-        if any(t in name for t in SELF_BRAND_TOKENS):
-            continue
-        items.append({
-            "Competitor": name,
-            "Mentions": int(cnt),
-            "Example_Title": clip_text(examples.get(name, [""])[0], 90)
-        })
-
-    # 只取 Top5（避免太雜）
-    return items[:5]
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_competitor_index(version: str, _df: pd.DataFrame, _changes=None) -> CompetitorIndex:
+    prev = build_history.get(_changes["prev_version"]) if _changes else None
+    comp_idx = CompetitorIndex(_df, prev=prev, unchanged=_changes["unchanged"] if prev is not None else ())
+    # 只留這一版（下次換版時當「上一版」）
+    build_history.clear()
+    build_history[version] = comp_idx
+    return comp_idx
+
+with stage("competitor_index"):
+    comp_idx = get_competitor_index(data_version, df, data_changes)
 
 
 # =========================
-# 6) 學生決策問題 Top10（從 Keyword/Evidence 來）
-#    目的：系主任要看到「學生為什麼選/不選」的原文問題類型
+# 6) 學生決策問題 Top10：見 questions.py（問句旗標 / 分類在載入時就算好；由 aggregates.py 彙整）
 # =========================
-CAT_RULES = {
-    "薪資": ["薪", "薪資", "月薪", "年薪", "起薪", "待遇", "多少錢", "幾萬", "k", "K"],
-    "分數": ["分數", "級分", "錄取", "門檻", "最低", "統測", "繁星", "甄選", "落點", "倍率", "PR"],
-    "學分": ["學分", "課程", "課表", "必修", "選修", "畢業學分", "課程地圖"],
-    "及格率": ["及格率", "通過率", "合格率", "國考", "證照", "考科", "通過", "及格", "合格"],
-    "實習": ["實習", "醫院", "機構", "臨床", "見習", "輪訓"],
-    "出路": ["出路", "工作內容", "好找工作", "就業", "職務", "能做什麼", "職涯"],
-    "生活": ["宿舍", "租屋", "交通", "通勤", "學費", "獎學金", "打工", "生活費"],
-    "社群疑慮": ["dcard", "ptt", "靠北", "心得", "評價", "很累", "爆肝", "後悔", "雷"],
-}
-
-QUESTION_TOKENS = ["嗎", "怎麼", "如何", "要不要", "值得", "好不好", "難不難", "會不會", "適合", "可以"]
-
-def categorize_question(q: str):
-    ql = q.lower()
-    for cat, keys in CAT_RULES.items():
-        if any(k.lower() in ql for k in keys):
-            return cat
-    return "其他"
-
-def looks_like_question(q: str):
-    if any(tok in q for tok in QUESTION_TOKENS):
-        return True
-    # 也把「X 分數」「X 薪水」這種算問題（決策型）
-    if any(k in q for k in ["分數", "門檻", "錄取", "薪水", "起薪", "年薪", "國考", "及格率", "學分", "實習"]):
-        return True
-    return False
-
-def decision_questions_top10(dept_df: pd.DataFrame):
-    """
-    優先用 Keyword_Source=autocomplete，輸入；再補其他來源
-    """
-    qs = []
-
-    ac = dept_df[dept_df["Keyword_Source"].str.lower() == "autocomplete"]
-    other = dept_df[dept_df["Keyword_Source"].str.lower() != "autocomplete"]
-
-    for _, r in pd.concat([ac, other], axis=0).iterrows():
-        kw = safe_str(r["Keyword"])
-        if looks_like_question(kw):
-            qs.append(kw)
-
-    # 頻率
-    counter = Counter([q.strip() for q in qs if q.strip()])
-    top = counter.most_common(30)
-
-    # 做 category 彙整 + 每類挑代表句
-    cat_counter = Counter()
-    cat_examples = {}
-    for q, cnt in top:
-        cat = categorize_question(q)
-        cat_counter[cat] += cnt
-        cat_examples.setdefault(cat, []).append(q)
-
-    # Top10 問題（原句）
-    top10 = [{"Question": q, "Count": int(cnt), "Category": categorize_question(q)} for q, cnt in counter.most_common(10)]
-
-    # 分類表
-    cat_rows = []
-    total = sum(cat_counter.values()) if cat_counter else 0
-    for cat, cnt in cat_counter.most_common(10):
-        ex = cat_examples.get(cat, [])
-        cat_rows.append({
-            "Category": cat,
-            "Share": round((cnt / total) * 100, 1) if total else 0.0,
-            "Example": clip_text(ex[0], 80) if ex else "—"
-        })
-
-    return top10, cat_rows
 
 
 # =========================
-# 7) 內容缺口 + 下月行動清單（讓系主任能做事）
+# 7) 彙整物化層：總覽 / 一頁式的 KPI、圖表輸入、Top5 / Top10、內容缺口、行動清單
+#    規則與計算在 aggregates.py；每一版資料建一次（不篩選的結果先算好），
+#    其他篩選組合第一次用到才算，結果存在 school_data.csv 旁的旁檔
+#    一頁式 Markdown 模板 / 批次匯出在 onepager_export.py
 # =========================
-def content_gap_suggestions(dept_df: pd.DataFrame):
-    """
-    用你現有欄位先做『可行動』缺口；若有深度解析，還會再加強
-    """
-    # 用平均值看整體弱點
-    faq_rate = dept_df["Has_FAQ"].mean() if len(dept_df) else 0
-    table_rate = dept_df["Has_Table"].mean() if len(dept_df) else 0
-    list_rate = dept_df["Has_List"].mean() if len(dept_df) else 0
-    authority = dept_df["Authority_Count"].mean() if len(dept_df) else 0
-    forum = dept_df["Forum_Count"].mean() if len(dept_df) else 0
-    citable = dept_df["Citable_Score"].mean() if len(dept_df) else 0
-
-    gaps = []
-
-    # 結構化缺口
-    if faq_rate < 0.4:
-        gaps.append("FAQ 沒做滿：補一段『常見問題 8–12 題』，每題 2–4 行，AI 很愛摘。")
-    if table_rate < 0.35:
-        gaps.append("缺少表格：至少做 1 張『課程/實習/證照/出路』整理表或對照表。")
-    if list_rate < 0.5:
-        gaps.append("缺少步驟化清單：把『如何準備/如何實習/如何考照』寫成 6–10 步驟。")
-
-    # 引用缺口
-    if citable < 45 or authority < 0.8:
-        gaps.append("引用不足：涉及薪資/門檻/通過率，務必附『年份+來源類型』（官方/104/招生簡章）。")
-
-    # 社群風險
-    if forum >= 0.7:
-        gaps.append("論壇占比偏高：加一段『理性澄清』，把主觀抱怨轉成可查資訊（流程/口徑/FAQ）。")
-
-    # 決策四大硬題（永遠要有）
-    must_have = [
-        "薪資：用『區間 + 職務/年資』寫法，不要單一數字。",
-        "門檻：整理『近 2–3 年區間』＋入學管道＋引用簡章。",
-        "學分：貼『學分結構表 + 課程地圖』。",
-        "及格率/考照：交代『年份、口徑、母數』並附來源。"
-    ]
-    gaps.extend(must_have)
+DEFAULT_MINIMUMS = {"AI_Potential": 0, "Opportunity_Score": 0}
+
+@st.cache_resource(show_spinner="彙整各系指標…", max_entries=2)
+def get_aggregate_store(version: str, _df: pd.DataFrame, _fidx: FilterIndex, _comp_idx: CompetitorIndex,
+                        _changes=None) -> AggregateStore:
+    carry = {}
+    if _changes and _changes.get("prev_version"):
+        carry = {
+            "prev_path": sidecar_path(DATA_FILE, _changes["prev_version"], ".agg.sqlite"),
+            "unchanged_depts": _changes["unchanged"],
+            "unchanged_colleges": _changes["unchanged_colleges"],
+        }
+    return AggregateStore(_df, _fidx, _comp_idx, path=sidecar_path(DATA_FILE, version, ".agg.sqlite"),
+                          default_minimums=DEFAULT_MINIMUMS, **carry)
 
-    return _dedup_keep_order(gaps, max_n=10)
+with stage("aggregate_store"):
+    agg_store = get_aggregate_store(data_version, df, fidx, comp_idx, data_changes)
 
-def next_30_days_action_plan(dept_df: pd.DataFrame, top_questions: list, top_competitors: list):
-    """
-    用規則產生系主任看得懂的行動清單（你不用先有 GA4 也能先跑）
-    """
-    actions = []
 
-    # 1) 直接對應學生最常問
-    cats = Counter([x.get("Category") for x in top_questions])
-    top_cat = cats.most_common(1)[0][0] if cats else "其他"
+# 7.5) Autocomplete / Trends 快取的反查索引（keyword_index.py）：快取檔有變才重建
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_keyword_index(version: str) -> KeywordIndex:
+    return load_keyword_index()
 
-    if top_cat in ["薪資", "分數", "學分", "及格率"]:
-        actions.append(f"做一篇『{top_cat} 一次講清楚』：用表格整理 + 在文中交代年份/來源口徑。")
-    else:
-        actions.append("做一篇『新生懶人包』：課程地圖、實習流程、證照/出路、FAQ 一次到位。")
-
-    # 2) 競品對照
-    if top_competitors:
-        actions.append("做一張『本系 vs 主要競品』對照表（課程/實習/證照/出路/資源），放在文章前半段。")
-
-    # 3) FAQ/可摘錄
-    actions.append("補 FAQ 12 題：直接用學生的原句改寫，答案控制 2–4 行，方便 AI 摘錄。")
-
-    # 4) 引用資料盤點
-    actions.append("盤點可引用資料清單：招生簡章（門檻/管道）、課程地圖（學分）、實習單位、證照/國考成果、就業/薪資佐證。")
-
-    # 5) 社群風險處理
-    if dept_df["Forum_Count"].mean() >= 0.7:
-        actions.append("加『理性澄清』段：針對 Dcard/PTT 常見焦慮（累不累/好不好考/值不值得）逐點回答。")
-
-    return _dedup_keep_order(actions, max_n=6)
-
-def build_onepager_markdown(dept_name: str, snapshot: dict, comp_items: list, cat_rows: list, top10_q: list, gaps: list, actions: list):
-    md = []
-    md.append(f"# {dept_name}｜系主任一頁式（招生決策依據）")
-    md.append("")
-    md.append("## 1) 招生快照")
-    md.append(f"- 關鍵字筆數：{snapshot.get('n',0)}")
-    md.append(f"- 平均 Opportunity：{snapshot.get('opp',0)}｜平均 AI：{snapshot.get('ai',0)}｜平均 Citable：{snapshot.get('citable',0)}")
-    md.append(f"- 平均聲量指標：{snapshot.get('vol_label','')} = {snapshot.get('vol',0)}")
-    md.append("")
-    md.append("## 2) 主要競品 Top5（來自 Top3 SERP 標題/網域）")
-    for x in comp_items:
-        md.append(f"- {x['Competitor']}（提及 {x['Mentions']}）例：{x['Example_Title']}")
-    md.append("")
-    md.append("## 3) 學生決策問題（分類）")
-    for r in cat_rows:
-        md.append(f"- {r['Category']}：{r['Share']}%｜例：{r['Example']}")
-    md.append("")
-    md.append("## 4) Top10 原句問題（最像學生真的會問的）")
-    for q in top10_q:
-        md.append(f"- [{q['Category']}] {q['Question']}（{q['Count']}）")
-    md.append("")
-    md.append("## 5) 內容缺口（現在網路上容易缺的）")
-    for g in gaps:
-        md.append(f"- {g}")
-    md.append("")
-    md.append("## 6) 下月行動清單（30 天內做得完）")
-    for a in actions:
-        md.append(f"- {a}")
-    md.append("")
-    return "\n".join(md)
+with stage("keyword_index"):
+    kw_index = get_keyword_index(cache_files_version())
+
+# 7.6) Top3 網址倒排索引（url_index.py）：同一頁只抓一次，結果分給所有引用它的列
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_url_index(version: str, _df: pd.DataFrame) -> UrlIndex:
+    return UrlIndex(_df)
+
+with stage("url_index"):
+    url_index = get_url_index(data_version, df)
 
 
 # =========================
@@ -793,107 +221,139 @@ mode = st.sidebar.radio(
     ["📌 系主任一頁式", "🧭 全校/學院總覽", "🔍 單系戰情室（Top3+Prompt）"],
     index=0
 )
+profiler.label(mode)
 
-college_list = ["全部學院"] + sorted(df["College"].unique().tolist())
+college_list = ["全部學院"] + fidx.values("College")
 selected_college = st.sidebar.selectbox("STEP 1: 選擇學院", college_list)
 
 if selected_college == "全部學院":
-    dept_options = sorted(df["Department"].unique().tolist())
+    dept_options = fidx.departments()
 else:
-    dept_options = sorted(df[df["College"] == selected_college]["Department"].unique().tolist())
+    dept_options = fidx.departments(selected_college)
 
 selected_dept = st.sidebar.selectbox("STEP 2: 選擇科系", dept_options)
 
-kw_types = ["全部意圖"] + sorted(df["Keyword_Type"].unique().tolist())
+kw_types = ["全部意圖"] + fidx.values("Keyword_Type")
 selected_kw_type = st.sidebar.selectbox("STEP 3: 篩選搜尋意圖", kw_types)
 
-source_list = ["全部來源"] + sorted(df["Keyword_Source"].unique().tolist())
+source_list = ["全部來源"] + fidx.values("Keyword_Source")
 selected_source = st.sidebar.selectbox("STEP 4: 篩選 Keyword 來源", source_list)
 
-min_ai = st.sidebar.slider("AI_Potential 最低門檻", 0, 100, 0, 5)
+min_ai = st.sidebar.slider("AI_Potential 最低門檻", 0, 100, DEFAULT_MINIMUMS["AI_Potential"], 5)
 min_opp_max = int(max(1, df["Opportunity_Score"].max()))
-min_opp = st.sidebar.slider("Opportunity_Score 最低門檻", 0, min_opp_max, 0, 10)
+min_opp = st.sidebar.slider("Opportunity_Score 最低門檻", 0, min_opp_max, DEFAULT_MINIMUMS["Opportunity_Score"], 10)
 
 st.sidebar.divider()
 st.sidebar.caption("✅ 輸入：來源選 Autocomplete。")
+if data_changes and (data_changes["added"] or data_changes["removed"] or data_changes["changed"]):
+    st.sidebar.caption(
+        f"🔄 資料已更新：新增 {len(data_changes['added'])}、變動 {len(data_changes['changed'])}、"
+        f"移除 {len(data_changes['removed'])} 系（其餘 {len(data_changes['unchanged'])} 系沿用上一版結果）"
+    )
 
 if funnel_df is None:
     st.sidebar.caption("（可選）放入 funnel_data.csv 可顯示漏斗轉換。")
 if gsc_df is None:
     st.sidebar.caption("（可選）放入 gsc_queries.csv 可顯示 Search Console 真實 query。")
+st.sidebar.toggle("⏱️ 效能剖析（每次 rerun 的分段耗時）", key="prof_on")
 
 
-# 套用篩選
-target_df = df.copy()
-if selected_college != "全部學院":
-    target_df = target_df[target_df["College"] == selected_college]
-
-if selected_kw_type != "全部意圖":
-    target_df = target_df[target_df["Keyword_Type"] == selected_kw_type]
-
-if selected_source != "全部來源":
-    target_df = target_df[target_df["Keyword_Source"] == selected_source]
-
-target_df = target_df[target_df["AI_Potential"] >= min_ai]
-target_df = target_df[target_df["Opportunity_Score"] >= min_opp]
+# 套用篩選：索引直接算出 row bitmap / 位置；總覽只取看得到的那一頁，戰情室才取整個範圍
+# 同一組條件也是彙整物化層的 key
+filter_equals = {
+    "College": None if selected_college == "全部學院" else selected_college,
+    "Keyword_Type": None if selected_kw_type == "全部意圖" else selected_kw_type,
+    "Keyword_Source": None if selected_source == "全部來源" else selected_source,
+}
+filter_minimums = {"AI_Potential": min_ai, "Opportunity_Score": min_opp}
+with stage("sidebar_filters"):
+    target_mask = fidx.mask(equals=filter_equals, minimums=filter_minimums)
+    target_rows = np.flatnonzero(target_mask)
 
 
 # =========================
 # 9) 全校/學院總覽
 # =========================
-def overview_page(scope_df: pd.DataFrame, title_prefix: str):
+OVERVIEW_PAGE_SIZES = [50, 100, 200, 500]
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def overview_figures(fig_key: str, _summary: dict) -> dict:
+    """
+    總覽四張圖的 plotly JSON（輸入都是 summary 裡分組好的小表）
+    fig_key = 資料版本 + 篩選簽章：同一組篩選只用 px 畫一次，之後只做 JSON → Figure
+    """
+    vcol = _summary["vcol"]
+    vlabel = _summary["vol_label"]
+
+    dept_rank = pd.DataFrame(_summary["dept_rank"], columns=["Department", "Opportunity_Score"])
+    type_counts = pd.DataFrame(_summary["type_counts"], columns=["Keyword_Type", "Count"])
+    src_rank = pd.DataFrame(_summary["src_rank"], columns=["Keyword_Source", "Count"])
+    vol_rank = pd.DataFrame(_summary["vol_rank"], columns=["Department", vcol])
+    figs = {
+        "dept_rank": px.bar(dept_rank, x="Department", y="Opportunity_Score", color="Department",
+                            title="各系 GEO 機會值排行（平均 Opportunity）"),
+        "type_counts": px.pie(type_counts, names="Keyword_Type", values="Count", title="搜尋意圖分佈"),
+        "src_rank": px.bar(src_rank, x="Keyword_Source", y="Count", color="Keyword_Source",
+                           title="Keyword 來源分佈（越多 autocomplete 越像真人）"),
+        "vol_rank": px.bar(vol_rank, x="Department", y=vcol, color="Department",
+                           title=f"各系 {vlabel}（平均）"),
+    }
+    return {k: fig.to_json() for k, fig in figs.items()}
+
+def overview_page(scope_mask: np.ndarray, title_prefix: str, summary: dict):
+    """
+    summary = agg_store.overview(...)：KPI 與圖表輸入都已經彙整好，這裡只畫圖
+    scope_mask：篩選後的 row bitmap；總表在伺服器端排序 + 分頁，只送看得到的那一頁
+    """
     st.title(f"🧭 {title_prefix}｜總覽（GEO/AI 指標 + 來源結構）")
 
-    vcol = prefer_volume_col(scope_df)
-    vlabel = "Trends 相對聲量" if vcol == "Trends_Score" else "聲量指標"
+    vcol = summary["vcol"]
+    vlabel = summary["vol_label"]
 
-    c1, c2, c3, c4, c5 = st.columns(5)
-    with c1: st.metric("關鍵字筆數", int(len(scope_df)))
-    with c2: st.metric("平均 Opportunity", round(scope_df["Opportunity_Score"].mean(), 1) if len(scope_df) else 0)
-    with c3: st.metric("平均 AI", round(scope_df["AI_Potential"].mean(), 1) if len(scope_df) else 0)
-    with c4: st.metric("平均 Citable", round(scope_df["Citable_Score"].mean(), 1) if len(scope_df) else 0)
-    with c5: st.metric(f"平均 {vlabel}", round(scope_df[vcol].mean(), 2) if len(scope_df) else 0)
+    c1, c2, c3, c4, c5, c6 = st.columns(6)
+    with c1: st.metric("關鍵字筆數", summary["n"])
+    with c2: st.metric("近似詞合併後", summary.get("clusters", summary["n"]),
+                       help="同系內近似重複的關鍵字（MinHash/LSH 分群）算一個")
+    with c3: st.metric("平均 Opportunity", summary["opp"])
+    with c4: st.metric("平均 AI", summary["ai"])
+    with c5: st.metric("平均 Citable", summary["citable"])
+    with c6: st.metric(f"平均 {vlabel}", summary["vol"])
 
     st.divider()
 
+    with stage("figures"):
+        figs = overview_figures(f"{data_version}|{agg_store.overview_key(filter_equals, filter_minimums)}", summary)
+        charts = {k: pio.from_json(v) for k, v in figs.items()}
+
     left, right = st.columns([2, 1])
     with left:
-        dept_rank = (
-            scope_df.groupby("Department", as_index=False)["Opportunity_Score"]
-            .mean()
-            .sort_values("Opportunity_Score", ascending=False)
-        )
-        fig = px.bar(dept_rank, x="Department", y="Opportunity_Score", color="Department",
-                     title="各系 GEO 機會值排行（平均 Opportunity）")
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(charts["dept_rank"], use_container_width=True)
 
     with right:
-        fig2 = px.pie(scope_df, names="Keyword_Type", title="搜尋意圖分佈")
-        st.plotly_chart(fig2, use_container_width=True)
+        st.plotly_chart(charts["type_counts"], use_container_width=True)
 
     st.divider()
 
     colA, colB = st.columns(2)
     with colA:
-        src_rank = (
-            scope_df.groupby("Keyword_Source", as_index=False)
-            .size()
-            .rename(columns={"size": "Count"})
-            .sort_values("Count", ascending=False)
-        )
-        fig3 = px.bar(src_rank, x="Keyword_Source", y="Count", color="Keyword_Source",
-                      title="Keyword 來源分佈（越多 autocomplete 越像真人）")
-        st.plotly_chart(fig3, use_container_width=True)
+        st.plotly_chart(charts["src_rank"], use_container_width=True)
 
     with colB:
-        vol_rank = (
-            scope_df.groupby("Department", as_index=False)[vcol]
-            .mean()
-            .sort_values(vcol, ascending=False)
-        )
-        fig4 = px.bar(vol_rank, x="Department", y=vcol, color="Department",
-                      title=f"各系 {vlabel}（平均）")
-        st.plotly_chart(fig4, use_container_width=True)
+        st.plotly_chart(charts["vol_rank"], use_container_width=True)
+
+    # 跨系競品：整份資料的「科系 × 競品」矩陣（competitors.CompetitorMatrix），只看科系、不受門檻篩選影響
+    st.divider()
+    st.subheader("🏁 跨系競品（哪些對手同時出現在多個系）")
+    scope_depts = fidx.values("Department", scope_mask)
+    x1, x2, x3 = st.columns([3, 1, 1])
+    picked = x1.multiselect("科系", comp_idx.matrix.departments, default=scope_depts, key="xc_depts")
+    min_depts = x2.number_input("至少出現在幾系", min_value=1, max_value=max(1, len(picked)), value=min(2, max(1, len(picked))),
+                                step=1, key="xc_min")
+    by = "overlap" if x3.radio("排序", ["總分", "出現系數"], key="xc_by") == "出現系數" else "score"
+    with stage("cross_competitors"):
+        rivals = comp_idx.matrix.query(picked, min_departments=int(min_depts), top_n=30, by=by)
+    st.dataframe(rivals, use_container_width=True)
+    st.caption("計分同一頁式競品 Top5（標題提到校名 +2、網域 +1、雜訊網域扣分），但不截前 20 名；用整個科系的資料，不受側欄門檻影響")
 
     st.divider()
     st.subheader("📋 關鍵字總表（含來源與證據）")
@@ -903,40 +363,96 @@ def overview_page(scope_df: pd.DataFrame, title_prefix: str):
         "Keyword_Type","Opportunity_Score","AI_Potential","Citable_Score",
         "Authority_Count","Forum_Count", vcol, "Trends_Fetched", "Rank1_Title"
     ]
-    show_cols = [c for c in show_cols if c in scope_df.columns]
-
+    show_cols = [c for c in show_cols if c in df.columns]
+
+    # 排序鍵：選的欄位在前，預設排序（Opportunity → AI，遞減）當同分時的順序
+    default_by = ["Opportunity_Score", "AI_Potential"]
+    s1, s2, s3, s4 = st.columns([2, 1, 1, 1])
+    sort_col = s1.selectbox("排序欄位", default_by + [c for c in show_cols if c not in default_by], key="ov_sort")
+    ascending = s2.selectbox("順序", ["遞減", "遞增"], key="ov_asc") == "遞增"
+    page_size = s3.selectbox("每頁筆數", OVERVIEW_PAGE_SIZES, index=1, key="ov_size")
+    total = int(summary["n"])
+    n_pages = max(1, -(-total // page_size))
+    # 不設 max_value：換篩選後總頁數變少時，超出的頁次直接夾到最後一頁
+    page_no = min(n_pages, int(s4.number_input(f"頁次（共 {n_pages} 頁）", min_value=1, value=1, step=1, key="ov_page")))
+
+    by = [sort_col] + [c for c in default_by if c != sort_col]
+    with stage("table_page"):
+        rows, total = fidx.page(scope_mask, by, ascending=ascending, offset=(page_no - 1) * page_size, limit=page_size)
+        page_df = df.take(rows)[show_cols]
     st.dataframe(
-        scope_df[show_cols].sort_values(["Opportunity_Score","AI_Potential"], ascending=False),
+        page_df,
         use_container_width=True,
         height=640
     )
+    st.caption(f"第 {page_no} / {n_pages} 頁，共 {total} 筆")
+
+    if "Cluster_Id" in df.columns:
+        with st.expander("🧩 近似重複關鍵字（最大的幾群）"):
+            with stage("clusters"):
+                clusters = cluster_summary(df.take(np.flatnonzero(scope_mask)), top_n=30)
+            st.dataframe(clusters, use_container_width=True)
+
+    with st.expander("🔗 最常被共用的 Top3 網址（同一頁只需抓 + 解析一次）"):
+        with stage("shared_urls"):
+            scope_rows = np.flatnonzero(scope_mask)
+            us = url_index.stats(scope_rows)
+            shared_urls = url_index.top_shared(30, scope_rows)
+        st.caption(f"{us['references']} 個 Top3 引用 → {us['unique_pages']} 個不重複頁面（平均每頁 {us['dedup_ratio']} 次）")
+        st.dataframe(shared_urls, use_container_width=True)
+
+    # 批次深度解析：範圍內所有科系的 Top3 頁面（抓取走執行緒、解析走多行程，跟戰情室共用快取）
+    st.divider()
+    st.subheader(f"🚚 {title_prefix}批次深度解析（各系 Top3 頁面的數字線索 / H2 / 結構）")
+    if not HAS_REQUESTS:
+        st.info("若要批次深度解析：請 pip install requests")
+    elif st.button("開始批次深度解析"):
+        progress = st.progress(0.0, text="批次深度解析中…")
+
+        def on_page(n, total, url, info):
+            status = fetch_status_icon(info)
+            progress.progress(n / total, text=f"{status} {domain_of(url)}（{n}/{total}）")
+
+        with stage("batch_deep"):
+            batch = run_batch(df.take(np.flatnonzero(scope_mask)), engine=get_fetch_engine(), progress=on_page,
+                              url_index=url_index)
+        progress.empty()
+
+        s = batch["stats"]
+        st.caption(f"{s['departments']} 系 / {s['pages']} 個不重複頁面（分給 {s['rows']} 列、{s['references']} 個引用）："
+                   f"成功 {s['ok']}、失敗 {s['failed']}，{s['elapsed_sec']} 秒（解析 {s['procs']} 行程）")
+        st.dataframe(summary_table(batch), use_container_width=True)
+        if batch["rows"]:
+            with st.expander("每個關鍵字分到的頁面結果"):
+                st.dataframe(pd.DataFrame(batch["rows"]), use_container_width=True)
+        for dept, d in batch["departments"].items():
+            with st.expander(f"{dept}｜{d['ok']}/{d['pages']} 頁", expanded=False):
+                st.markdown(build_rational_citation_paragraphs(d["human"]))
+                if d["h2_pool"]:
+                    st.caption("常見 H2：" + "、".join(x["H2"] for x in d["h2_pool"]))
+        st.download_button(
+            label="下載批次結果（JSON）",
+            data=json.dumps(batch, ensure_ascii=False, indent=2).encode("utf-8"),
+            file_name=f"{title_prefix}_批次深度解析.json",
+            mime="application/json"
+        )
 
 
 # =========================
 # 10) 系主任一頁式
 # =========================
-def onepager_page(scope_df: pd.DataFrame, dept_name: str):
-    dept_df = scope_df[scope_df["Department"] == dept_name].copy()
-    if dept_df.empty:
+def onepager_page(dept_name: str, summary: dict):
+    """summary = agg_store.onepager(...)：快照、競品、問題、缺口、行動都已經彙整好"""
+    snap = summary["snap"]
+    if not snap["n"]:
         st.warning("這個篩選條件下沒有資料（可把門檻調低或取消來源/意圖篩選）。")
         st.stop()
 
-    dept_df = dept_df.sort_values(["Opportunity_Score","AI_Potential"], ascending=False)
-    vcol = prefer_volume_col(dept_df)
-    vlabel = "Trends 相對聲量" if vcol == "Trends_Score" else "聲量指標"
+    vlabel = snap["vol_label"]
 
     st.title(f"📌 {dept_name}｜系主任一頁式（用『真實決策依據』說服）")
 
     # 快照 KPI（沒有漏斗也能先跑）
-    snap = {
-        "n": int(len(dept_df)),
-        "opp": round(dept_df["Opportunity_Score"].mean(), 1),
-        "ai": round(dept_df["AI_Potential"].mean(), 1),
-        "citable": round(dept_df["Citable_Score"].mean(), 1),
-        "vol": round(dept_df[vcol].mean(), 2),
-        "vol_label": vlabel
-    }
-
     c1, c2, c3, c4, c5 = st.columns(5)
     c1.metric("關鍵字筆數", snap["n"])
     c2.metric("平均 Opportunity", snap["opp"])
@@ -983,7 +499,7 @@ def onepager_page(scope_df: pd.DataFrame, dept_name: str):
     # 競品 Top5
     st.divider()
     st.subheader("🏫 主要競品 Top5（從 Top3 SERP 標題/網域推估）")
-    comp_top5 = competitor_top5_from_dept(dept_df)
+    comp_top5 = summary["comp_top5"]
     if comp_top5:
         st.dataframe(pd.DataFrame(comp_top5), use_container_width=True, height=220)
     else:
@@ -992,7 +508,7 @@ def onepager_page(scope_df: pd.DataFrame, dept_name: str):
     # 決策問題 Top10 + 分類
     st.divider()
     st.subheader("🧠 學生決策依據：他們其實在問什麼？")
-    top10_q, cat_rows = decision_questions_top10(dept_df)
+    top10_q, cat_rows = summary["top10_q"], summary["cat_rows"]
 
     left, right = st.columns([1.2, 1])
     with left:
@@ -1011,24 +527,44 @@ def onepager_page(scope_df: pd.DataFrame, dept_name: str):
         else:
             st.caption("（尚無分類結果）")
 
+    # Autocomplete / Trends 快取反查（本系的 seed → 建議詞；含科系名的 Trends 查詢）
+    st.divider()
+    st.subheader("🔎 本系 Autocomplete 衍生詞 / Trends 相關查詢")
+    with stage("keyword_lookup"):
+        dept_rows = df.take(fidx.select(equals={"Department": dept_name}))
+        seed_rows = kw_index.seed_table(dept_rows["Seed_Term"].astype(str).unique())
+        related = kw_index.trends_related(dept_name, limit=10)
+    left, right = st.columns([1.2, 1])
+    with left:
+        if seed_rows:
+            st.dataframe(pd.DataFrame(seed_rows), use_container_width=True, height=260)
+        else:
+            st.caption("（autocomplete 快取裡沒有本系的 seed）")
+    with right:
+        if related:
+            st.dataframe(pd.DataFrame(related), use_container_width=True, height=260)
+        else:
+            st.caption("（trends 快取裡沒有含本系名稱的查詢）")
+
     # 內容缺口
     st.divider()
     st.subheader("🧩 內容缺口（現在網路上常缺、但學生很在意）")
-    gaps = content_gap_suggestions(dept_df)
+    gaps = summary["gaps"]
     for g in gaps:
         st.write(f"- {g}")
 
     # 下月行動清單
     st.divider()
     st.subheader("✅ 下月行動清單（30 天內做得完）")
-    actions = next_30_days_action_plan(dept_df, top10_q, comp_top5)
+    actions = summary["actions"]
     for a in actions:
         st.write(f"- {a}")
 
     # 一鍵匯出給系主任（Markdown）
     st.divider()
     st.subheader("📤 匯出（給系主任/簡報用）")
-    md = build_onepager_markdown(dept_name, snap, comp_top5, cat_rows, top10_q, gaps, actions)
+    with stage("render_markdown"):
+        md = build_onepager_markdown(dept_name, snap, comp_top5, cat_rows, top10_q, gaps, actions)
     st.download_button(
         label="下載系主任一頁式（Markdown）",
         data=md.encode("utf-8"),
@@ -1038,37 +574,55 @@ def onepager_page(scope_df: pd.DataFrame, dept_name: str):
     with st.expander("預覽 Markdown", expanded=False):
         st.code(md, language="markdown")
 
+    # 批次：整個學院 / 全校每一系的一頁式打包成一個 zip（套用同一組 sidebar 篩選）
+    scope_name = "全校" if selected_college == "全部學院" else selected_college
+    scope_depts = fidx.departments(None if selected_college == "全部學院" else selected_college)
+    if st.button(f"📦 匯出{scope_name}全部 {len(scope_depts)} 系的一頁式（zip）"):
+        data, result = export_onepagers_zip(agg_store, scope_depts, equals=filter_equals, minimums=filter_minimums)
+        s = result["stats"]
+        st.caption(f"{s['files']} 份（{s['skipped']} 系在目前篩選下沒資料），{s['elapsed_sec']} 秒")
+        st.dataframe(result["timing"], use_container_width=True, height=240)
+        st.download_button(
+            label=f"下載{scope_name}一頁式（zip）",
+            data=data,
+            file_name=f"{scope_name}_系主任一頁式.zip",
+            mime="application/zip"
+        )
+
 
 # =========================
 # 11) 單系戰情室（Top3 + Evidence + Prompt 注入 + 可選深度解析）
 # =========================
 def warroom_page(scope_df: pd.DataFrame, dept_name: str):
-    dept_df = scope_df[scope_df["Department"] == dept_name].copy()
+    dept_df = scope_df[scope_df["Department"] == dept_name]
     if dept_df.empty:
         st.warning("這個篩選條件下沒有資料（可把門檻調低或取消來源/意圖篩選）。")
         st.stop()
 
     dept_df = dept_df.sort_values(["Opportunity_Score","AI_Potential"], ascending=False)
     vcol = prefer_volume_col(dept_df)
-    vlabel = "Trends 相對聲量" if vcol == "Trends_Score" else "聲量指標"
+    vlabel = volume_label(vcol)
 
     st.title(f"🔍 {dept_name}｜單系戰情室（Top3 + Prompt）")
 
     # 選 keyword
-    dept_df["Display_Label"] = (
+    display_label = (
         dept_df["Keyword"] + " 〔" +
-        dept_df["Keyword_Type"] + " / " +
-        dept_df["Keyword_Source"].apply(source_tag) + "〕"
+        dept_df["Keyword_Type"].astype(str) + " / " +
+        dept_df["Keyword_Source"].astype(str).apply(source_tag) + "〕"
     )
-    target_label = st.selectbox("選擇關鍵字", dept_df["Display_Label"].unique())
-    target_row = dept_df[dept_df["Display_Label"] == target_label].iloc[0]
+    target_label = st.selectbox("選擇關鍵字", display_label.unique())
+    target_row = dept_df[(display_label == target_label).to_numpy()].iloc[0]
+    # 長文字（Evidence / 摘要）只查這一筆
+    with stage("cold_store"):
+        cold = cold_store.get(target_row.name)
 
     kw = safe_str(target_row["Keyword"])
     kw_type = safe_str(target_row["Keyword_Type"])
     strategy = safe_str(target_row["Strategy_Tag"])
     src = safe_str(target_row["Keyword_Source"])
     seed = safe_str(target_row["Seed_Term"])
-    evidence = safe_str(target_row.get("Evidence", "無"))
+    evidence = safe_str(cold.get("Evidence", "無"))
 
     st.caption(f"來源：{source_tag(src)}｜Seed：{seed}｜意圖：{kw_type}")
 
@@ -1076,6 +630,31 @@ def warroom_page(scope_df: pd.DataFrame, dept_name: str):
         with st.expander("🔎 Evidence（為什麼說這不是你編的）", expanded=False):
             st.code(evidence[:800])
 
+    # 快取反查：同 seed 的兄弟建議詞、seed 開頭的補完、這個詞在各設定下的 Trends 分數與相關查詢
+    with st.expander("🧭 Autocomplete / Trends 反查（不重新查詢，直接讀快取）", expanded=False):
+        seeds = kw_index.seeds_for(kw, seed)
+        a, b = st.columns(2)
+        with a:
+            st.markdown(f"**同 seed 的其他建議詞**（seed：{'、'.join(seeds) if seeds else '無'}）")
+            sibs = kw_index.siblings(kw, seed)
+            if sibs:
+                st.dataframe(pd.DataFrame(sibs), use_container_width=True, height=240)
+            else:
+                st.caption("（autocomplete 快取裡沒有對應的 seed）")
+            if seeds:
+                st.caption(f"以「{seeds[0]}」開頭的建議詞：" + "、".join(kw_index.complete(seeds[0], limit=12)))
+        with b:
+            st.markdown("**Trends 分數（同一個詞的各種設定）**")
+            variants = kw_index.trends_lookup(kw)
+            if variants:
+                st.dataframe(pd.DataFrame(variants), use_container_width=True, height=110)
+            else:
+                st.caption("（trends 快取裡沒有這個詞）")
+            st.markdown("**相關 Trends 查詢**")
+            related = kw_index.trends_related(kw, extra_terms=[dept_name], limit=8)
+            if related:
+                st.dataframe(pd.DataFrame(related), use_container_width=True, height=220)
+
     # 深度解析（可選）
     deep_on = False
     run_deep = False
@@ -1111,13 +690,14 @@ def warroom_page(scope_df: pd.DataFrame, dept_name: str):
     deep_briefs = []
     gap_pool_h2 = []
     agg_number_clues = {"salary": [], "score": [], "credits": [], "passrate": []}
+    deep_targets = []
 
     with col_r:
         st.markdown(f"### 👀 「{kw}」Top 3 搜尋結果")
         for i in range(1, 4):
             title = safe_str(target_row.get(f"Rank{i}_Title", "無"))
             link = safe_str(target_row.get(f"Rank{i}_Link", "#"))
-            snippet = safe_str(target_row.get(f"Rank{i}_Snippet", ""))
+            snippet = safe_str(cold.get(f"Rank{i}_Snippet", ""))
 
             if title == "無":
                 continue
@@ -1128,9 +708,36 @@ def warroom_page(scope_df: pd.DataFrame, dept_name: str):
                 st.markdown(f"**#{i} [{title}]({link})**")
                 if snippet.strip():
                     st.caption(clip_text(snippet, 260))
+                shared = url_index.share_info(link)
+                if shared["rows"] > 1:
+                    st.caption(f"🔗 這一頁共出現在 {shared['rows']} 個關鍵字 / {shared['departments']} 個系的 Top3")
 
             if deep_on and run_deep and link not in ["#", "無", ""]:
-                info = parse_competitor_page(link)
+                # 同一頁的不同寫法用同一個網址抓（跟批次解析共用快取）
+                deep_targets.append((i, url_index.fetch_url(link)))
+
+        # Top3 同時抓：完成一頁顯示一頁，總等待 ≈ 最慢的那一頁
+        if deep_targets:
+            engine = get_fetch_engine()
+            progress = st.progress(0.0, text="深度解析中…")
+            links = list(dict.fromkeys(l for _, l in deep_targets))
+            results = {}
+            with stage("fetch_parse"):
+                for n, (link, info) in enumerate(engine.run(links, bind(engine.parse)), start=1):
+                    results[link] = info
+                    status = fetch_status_icon(info)
+                    progress.progress(n / len(links), text=f"{status} {domain_of(link)}（{n}/{len(links)}）")
+            progress.empty()
+
+            skipped = [l for l in links if results.get(l, {}).get("reason") in ("denied", "circuit_open")]
+            with st.expander(f"🩺 Top3 網域健康度（跳過 {len(skipped)} 頁）", expanded=False):
+                st.caption("⏭️ 黑名單（社群 / 影音站解析不出內容）或連續失敗、斷路器打開中的網域不會再抓；"
+                           "Timeout_s 是依該網域 p95 延遲算出的自適應逾時")
+                st.dataframe(get_domain_health().table(links), use_container_width=True)
+
+            # 依排名順序彙整（Top1 用來對照 Content Gap）
+            for i, link in deep_targets:
+                info = results.get(link, {})
                 if info.get("ok") == 1:
                     deep_briefs.append((i, info))
                     gap_pool_h2.extend(info.get("h2", [])[:15])
@@ -1259,8 +866,34 @@ def warroom_page(scope_df: pd.DataFrame, dept_name: str):
 # =========================
 if mode.startswith("🧭"):
     title_prefix = "全校" if selected_college == "全部學院" else selected_college
-    overview_page(target_df, title_prefix)
+    with stage("overview"):
+        with stage("summary"):
+            summary = agg_store.overview(filter_equals, filter_minimums)
+        overview_page(target_mask, title_prefix, summary)
 elif mode.startswith("📌"):
-    onepager_page(target_df, selected_dept)
+    with stage("onepager"):
+        with stage("summary"):
+            summary = agg_store.onepager(selected_dept, filter_equals, filter_minimums)
+        onepager_page(selected_dept, summary)
 else:
-    warroom_page(target_df, selected_dept)
+    with stage("warroom"):
+        with stage("scope_rows"):
+            scope_df = df.take(target_rows)
+        warroom_page(scope_df, selected_dept)
+
+
+# =========================
+# 13) 效能剖析面板（最後才畫：這次 rerun 的各階段都記完了）
+# =========================
+profiler.end()
+if st.session_state.get("prof_on"):
+    with st.sidebar.expander("⏱️ 本次 rerun 各階段耗時", expanded=True):
+        last = profiler.last()
+        if last is not None:
+            st.caption(f"{last['label']}：共 {last['total_ms']:.1f} ms（子階段含在父階段裡；抓頁 / 解析為各執行緒累計）")
+            st.dataframe(run_table(last), use_container_width=True, hide_index=True)
+        if len(profiler.recent) > 1:
+            st.caption("最近幾次 rerun（ms，只列第一層）")
+            st.dataframe(profiler.history(), use_container_width=True, hide_index=True)
+        if profiler.trace_path:
+            st.caption(f"JSONL trace：{profiler.trace_path}（python profiler.py {profiler.trace_path}）")
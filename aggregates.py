@@ -0,0 +1,327 @@
+# 檔案名稱：aggregates.py
+# 彙整結果物化層：總覽（全校 / 各學院）與系主任一頁式（各科系）要顯示的 KPI / 圖表輸入 / 表格
+# key = (種類, 篩選簽章, 範圍)；預設篩選（不篩）在建立時就全部算好，其他組合第一次用到才算
+# 結果存在 school_data.csv 旁的 SQLite（.school_data_cache/<stem>-v<N>-<hash>.agg.sqlite），重開也不用重算
+# 換版時：沒變的科系（一頁式）/ 學院（總覽）直接從上一版的旁檔搬過來，只重算有變動的範圍
+
+import os
+import json
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+
+import pandas as pd
+
+from geo_utils import _dedup_keep_order
+from competitors import DEPT_SORT
+from questions import decision_questions_top10
+from page_store import SqlitePageStore
+from profiler import stage
+
+# 彙整邏輯 / key 格式有改就 +1（舊的物化結果自動作廢）
+AGG_VERSION = 3
+MEMO_SIZE = 256
+
+
+# =========================
+# 1) 共用規則
+# =========================
+def prefer_volume_col(scope_df: pd.DataFrame) -> str:
+    """優先用 Trends_Score（新版主要指標），沒有再 fallback Search_Volume"""
+    if "Trends_Score" in scope_df.columns and scope_df["Trends_Score"].sum() > 0:
+        return "Trends_Score"
+    return "Search_Volume"
+
+def volume_label(vcol: str) -> str:
+    return "Trends 相對聲量" if vcol == "Trends_Score" else "聲量指標"
+
+def _mean(s: pd.Series, nd: int) -> float:
+    # 先用 numpy 的 round（跟原本頁面上的數字一致）再轉成 JSON 存得下的 float
+    return float(round(s.mean(), nd)) if len(s) else 0
+
+
+# =========================
+# 2) 內容缺口 + 下月行動清單（讓系主任能做事）
+# =========================
+def content_gap_suggestions(dept_df: pd.DataFrame):
+    """
+    用你現有欄位先做『可行動』缺口；若有深度解析，還會再加強
+    """
+    # 用平均值看整體弱點
+    faq_rate = dept_df["Has_FAQ"].mean() if len(dept_df) else 0
+    table_rate = dept_df["Has_Table"].mean() if len(dept_df) else 0
+    list_rate = dept_df["Has_List"].mean() if len(dept_df) else 0
+    authority = dept_df["Authority_Count"].mean() if len(dept_df) else 0
+    forum = dept_df["Forum_Count"].mean() if len(dept_df) else 0
+    citable = dept_df["Citable_Score"].mean() if len(dept_df) else 0
+
+    gaps = []
+
+    # 結構化缺口
+    if faq_rate < 0.4:
+        gaps.append("FAQ 沒做滿：補一段『常見問題 8–12 題』，每題 2–4 行，AI 很愛摘。")
+    if table_rate < 0.35:
+        gaps.append("缺少表格：至少做 1 張『課程/實習/證照/出路』整理表或對照表。")
+    if list_rate < 0.5:
+        gaps.append("缺少步驟化清單：把『如何準備/如何實習/如何考照』寫成 6–10 步驟。")
+
+    # 引用缺口
+    if citable < 45 or authority < 0.8:
+        gaps.append("引用不足：涉及薪資/門檻/通過率，務必附『年份+來源類型』（官方/104/招生簡章）。")
+
+    # 社群風險
+    if forum >= 0.7:
+        gaps.append("論壇占比偏高：加一段『理性澄清』，把主觀抱怨轉成可查資訊（流程/口徑/FAQ）。")
+
+    # 決策四大硬題（永遠要有）
+    must_have = [
+        "薪資：用『區間 + 職務/年資』寫法，不要單一數字。",
+        "門檻：整理『近 2–3 年區間』＋入學管道＋引用簡章。",
+        "學分：貼『學分結構表 + 課程地圖』。",
+        "及格率/考照：交代『年份、口徑、母數』並附來源。"
+    ]
+    gaps.extend(must_have)
+
+    return _dedup_keep_order(gaps, max_n=10)
+
+def next_30_days_action_plan(dept_df: pd.DataFrame, top_questions: list, top_competitors: list):
+    """
+    用規則產生系主任看得懂的行動清單（你不用先有 GA4 也能先跑）
+    """
+    actions = []
+
+    # 1) 直接對應學生最常問
+    cats = Counter([x.get("Category") for x in top_questions])
+    top_cat = cats.most_common(1)[0][0] if cats else "其他"
+
+    if top_cat in ["薪資", "分數", "學分", "及格率"]:
+        actions.append(f"做一篇『{top_cat} 一次講清楚』：用表格整理 + 在文中交代年份/來源口徑。")
+    else:
+        actions.append("做一篇『新生懶人包』：課程地圖、實習流程、證照/出路、FAQ 一次到位。")
+
+    # 2) 競品對照
+    if top_competitors:
+        actions.append("做一張『本系 vs 主要競品』對照表（課程/實習/證照/出路/資源），放在文章前半段。")
+
+    # 3) FAQ/可摘錄
+    actions.append("補 FAQ 12 題：直接用學生的原句改寫，答案控制 2–4 行，方便 AI 摘錄。")
+
+    # 4) 引用資料盤點
+    actions.append("盤點可引用資料清單：招生簡章（門檻/管道）、課程地圖（學分）、實習單位、證照/國考成果、就業/薪資佐證。")
+
+    # 5) 社群風險處理
+    if dept_df["Forum_Count"].mean() >= 0.7:
+        actions.append("加『理性澄清』段：針對 Dcard/PTT 常見焦慮（累不累/好不好考/值不值得）逐點回答。")
+
+    return _dedup_keep_order(actions, max_n=6)
+
+
+# =========================
+# 3) 單一範圍的彙整（純函數：rows → dict，可存成 JSON）
+# =========================
+def _records(df: pd.DataFrame) -> list:
+    return json.loads(df.to_json(orient="records", force_ascii=False))
+
+def overview_summary(scope_df: pd.DataFrame) -> dict:
+    """總覽頁：KPI + 四張圖的輸入（都是已經分組好的小表）"""
+    vcol = prefer_volume_col(scope_df)
+
+    def mean_by(col, by="Department"):
+        return (scope_df.groupby(by, as_index=False, observed=True)[col].mean()
+                .sort_values(col, ascending=False))
+
+    def count_by(by):
+        return (scope_df.groupby(by, as_index=False, observed=True).size()
+                .rename(columns={"size": "Count"}).sort_values("Count", ascending=False))
+
+    return {
+        "n": int(len(scope_df)),
+        "clusters": int(scope_df["Cluster_Id"].nunique()) if "Cluster_Id" in scope_df.columns else int(len(scope_df)),
+        "opp": _mean(scope_df["Opportunity_Score"], 1),
+        "ai": _mean(scope_df["AI_Potential"], 1),
+        "citable": _mean(scope_df["Citable_Score"], 1),
+        "vol": _mean(scope_df[vcol], 2),
+        "vcol": vcol,
+        "vol_label": volume_label(vcol),
+        "dept_rank": _records(mean_by("Opportunity_Score")),
+        "type_counts": _records(count_by("Keyword_Type")),
+        "src_rank": _records(count_by("Keyword_Source")),
+        "vol_rank": _records(mean_by(vcol)),
+    }
+
+def onepager_summary(dept_df: pd.DataFrame, comp_idx, dept_name: str) -> dict:
+    """
+    一頁式：快照 KPI、競品 Top5、決策問題 Top10 + 分類、內容缺口、下月行動
+    dept_df 要依 DEPT_SORT 排好（= 一頁式原本的順序，競品同分先後靠這個）
+    """
+    if dept_df.empty:
+        return {"snap": {"n": 0}, "comp_top5": [], "top10_q": [], "cat_rows": [], "gaps": [], "actions": []}
+
+    vcol = prefer_volume_col(dept_df)
+    snap = {
+        "n": int(len(dept_df)),
+        "opp": _mean(dept_df["Opportunity_Score"], 1),
+        "ai": _mean(dept_df["AI_Potential"], 1),
+        "citable": _mean(dept_df["Citable_Score"], 1),
+        "vol": _mean(dept_df[vcol], 2),
+        "vol_label": volume_label(vcol),
+    }
+    with stage("competitor_top5"):
+        comp_top5 = comp_idx.top5(dept_name, dept_df)
+    with stage("questions_top10"):
+        top10_q, cat_rows = decision_questions_top10(dept_df)
+    gaps = content_gap_suggestions(dept_df)
+    actions = next_30_days_action_plan(dept_df, top10_q, comp_top5)
+    return {"snap": snap, "comp_top5": comp_top5, "top10_q": top10_q, "cat_rows": cat_rows,
+            "gaps": gaps, "actions": actions}
+
+
+# =========================
+# 4) 物化層：依篩選簽章 + 範圍存取
+# =========================
+def filter_signature(equals=None, minimums=None) -> str:
+    """篩選條件 → 固定長度的 key（None = 不篩，不進簽章）"""
+    sig = {
+        "eq": {k: str(v) for k, v in sorted((equals or {}).items()) if v is not None},
+        "min": {k: float(v) for k, v in sorted((minimums or {}).items())},
+    }
+    raw = json.dumps(sig, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+class AggregateStore:
+    """
+    每一版資料一個：df / FilterIndex / CompetitorIndex 都是同一版
+    - overview(equals, minimums)：總覽（College 在 equals 裡）
+    - onepager(dept, equals, minimums)：一頁式（College 不影響科系內的 row，不進簽章）
+    查的順序：記憶體 → SQLite 旁檔 → 現算（算完兩邊都寫）
+    prev_path：上一版的旁檔；unchanged_depts / unchanged_colleges 的結果（任何篩選組合）直接沿用
+    """
+
+    def __init__(self, df: pd.DataFrame, fidx, comp_idx, path=None, default_minimums=None,
+                 prev_path=None, unchanged_depts=(), unchanged_colleges=()):
+        self.df = df
+        self.fidx = fidx
+        self.comp_idx = comp_idx
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = None
+        if path:
+            try:
+                self._disk = SqlitePageStore(path)
+            except Exception:
+                self._disk = None
+        self.carried = self.carry_over(prev_path, unchanged_depts, unchanged_colleges) if prev_path else 0
+        self.build_defaults(default_minimums)
+
+    # ---- 快取 ----
+    def _remember(self, key: str, data: dict):
+        with self._lock:
+            self._memo[key] = data
+            self._memo.move_to_end(key)
+            while len(self._memo) > MEMO_SIZE:
+                self._memo.popitem(last=False)
+
+    def _get(self, key: str, build) -> dict:
+        with self._lock:
+            data = self._memo.get(key)
+            if data is not None:
+                self._memo.move_to_end(key)
+                return data
+        with stage("sidecar_get"):
+            data = self._disk.get(key) if self._disk is not None else None
+        if data is None:
+            with stage("compute"):
+                data = build()
+            if self._disk is not None:
+                try:
+                    self._disk.put(key, data)
+                except Exception:
+                    pass
+        self._remember(key, data)
+        return data
+
+    # ---- 範圍 ----
+    def _rows(self, equals, minimums) -> pd.DataFrame:
+        return self.df.take(self.fidx.select(equals=equals, minimums=minimums))
+
+    def _dept_df(self, dept: str, equals, minimums) -> pd.DataFrame:
+        eq = dict(equals or {})
+        eq["Department"] = dept
+        cols, asc = DEPT_SORT
+        return self._rows(eq, minimums).sort_values(cols, ascending=asc)
+
+    @staticmethod
+    def _onepager_equals(equals) -> dict:
+        return {k: v for k, v in (equals or {}).items() if k not in ("College", "Department")}
+
+    def overview_key(self, equals=None, minimums=None) -> str:
+        # 最後一段 = 範圍（學院 / *），換版時靠它判斷能不能沿用
+        scope = (equals or {}).get("College") or "*"
+        return f"v{AGG_VERSION}|overview|{filter_signature(equals, minimums)}|{scope}"
+
+    def onepager_key(self, dept: str, equals=None, minimums=None) -> str:
+        return f"v{AGG_VERSION}|onepager|{filter_signature(self._onepager_equals(equals), minimums)}|{dept}"
+
+    # ---- 對外 ----
+    def overview(self, equals=None, minimums=None) -> dict:
+        return self._get(self.overview_key(equals, minimums),
+                         lambda: overview_summary(self._rows(equals, minimums)))
+
+    def onepager(self, dept: str, equals=None, minimums=None) -> dict:
+        eq = self._onepager_equals(equals)
+        return self._get(self.onepager_key(dept, equals, minimums),
+                         lambda: onepager_summary(self._dept_df(dept, eq, minimums), self.comp_idx, dept))
+
+    def carry_over(self, prev_path: str, unchanged_depts=(), unchanged_colleges=()) -> int:
+        """
+        上一版旁檔裡，範圍沒變的結果搬進這一版（一頁式看科系、總覽看學院；全校總覽一律重算）
+        回傳搬了幾筆
+        """
+        if not os.path.exists(prev_path) or os.path.abspath(prev_path) == os.path.abspath(getattr(self._disk, "path", "")):
+            return 0
+        depts, colleges = set(unchanged_depts), set(unchanged_colleges)
+        if not depts and not colleges:
+            return 0
+        try:
+            prev = SqlitePageStore(prev_path)
+        except Exception:
+            return 0
+
+        items = {}
+        try:
+            for key, data in prev.iter_items():
+                parts = key.split("|", 3)
+                if len(parts) != 4 or parts[0] != f"v{AGG_VERSION}":
+                    continue
+                kind, scope = parts[1], parts[3]
+                if (kind == "onepager" and scope in depts) or (kind == "overview" and scope in colleges):
+                    items[key] = data
+        finally:
+            prev.close()
+
+        if self._disk is not None:
+            try:
+                self._disk.put_many(items)
+            except Exception:
+                pass
+        else:
+            for k, data in items.items():
+                self._remember(k, data)
+        return len(items)
+
+    def build_defaults(self, minimums=None):
+        """不篩選時：全校 + 每個學院的總覽、每個科系的一頁式，先一次算好（旁檔有的就直接載入）"""
+        jobs = [(self.overview_key(None, minimums), lambda: self.overview(None, minimums))]
+        for college in self.fidx.values("College"):
+            eq = {"College": college}
+            jobs.append((self.overview_key(eq, minimums), lambda eq=eq: self.overview(eq, minimums)))
+        for dept in self.fidx.departments():
+            jobs.append((self.onepager_key(dept, None, minimums), lambda d=dept: self.onepager(d, None, minimums)))
+
+        if self._disk is not None:
+            keys = [k for k, _ in jobs]
+            for k, data in self._disk.get_many(keys).items():
+                self._remember(k, data)
+        for _, run in jobs:
+            run()
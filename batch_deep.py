@@ -0,0 +1,254 @@
+# 檔案名稱：batch_deep.py
+# 整個學院 / 全校的批次深度解析：網路 I/O 走執行緒（FetchEngine），頁面解析走 process pool
+# 依科系彙整 number_clues / H2 缺口池 / 結構旗標，產出每系的 humanize_number_output
+#
+# 用法（命令列）：
+#   python batch_deep.py                                  # 全校
+#   python batch_deep.py --college 護理學院 --out deep_nursing.json
+#   python batch_deep.py --workers 16 --per-host 2 --procs 4
+#
+# 快取跟戰情室共用（deep_analysis 的 page store）：還新鮮的頁面直接用，不重抓也不重解析
+# 網址先正規化（url_index.py）：同一頁不管出現在幾列 / 幾系只抓 + 解析一次，結果再分給每一列
+
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+
+import deep_analysis
+from deep_analysis import humanize_number_output, parse_competitor_page, parse_html
+from fetch_engine import FetchEngine
+from geo_utils import _dedup_keep_order, domain_of
+from competitors import DEPT_SORT
+from url_index import UrlIndex, normalize_url
+from profiler import bind
+
+CLUE_KEYS = ["salary", "score", "credits", "passrate"]
+H2_PER_PAGE = 15
+H2_POOL_TOP = 12
+
+
+# =========================
+# 1) 解析丟給 process pool
+# =========================
+class ProcessParser:
+    """
+    parse_competitor_page(parser=...) 用：parse_html 在子行程跑，不佔主行程的 GIL
+    procs <= 1 → 直接在呼叫端執行緒解析；pool 壞掉（子行程被殺）也退回這個模式
+    用 spawn：主行程（Streamlit）有很多執行緒，fork 不安全
+    """
+
+    def __init__(self, procs=None):
+        self.procs = procs or os.cpu_count() or 1
+        self._pool = None
+        if self.procs > 1:
+            self._pool = ProcessPoolExecutor(max_workers=self.procs,
+                                             mp_context=multiprocessing.get_context("spawn"))
+
+    def __call__(self, url: str, html: str) -> dict:
+        pool = self._pool
+        if pool is None:
+            return parse_html(url, html)
+        try:
+            return pool.submit(parse_html, url, html).result()
+        except BrokenProcessPool:
+            self._pool = None
+            return parse_html(url, html)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+# =========================
+# 2) 要抓哪些頁面
+# =========================
+def dept_targets(df: pd.DataFrame, college=None) -> dict:
+    """
+    {科系: [正規化 url, ...]}：科系內依 DEPT_SORT（= 戰情室的排序）逐筆取 Rank1~3_Link
+    同一科系重複的 url（正規化後一樣）只留第一次；非 http 連結略過
+    近似重複關鍵字（同一個 Cluster_Id）的連結也都要：SERP 不一樣就是不同頁，同一頁靠 url 去重只抓一次
+    """
+    if college is not None:
+        df = df[df["College"].astype(str) == str(college)]
+    if df.empty:
+        return {}
+    cols, asc = DEPT_SORT
+    df = df.assign(_dept=df["Department"].astype(str))
+    df = df.sort_values(["_dept"] + cols, ascending=[True] + [asc] * len(cols), kind="stable")
+
+    link_cols = [f"Rank{i}_Link" for i in range(1, 4) if f"Rank{i}_Link" in df.columns]
+    out = {}
+    for dept, g in df.groupby("_dept", sort=True):
+        links = g[link_cols].astype(str).to_numpy().ravel().tolist()  # 逐列 Rank1, Rank2, Rank3
+        out[dept] = [u for u in dict.fromkeys(map(normalize_url, links)) if u]
+    return out
+
+
+# =========================
+# 3) 每系彙整
+# =========================
+def aggregate_department(infos: list) -> dict:
+    """
+    infos：這個科系的頁面結果（依排序）
+    數字線索合併去重（每類 12 則，跟戰情室一樣）→ humanize_number_output
+    H2 池：每頁前 15 個 H2，4–24 字，依「幾頁有提到」排序
+    """
+    agg = {k: [] for k in CLUE_KEYS}
+    h2_pages = Counter()
+    struct = {"has_faq": 0, "has_table": 0, "has_list": 0}
+    ok = 0
+    for info in infos:
+        if info.get("ok") != 1:
+            continue
+        ok += 1
+        nc = info.get("number_clues", {}) or {}
+        for k in CLUE_KEYS:
+            agg[k].extend(nc.get(k, []))
+        h2_pages.update({h for h in info.get("h2", [])[:H2_PER_PAGE] if 4 <= len(h) <= 24})
+        for f in struct:
+            struct[f] += int(info.get(f, 0) or 0)
+
+    for k in agg:
+        agg[k] = _dedup_keep_order(agg[k], max_n=12)
+
+    return {
+        "pages": len(infos),
+        "ok": ok,
+        "failed": len(infos) - ok,
+        "struct": struct,
+        "h2_pool": [{"H2": h, "Pages": n} for h, n in h2_pages.most_common(H2_POOL_TOP)],
+        "number_clues": agg,
+        "human": humanize_number_output(agg),
+    }
+
+
+# =========================
+# 4) 批次工作
+# =========================
+def run_batch(df: pd.DataFrame, college=None, engine=None, procs=None, fetcher=None, progress=None,
+              url_index=None) -> dict:
+    """
+    抓 + 解析 df（或其中一個學院）所有科系的 Top3 頁面，回傳
+    {"departments": {科系: aggregate_department(...)}, "rows": 每列的頁面結果摘要, "stats": {...}}
+    - engine：沒給就自己開一個（結束時關掉）；fetcher 預設 engine.fetch_page
+    - procs：解析用幾個行程（預設 CPU 核心數）
+    - progress(done, total, url, info)：每完成一頁呼叫一次
+    - url_index：整份資料的 UrlIndex（沒給就用 df 現建）；決定抓取順序（越多列共用越先抓）與結果分給哪些列
+    """
+    if college is not None:
+        df = df[df["College"].astype(str) == str(college)]
+    url_index = url_index if url_index is not None else UrlIndex(df)
+    targets = dept_targets(df)
+    urls = url_index.plan(urls=[u for links in targets.values() for u in links], rows=df.index.to_numpy())
+    fetch_to_norm = {url_index.fetch_url(u): u for u in urls}
+
+    own_engine = engine is None
+    engine = engine or FetchEngine(max_workers=16, per_host=2, timeout=10)
+    fetcher = fetcher or engine.fetch_page
+    parser = ProcessParser(procs)
+
+    results = {}
+    t0 = time.perf_counter()
+    try:
+        fn = bind(lambda u: parse_competitor_page(u, fetcher=fetcher, parser=parser))
+        for n, (u, info) in enumerate(engine.run(list(fetch_to_norm), fn), start=1):
+            results[fetch_to_norm[u]] = info
+            if progress:
+                progress(n, len(urls), u, info)
+    finally:
+        parser.close()
+        if own_engine:
+            engine.close()
+    elapsed = time.perf_counter() - t0
+
+    departments = {dept: aggregate_department([results.get(u, {}) for u in links])
+                   for dept, links in targets.items()}
+    rows = url_index.fan_out(results, rows=df.index.to_numpy())
+    ok = sum(1 for info in results.values() if info.get("ok") == 1)
+    stats = {
+        "departments": len(departments),
+        "pages": len(urls),
+        "references": int(rows["Pages"].sum()) if len(rows) else 0,
+        "rows": len(rows),
+        "ok": ok,
+        "failed": len(results) - ok,
+        "procs": parser.procs,
+        "elapsed_sec": round(elapsed, 2),
+        "pages_per_sec": round(len(results) / elapsed, 2) if elapsed > 0 else 0.0,
+    }
+    return {"departments": departments, "rows": json.loads(rows.to_json(orient="records", force_ascii=False)),
+            "stats": stats}
+
+
+def summary_table(batch: dict) -> pd.DataFrame:
+    """每系一列：頁數 / 成功 / 結構旗標 / 各類數字線索筆數 / 最常見 H2"""
+    rows = []
+    for dept, d in batch.get("departments", {}).items():
+        row = {"Department": dept, "Pages": d["pages"], "OK": d["ok"]}
+        for f, v in d["struct"].items():
+            row[f] = v
+        for k in CLUE_KEYS:
+            row[f"{k}_clues"] = len(d["number_clues"][k])
+        row["Top_H2"] = "、".join(x["H2"] for x in d["h2_pool"][:3])
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+# =========================
+# 5) 命令列
+# =========================
+def main(argv=None):
+    from data_loader import DATA_FILE, load_school_data
+    from page_store import open_page_store
+
+    ap = argparse.ArgumentParser(description="整個學院 / 全校的批次深度解析")
+    ap.add_argument("--csv", default=DATA_FILE)
+    ap.add_argument("--college", default=None, help="只跑這個學院（預設全校）")
+    ap.add_argument("--cache", default=deep_analysis.CACHE_PATH)
+    ap.add_argument("--workers", type=int, default=16, help="抓取執行緒上限")
+    ap.add_argument("--per-host", type=int, default=2, help="同一 host 同時最多幾個請求")
+    ap.add_argument("--procs", type=int, default=None, help="解析行程數（預設 CPU 核心數）")
+    ap.add_argument("--timeout", type=float, default=10)
+    ap.add_argument("--out", default=None, help="結果存成 JSON")
+    ap.add_argument("--quiet", action="store_true")
+    args = ap.parse_args(argv)
+
+    deep_analysis.set_page_store(open_page_store(args.cache))
+    df, _ = load_school_data(args.csv)
+    engine = FetchEngine(max_workers=args.workers, per_host=args.per_host, timeout=args.timeout)
+
+    log = None
+    if not args.quiet:
+        def log(n, total, u, info):
+            status = "ok  " if info.get("ok") == 1 else "fail"
+            print(f"[{n}/{total}] {status} {domain_of(u)}", flush=True)
+
+    try:
+        batch = run_batch(df, college=args.college, engine=engine, procs=args.procs, progress=log)
+    finally:
+        engine.close()
+
+    print(summary_table(batch).to_string(index=False))
+    s = batch["stats"]
+    print(f"\n{s['departments']} 系 / {s['pages']} 個不重複頁面（分給 {s['rows']} 列、{s['references']} 個引用）："
+          f"成功 {s['ok']}、失敗 {s['failed']}，"
+          f"{s['elapsed_sec']} 秒（{s['pages_per_sec']} 頁/秒，解析 {s['procs']} 行程）")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(batch, f, ensure_ascii=False, indent=2)
+        print(f"已寫入 {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+# 檔案名稱：bench/bench_batch_deep.py
+# batch_deep.run_batch：解析放在主行程（procs=1）vs process pool（procs=N）
+# 不連網：fetcher 回傳合成頁面（bench_parse_html.make_html）+ 固定延遲；快取用記憶體版
+#
+# 用法（在專案根目錄）：
+#   python bench/bench_batch_deep.py
+#   python bench/bench_batch_deep.py --depts 20 --rows 30 --blocks 800 --latency 0.05 --procs 1 2 4
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd
+
+import deep_analysis
+from batch_deep import run_batch
+from fetch_engine import FetchEngine
+from bench_parse_html import make_html
+
+
+class MemPageStore:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, url):
+        return self.data.get(url)
+
+    def get_many(self, urls):
+        return {u: self.data[u] for u in urls if u in self.data}
+
+    def put(self, url, data):
+        self.data[url] = data
+
+
+def make_df(n_depts: int, rows: int) -> pd.DataFrame:
+    recs = []
+    for d in range(n_depts):
+        for r in range(rows):
+            rec = {"College": f"學院{d % 3}", "Department": f"系{d:02d}",
+                   "Opportunity_Score": float(r), "AI_Potential": r % 5}
+            for i in range(1, 4):
+                rec[f"Rank{i}_Link"] = f"https://site{(d * rows + r + i) % 40}.example/p{d}-{r}-{i}"
+            recs.append(rec)
+    return pd.DataFrame(recs)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--depts", type=int, default=12)
+    ap.add_argument("--rows", type=int, default=20)
+    ap.add_argument("--blocks", type=int, default=600, help="每頁合成 HTML 的區塊數（越大越吃 CPU）")
+    ap.add_argument("--latency", type=float, default=0.02, help="每頁模擬網路延遲（秒）")
+    ap.add_argument("--procs", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    args = ap.parse_args(argv)
+
+    df = make_df(args.depts, args.rows)
+    pages = {}
+
+    def fetcher(url, etag=None, last_modified=None, timeout=None):
+        time.sleep(args.latency)
+        html = pages.get(url)
+        if html is None:
+            html = pages[url] = make_html(args.blocks, seed=hash(url) % 1000)
+        return {"status": 200, "html": html, "etag": "", "last_modified": ""}
+
+    print(f"cpu={os.cpu_count()}  {args.depts} 系 × {args.rows} 列 × 3 連結")
+    print(f"{'procs':>5} {'pages':>6} {'sec':>7} {'pages/s':>8}  same")
+    base = None
+    for procs in dict.fromkeys(args.procs):
+        deep_analysis.set_page_store(MemPageStore())
+        engine = FetchEngine(max_workers=16, per_host=4)
+        try:
+            batch = run_batch(df, engine=engine, procs=procs, fetcher=fetcher)
+        finally:
+            engine.close()
+        s = batch["stats"]
+        depts = batch["departments"]
+        same = True if base is None else depts == base
+        base = base or depts
+        print(f"{procs:>5} {s['pages']:>6} {s['elapsed_sec']:>7.2f} {s['pages_per_sec']:>8.1f}  {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# 檔案名稱：bench/bench_fetch_replay.py
+# 抓取路徑離線壓測：FetchEngine → parse_competitor_page 打本機重播 server（http_replay.py），可重現的延遲 / 錯誤 / 卡住
+# 頁面來源：--cassette 錄好的真實回應；沒給就用 school_data.csv 的 Top3 網址 + 合成頁面（bench/synth_data.py）
+# 每組 (workers, timeout)：冷快取跑一次 → 同一個快取再跑一次（看快取有沒有擋掉重抓）
+# 同一個 --seed 每次注入的故障都一樣，不同設定之間可以直接比
+# --blocked / --dead：這些網域一律回 403 / 卡住不回；每組設定各跑「網域健康度關 / 開」兩次，看斷路器省下多少時間
+#
+# 用法（在專案根目錄）：
+#   python bench/bench_fetch_replay.py
+#   python bench/bench_fetch_replay.py --pages 300 --latency 0.2 --jitter 0.3 --error-rate 0.05 --hang-rate 0.02 \
+#       --workers 4 8 16 --timeouts 2 5 --per-host 2
+#   python bench/bench_fetch_replay.py --cassette replay.jsonl --replay-latency
+#   python bench/bench_fetch_replay.py --blocked dcard.tw --dead public.com.tw --timeouts 5
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+import deep_analysis
+from domain_health import DomainHealth
+from fetch_engine import FetchEngine
+from http_replay import Cassette, Faults, ReplayServer
+from precrawl import collect_links
+from bench_suite import MemPageStore
+from synth_data import load_templates, make_corpus
+
+
+def synth_cassette(path: str, n_pages: int, seed=0) -> Cassette:
+    """school_data.csv 的 Top3 網址（前 n_pages 個）→ 合成頁面寫進 cassette"""
+    cassette = Cassette(path)
+    urls = collect_links("school_data.csv")[:n_pages]
+    cassette.put_pages(make_corpus(urls, seed=seed, templates=load_templates()))
+    return cassette
+
+
+def run_once(engine: FetchEngine, urls: list) -> dict:
+    """engine.run 全部跑完：每頁耗時（送出 → 完成）、成功 / 失敗數"""
+    t0 = time.perf_counter()
+    done_at = []
+    ok = skipped = 0
+    for _, info in engine.run(urls):
+        done_at.append(time.perf_counter() - t0)
+        ok += 1 if info.get("ok") == 1 else 0
+        skipped += 1 if info.get("reason") in ("denied", "circuit_open") else 0
+    elapsed = time.perf_counter() - t0
+    ms = np.array(done_at) * 1000 if done_at else np.zeros(1)
+    return {"sec": elapsed, "ok": ok, "fail": len(urls) - ok, "skipped": skipped,
+            "p50_ms": float(np.percentile(ms, 50)), "p95_ms": float(np.percentile(ms, 95))}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="FetchEngine 打本機重播 server 的離線壓測")
+    ap.add_argument("--cassette", default=None, help="錄好的 cassette（沒給就用合成頁面）")
+    ap.add_argument("--pages", type=int, default=200)
+    ap.add_argument("--workers", type=int, nargs="+", default=[4, 16])
+    ap.add_argument("--timeouts", type=float, nargs="+", default=[2.0])
+    ap.add_argument("--per-host", type=int, default=2)
+    ap.add_argument("--retries", type=int, default=0)
+    ap.add_argument("--latency", type=float, default=0.1)
+    ap.add_argument("--jitter", type=float, default=0.2)
+    ap.add_argument("--bytes-per-sec", type=int, default=0)
+    ap.add_argument("--error-rate", type=float, default=0.05)
+    ap.add_argument("--redirect-rate", type=float, default=0.05)
+    ap.add_argument("--non-html-rate", type=float, default=0.03)
+    ap.add_argument("--hang-rate", type=float, default=0.02)
+    ap.add_argument("--replay-latency", action="store_true")
+    ap.add_argument("--blocked", nargs="*", default=["dcard.tw"], help="一律回 403 的網域")
+    ap.add_argument("--dead", nargs="*", default=[], help="一律卡住不回的網域")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    if not deep_analysis.HAS_REQUESTS:
+        print("❌ 需要 requests：pip install requests", file=sys.stderr)
+        return 2
+
+    tmp = tempfile.mkdtemp(prefix="powergeo_replay_")
+    cassette = Cassette(args.cassette) if args.cassette else synth_cassette(os.path.join(tmp, "synth.jsonl"), args.pages, args.seed)
+    urls = cassette.urls()[:args.pages]
+    by_domain = {d: {"status": 403} for d in args.blocked}
+    by_domain.update({d: {"hang_rate": 1.0} for d in args.dead})
+    faults = Faults(latency=args.latency, jitter=args.jitter, bytes_per_sec=args.bytes_per_sec,
+                    error_rate=args.error_rate, redirect_rate=args.redirect_rate, non_html_rate=args.non_html_rate,
+                    hang_rate=args.hang_rate, hang_sec=max(args.timeouts) * 3, replay_latency=args.replay_latency,
+                    by_domain=by_domain, seed=args.seed)
+
+    print(f"cpu={os.cpu_count()}  {len(urls)} 頁  latency={args.latency}+{args.jitter}s  error={args.error_rate}  "
+          f"redirect={args.redirect_rate}  non_html={args.non_html_rate}  hang={args.hang_rate}  per_host={args.per_host}"
+          f"  blocked={args.blocked}  dead={args.dead}")
+    print(f"{'workers':>7} {'timeout':>7} {'health':>6} {'sec':>7} {'pages/s':>8} {'ok':>5} {'fail':>5} {'skip':>5}"
+          f" {'p50_ms':>8} {'p95_ms':>8} {'warm_sec':>8} {'warm_req':>8}  server")
+    configs = [(w, t, on) for w in args.workers for t in args.timeouts for on in (False, True)]
+    for workers, timeout, health_on in configs:
+        deep_analysis.set_page_store(MemPageStore())
+        srv = ReplayServer(cassette, faults).start()
+        engine = FetchEngine(max_workers=workers, per_host=args.per_host, timeout=timeout,
+                             retries=args.retries, session=srv.session(pool_size=workers),
+                             health=DomainHealth(None, enabled=health_on))
+        try:
+            cold = run_once(engine, urls)
+            before = srv.stats()["requests"]
+            warm = run_once(engine, urls)
+            warm_req = srv.stats()["requests"] - before
+        finally:
+            engine.close()
+            srv.close()
+        outcomes = " ".join(f"{k}={v}" for k, v in sorted(srv.stats()["outcomes"].items()))
+        print(f"{workers:>7} {timeout:>7.1f} {'on' if health_on else 'off':>6} {cold['sec']:>7.2f}"
+              f" {len(urls) / cold['sec']:>8.1f} {cold['ok']:>5} {cold['fail']:>5} {cold['skipped']:>5}"
+              f" {cold['p50_ms']:>8.0f} {cold['p95_ms']:>8.0f} {warm['sec']:>8.2f} {warm_req:>8}  {outcomes}", flush=True)
+    deep_analysis.set_page_store(None)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
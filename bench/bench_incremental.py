@@ -0,0 +1,145 @@
+# 檔案名稱：bench/bench_incremental.py
+# school_data.csv 換版：全部重算 vs 增量（只重算有變動的科系）
+# 流程：合成 N 系的 CSV → 建第一版（載入 + 競品 + 彙整）→ 改其中 K 系再寫回 → 兩種方式各建一次第二版
+# 比時間，並確認增量版的 df（含沿用上一版的 Cluster_Id / Canonical_Keyword）/ 競品 Top5 / 彙整結果跟全部重算一樣
+# 關鍵字是「系名 中段 意圖」，中段有一部分是系名的換句話說（系名科 / 我是系名人），每系都會有近似重複的群
+#
+# 用法（在專案根目錄）：
+#   python bench/bench_incremental.py
+#   python bench/bench_incremental.py --depts 40 --rows 300 --touch 3
+
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from aggregates import AggregateStore
+from competitors import CompetitorIndex
+from data_loader import diff_manifests, file_version, load_manifest, load_school_data, previous_manifest, sidecar_path
+from filter_index import FilterIndex
+
+SCHOOLS = ["台北醫學大學", "長庚科技大學", "輔英科技大學", "弘光科技大學", "慈濟大學", "馬偕醫學院", "中華醫事科技大學"]
+SITES = ["www.tmu.edu.tw", "www.cgust.edu.tw", "www.dcard.tw", "www.104.com.tw", "www.hk.edu.tw", "www.ptt.cc"]
+WORDS = ["薪水", "分數", "學分", "國考", "實習", "出路", "宿舍", "評價", "課程", "門檻", "好不好", "要不要讀"]
+INTENTS = ["是什麼", "實習", "需要證照嗎", "工作內容", "怎麼準備"]
+MINIMUMS = {"AI_Potential": 0, "Opportunity_Score": 0}
+
+
+def make_rows(dept: str, college: str, rows: int, rnd: random.Random) -> list:
+    out = []
+    for r in range(rows):
+        rec = {
+            "College": college, "Department": dept,
+            "Keyword": f"{dept} {rnd.choice([dept, dept + '科', f'我是{dept}人', rnd.choice(WORDS) + str(r % 7)])} "
+                       f"{rnd.choice(INTENTS)}",
+            "Keyword_Source": rnd.choice(["autocomplete", "seed", "paa"]),
+            "Keyword_Type": rnd.choice(["資訊", "比較", "一般"]),
+            "Evidence": "證據" * rnd.randint(5, 40),
+            "Opportunity_Score": rnd.randint(0, 100), "AI_Potential": rnd.randint(0, 100),
+            "Trends_Score": round(rnd.random() * 100, 2), "Citable_Score": rnd.randint(0, 100),
+            "Has_FAQ": rnd.randint(0, 1), "Forum_Count": rnd.randint(0, 2),
+        }
+        for i in range(1, 4):
+            rec[f"Rank{i}_Title"] = f"{rnd.choice(SCHOOLS)}{dept}介紹｜{rnd.choice(WORDS)}"
+            rec[f"Rank{i}_Link"] = f"https://{rnd.choice(SITES)}/p{r}-{i}"
+            rec[f"Rank{i}_Snippet"] = "摘要" * rnd.randint(5, 30)
+        out.append(rec)
+    return out
+
+
+def build(path: str, incremental: bool, prev_comp=None):
+    """一版完整建置：載入 → FilterIndex → CompetitorIndex → AggregateStore（預設範圍全部算好）"""
+    version = file_version(path)
+    df, _ = load_school_data(path, version=version)
+    fidx = FilterIndex(df)
+    changes = None
+    if incremental:
+        prev = previous_manifest(path, version)
+        changes = diff_manifests(prev, load_manifest(path, version)) if prev else None
+    if changes and prev_comp is not None:
+        comp = CompetitorIndex(df, prev=prev_comp, unchanged=changes["unchanged"])
+        agg = AggregateStore(df, fidx, comp, path=sidecar_path(path, version, ".agg.sqlite"),
+                             default_minimums=MINIMUMS,
+                             prev_path=sidecar_path(path, changes["prev_version"], ".agg.sqlite"),
+                             unchanged_depts=changes["unchanged"], unchanged_colleges=changes["unchanged_colleges"])
+    else:
+        comp = CompetitorIndex(df)
+        agg = AggregateStore(df, fidx, comp, path=sidecar_path(path, version, ".agg.sqlite"), default_minimums=MINIMUMS)
+    return df, comp, agg, changes
+
+
+def snapshot(comp, agg) -> dict:
+    out = {"top5": comp.top5_by_dept}
+    for college in agg.fidx.values("College"):
+        out[f"overview|{college}"] = agg.overview({"College": college}, MINIMUMS)
+    for dept in agg.fidx.departments():
+        out[f"onepager|{dept}"] = agg.onepager(dept, None, MINIMUMS)
+    return out
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--depts", type=int, default=40)
+    ap.add_argument("--rows", type=int, default=300, help="每系幾列")
+    ap.add_argument("--touch", type=int, default=3, help="第二版改動幾個系")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    rnd = random.Random(args.seed)
+    depts = [(f"系{d:02d}", f"學院{d % 5}") for d in range(args.depts)]
+    rows = {d: make_rows(d, c, args.rows, rnd) for d, c in depts}
+
+    tmp = tempfile.mkdtemp(prefix="bench_incremental_")
+    try:
+        inc_csv = os.path.join(tmp, "inc", "school_data.csv")
+        full_csv = os.path.join(tmp, "full", "school_data.csv")
+        for p in (inc_csv, full_csv):
+            os.makedirs(os.path.dirname(p))
+
+        def write(p):
+            pd.DataFrame([r for d, _ in depts for r in rows[d]]).to_csv(p, index=False)
+
+        write(inc_csv)
+        t0 = time.perf_counter()
+        _, comp1, _, _ = build(inc_csv, incremental=True)
+        t_first = time.perf_counter() - t0
+
+        # 第二版：挑 K 個系，改分數 / 刪一列 / 加一列
+        for d, c in rnd.sample(depts, args.touch):
+            rows[d] = rows[d][1:] + make_rows(d, c, 1, rnd)
+            rows[d][0]["Opportunity_Score"] = rnd.randint(0, 100)
+        write(inc_csv)
+        write(full_csv)
+
+        t0 = time.perf_counter()
+        _, comp_f, agg_f, _ = build(full_csv, incremental=False)
+        t_full = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        df_i, comp_i, agg_i, changes = build(inc_csv, incremental=True, prev_comp=comp1)
+        t_inc = time.perf_counter() - t0
+
+        df_f, _ = load_school_data(full_csv)
+        same = df_i.equals(df_f) and snapshot(comp_i, agg_i) == snapshot(comp_f, agg_f)
+        cl_cols = ["Cluster_Id", "Canonical_Keyword"]
+        same_clusters = df_i[cl_cols].equals(df_f[cl_cols])
+        merged = int(len(df_f) - df_f["Cluster_Id"].nunique())
+        print(f"{args.depts} 系 × {args.rows} 列；第一版 {t_first:.2f}s")
+        print(f"第二版：變動 {len(changes['changed'])}、新增 {len(changes['added'])}、移除 {len(changes['removed'])}，"
+              f"沿用 {len(changes['unchanged'])} 系 / {len(changes['unchanged_colleges'])} 學院（搬了 {agg_i.carried} 筆彙整）")
+        print(f"近似重複分群：{df_f['Cluster_Id'].nunique()} 群（併掉 {merged} 列），增量版跟全部重算一樣：{same_clusters}")
+        print(f"{'full(s)':>8} {'incr(s)':>8} {'speedup':>8}  same")
+        print(f"{t_full:>8.2f} {t_inc:>8.2f} {t_full / t_inc:>7.1f}x  {same}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
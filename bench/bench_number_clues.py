@@ -0,0 +1,111 @@
+# 檔案名稱：bench/bench_number_clues.py
+# classify_number_clues：視窗內 regex 比對 + 提早結束版 vs 原本「每個數字 × 每個關鍵字」逐一比對版
+#
+# 用法（在專案根目錄）：
+#   python bench/bench_number_clues.py
+#   python bench/bench_number_clues.py --sizes 20000 200000 1000000 --repeat 3
+
+import os
+import re
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from geo_utils import _dedup_keep_order
+from deep_analysis import (
+    NUM_PATTERN, KW_PASS, KW_CREDITS, KW_SALARY, KW_SCORE, classify_number_clues,
+)
+
+
+def classify_number_clues_naive(text: str) -> dict:
+    """原本的逐一比對版（對照組）"""
+    clues = {"salary": [], "score": [], "credits": [], "passrate": []}
+    if not text:
+        return clues
+    t = text.replace("％", "%")
+
+    for m in re.finditer(NUM_PATTERN, t):
+        val = m.group(0)
+        s = max(0, m.start() - 26)
+        e = min(len(t), m.end() + 26)
+        ctx = t[s:e].strip()
+        if len(ctx) > 95:
+            ctx = ctx[:95] + "…"
+
+        if ("%" in val or "%" in ctx) and any(k in ctx for k in KW_PASS):
+            clues["passrate"].append(ctx)
+            continue
+        if any(k in ctx for k in KW_CREDITS) or ("學分" in ctx):
+            clues["credits"].append(ctx)
+            continue
+        if any(k in ctx for k in KW_SALARY):
+            clues["salary"].append(ctx)
+            continue
+        if any(k in ctx for k in KW_SCORE):
+            clues["score"].append(ctx)
+            continue
+
+    for k in clues:
+        clues[k] = _dedup_keep_order(clues[k], max_n=12)
+    return clues
+
+
+FILLER = "本系課程規劃以實務為導向學生可依興趣選擇不同模組並參與校外實習與產學合作計畫同時培養跨領域能力"
+KEYWORDS = KW_PASS + KW_CREDITS + KW_SALARY + KW_SCORE
+
+def make_page(n_chars: int, seed=0, keyword_rate=0.02, number_rate=0.03) -> str:
+    """像競品頁面的長文字：中文填充 + 隨機數字（含 % / 小數）+ 隨機關鍵字"""
+    rnd = random.Random(seed)
+    out = []
+    size = 0
+    while size < n_chars:
+        r = rnd.random()
+        if r < number_rate:
+            x = str(rnd.randint(1, 200000))
+            if rnd.random() < 0.2:
+                x += "." + str(rnd.randint(0, 99))
+            if rnd.random() < 0.15:
+                x += rnd.choice(["%", "％"])
+            piece = x
+        elif r < number_rate + keyword_rate:
+            piece = rnd.choice(KEYWORDS)
+        else:
+            i = rnd.randrange(len(FILLER) - 8)
+            piece = FILLER[i:i + rnd.randint(2, 8)]
+        out.append(piece)
+        size += len(piece)
+    return "".join(out)
+
+
+def timeit(fn, arg, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[20000, 200000, 1000000])
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args(argv)
+
+    print(f"{'chars':>10} {'naive(ms)':>10} {'new(ms)':>10} {'speedup':>8}  same")
+    # 「數字多、關鍵字少」= 四類很難收滿 → 看純掃描速度；「關鍵字密」= 會提早結束
+    for label, kw_rate in [("sparse", 0.005), ("dense", 0.05)]:
+        print(f"-- {label} keywords --")
+        for n in args.sizes:
+            page = make_page(n, seed=n, keyword_rate=kw_rate)
+            same = classify_number_clues_naive(page) == classify_number_clues(page)
+            a = timeit(classify_number_clues_naive, page, args.repeat)
+            b = timeit(classify_number_clues, page, args.repeat)
+            print(f"{n:>10} {a * 1000:>10.1f} {b * 1000:>10.1f} {a / b:>7.1f}x  {same}")
+
+
+if __name__ == "__main__":
+    main()
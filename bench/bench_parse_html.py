@@ -0,0 +1,194 @@
+# 檔案名稱：bench/bench_parse_html.py
+# parse_html：串流版（page_parser）vs 原本 BeautifulSoup 建整棵樹版
+# 比時間、尖峰記憶體（tracemalloc），並確認結果一樣
+# --fuzz N：另外產生 N 段隨機的破損 HTML（沒關的 / 多餘的結束標籤、<br>…</br>、巢狀清單、註解、實體字元）逐段比對
+#
+# 用法（在專案根目錄；需要 beautifulsoup4）：
+#   python bench/bench_parse_html.py
+#   python bench/bench_parse_html.py --sizes 50 500 5000 --repeat 3
+#   python bench/bench_parse_html.py --sizes --fuzz 20000 --seed 1
+
+import os
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+
+from geo_utils import _dedup_keep_order
+from deep_analysis import FAQ_HINTS, classify_number_clues, parse_html
+
+
+def parse_html_bs4(url: str, html: str) -> dict:
+    """原本的 BeautifulSoup 版（對照組）"""
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(["script", "style", "noscript"]):
+        tag.decompose()
+
+    title = soup.title.get_text(strip=True) if soup.title else ""
+    meta = soup.find("meta", attrs={"name": "description"})
+    meta_desc = meta.get("content", "").strip() if meta else ""
+
+    h1_tag = soup.find("h1")
+    h1 = h1_tag.get_text(" ", strip=True) if h1_tag else ""
+    h2 = [x.get_text(" ", strip=True) for x in soup.find_all("h2")][:25]
+    h3 = [x.get_text(" ", strip=True) for x in soup.find_all("h3")][:25]
+
+    has_table = 1 if soup.find("table") else 0
+    has_list = 1 if soup.find(["ul", "ol"]) else 0
+
+    text = soup.get_text(" ", strip=True)
+    has_faq = 1 if any(h in text for h in FAQ_HINTS) else 0
+
+    bullets = []
+    for ul in soup.find_all(["ul", "ol"])[:3]:
+        for li in ul.find_all("li")[:8]:
+            t = li.get_text(" ", strip=True)
+            if 8 <= len(t) <= 90:
+                bullets.append(t)
+    bullets = _dedup_keep_order(bullets, max_n=14)
+
+    return {
+        "url": url, "ok": 1,
+        "title": title, "meta_desc": meta_desc,
+        "h1": h1, "h2": h2, "h3": h3,
+        "has_table": has_table, "has_list": has_list, "has_faq": has_faq,
+        "number_clues": classify_number_clues(text),
+        "bullets": bullets,
+        "text_preview": text[:900],
+    }
+
+
+FILLER = "本系課程規劃以實務為導向學生可依興趣選擇不同模組並參與校外實習與產學合作計畫畢業學分128學分起薪約3萬2千元國考及格率85%"
+
+def make_html(n_blocks: int, seed=0) -> str:
+    """像學校 / 補習班頁面：nav、script、表格、清單（含巢狀）、FAQ、很多段落"""
+    rnd = random.Random(seed)
+
+    def words(a, b):
+        i = rnd.randrange(len(FILLER) - b)
+        return FILLER[i:i + rnd.randint(a, b)]
+
+    out = [
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>",
+        f"<title> {words(6, 20)} | 招生資訊 </title>",
+        f'<meta name="description" content=" {words(20, 60)} ">',
+        "<style>body{font-family:sans-serif}</style>",
+        "<script>var x = '<h2>not a heading</h2>'; window.dataLayer=[];</script>",
+        "</head><body><nav><ul>" + "".join(f"<li><a href='/p{i}'>{words(2, 6)}</a></li>" for i in range(8)) + "</ul></nav>",
+        f"<h1>{words(4, 12)} <small>{words(2, 5)}</small></h1>",
+        "<noscript><h2>請開啟 JavaScript</h2><table></table></noscript>",
+    ]
+    for b in range(n_blocks):
+        r = rnd.random()
+        if r < 0.1:
+            out.append(f"<h2>{words(4, 16)}</h2>")
+        elif r < 0.15:
+            out.append(f"<h3>{words(4, 16)}<!-- c --></h3>")
+        elif r < 0.2:
+            items = "".join(f"<li>{words(6, 40)}</li>" for _ in range(rnd.randint(2, 10)))
+            nested = f"<li>{words(6, 20)}<ol><li>{words(8, 30)}</li></ol></li>" if rnd.random() < 0.3 else ""
+            out.append(f"<ul>{items}{nested}</ul>")
+        elif r < 0.23:
+            rows = "".join(f"<tr><td>{words(2, 8)}</td><td>{rnd.randint(1, 999)}</td></tr>" for _ in range(5))
+            out.append(f"<table>{rows}</table>")
+        elif r < 0.25:
+            out.append(f"<div class='faq'><h3>常見問題 Q&amp;A</h3><p>{words(10, 40)}</p></div>")
+        elif r < 0.27:
+            out.append(f"<script>console.log('{words(5, 20)}')</script>")
+        else:
+            out.append(f"<p>{words(10, 60)} <b>{rnd.randint(1, 100)}%</b> &nbsp;{words(5, 30)}</p>")
+    out.append("<footer>" + words(10, 30) + "</footer></body></html>")
+    return "\n".join(out)
+
+
+FUZZ_TAGS = ["div", "p", "ul", "ol", "li", "h1", "h2", "h3", "title", "table", "tr", "td", "span",
+             "noscript", "script", "style", "b", "section"]
+FUZZ_VOID = ["br", "img", "meta", "hr", "input"]
+FUZZ_TEXTS = ["常見問題", "學分 128", "起薪 3萬", "及格率 90%", "  ", "\n", "a&amp;b", "&nbsp;", "x &lt; y", "FAQ", "短",
+              "這是一段比較長的清單項目文字內容"]
+FUZZ_META = ['<meta name="description" content=" d1 ">', '<meta name="description">',
+             '<meta name="Description" content="x">', '<meta content="c2" name="description"/>']
+
+
+def make_snippet(rnd: random.Random) -> str:
+    """一小段隨機的破損 HTML"""
+    out = []
+    for _ in range(rnd.randint(1, 60)):
+        r = rnd.random()
+        if r < 0.28:
+            out.append(f"<{rnd.choice(FUZZ_TAGS)}>")
+        elif r < 0.46:
+            out.append(f"</{rnd.choice(FUZZ_TAGS)}>")
+        elif r < 0.52:
+            out.append(f"<{rnd.choice(FUZZ_VOID)}>" if rnd.random() < 0.5 else f"<{rnd.choice(FUZZ_VOID)} src=x/>")
+        elif r < 0.56:
+            out.append(f"</{rnd.choice(FUZZ_VOID)}>")
+        elif r < 0.58:
+            out.append(rnd.choice(FUZZ_META))
+        elif r < 0.60:
+            out.append("<!-- com -->")
+        elif r < 0.62:
+            out.append(f"<{rnd.choice(FUZZ_TAGS)}/>")
+        else:
+            out.append(rnd.choice(FUZZ_TEXTS))
+    return "".join(out)
+
+
+def fuzz(n: int, seed=0, show=3) -> int:
+    """n 段隨機破損 HTML 逐段比對兩個版本，回傳不一樣的段數（前 show 段印出來）"""
+    rnd = random.Random(seed)
+    bad = 0
+    for _ in range(n):
+        html = make_snippet(rnd)
+        a, b = parse_html_bs4("u", html), parse_html("u", html)
+        if a != b:
+            bad += 1
+            if bad <= show:
+                print(f"  ❌ {html!r}\n     {({k: (a[k], b[k]) for k in a if a[k] != b[k]})}")
+    return bad
+
+
+def measure(fn, html, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn("u", html)
+        best = min(best, time.perf_counter() - t0)
+    tracemalloc.start()
+    fn("u", html)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="*", default=[50, 500, 5000])
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--fuzz", type=int, default=2000, help="隨機破損 HTML 段數（0 = 不比）")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    if args.fuzz:
+        bad = fuzz(args.fuzz, seed=args.seed)
+        print(f"fuzz：{args.fuzz} 段破損 HTML，不一樣 {bad} 段\n")
+    if not args.sizes:
+        return
+
+    print(f"{'blocks':>7} {'KB':>7} {'bs4(ms)':>9} {'new(ms)':>9} {'speedup':>8} {'bs4(MB)':>8} {'new(MB)':>8}  same")
+    for n in args.sizes:
+        html = make_html(n, seed=n)
+        same = parse_html_bs4("u", html) == parse_html("u", html)
+        ta, ma = measure(parse_html_bs4, html, args.repeat)
+        tb, mb = measure(parse_html, html, args.repeat)
+        print(f"{n:>7} {len(html.encode()) / 1024:>7.0f} {ta * 1000:>9.1f} {tb * 1000:>9.1f} {ta / tb:>7.1f}x "
+              f"{ma / 2**20:>8.1f} {mb / 2**20:>8.1f}  {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+# 檔案名稱：bench/bench_suite.py
+# 合成規模的效能回歸測試：10k / 100k / 1M 列的 school_data.csv 形狀資料 + 競品 HTML 語料（bench/synth_data.py）
+# 每個目標量「最佳秒數（repeat 次取最小）」與「記憶體峰值（tracemalloc，另跑一次）」，跟 bench/baselines.json 比較：
+# 秒數或峰值超過基準 × tolerance（且差距大於雜訊下限）就算退步，結束碼 1（CI 可直接用）
+# 目標：
+# - load_normalize：load_school_data（不用 sidecar：read_csv + normalize_school_df 全做）
+# - competitor_index：CompetitorIndex 整份建一次
+# - competitor_top5_from_dept / decision_questions_top10 / content_gap_suggestions：抽樣幾個科系，每系呼叫一次
+# - classify_number_clues / humanize_number_output：語料每頁的內文 / 數字線索
+# - parse_competitor_page：語料每頁（假 fetcher + 記憶體快取，每輪都是冷快取）
+# 1M 列：摘要截到 48 字（約 0.5 GB CSV），不然 5 GB 記憶體的機器 read_csv + normalize 就被 OOM 砍掉；--snippet-chars 可改
+# 注意：tracemalloc 只算 Python / numpy 的配置；pandas 字串欄（pyarrow）的 buffer 不在裡面
+# 基準是在某台機器上量的（_meta 記錄環境），換機器先 --save 重建再比
+#
+# 用法（在專案根目錄）：
+#   python bench/bench_suite.py                          # 10k + 100k，跟基準比較
+#   python bench/bench_suite.py --sizes 10k 100k 1M --repeat 1
+#   python bench/bench_suite.py --targets load_normalize parse_competitor_page
+#   python bench/bench_suite.py --save                   # 這次結果寫回基準
+#   python bench/bench_suite.py --out result.json --tolerance 1.3
+
+import os
+import gc
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pandas as pd
+
+import deep_analysis
+from data_loader import load_school_data
+from aggregates import content_gap_suggestions
+from competitors import DEPT_SORT, CompetitorIndex, competitor_top5_from_dept
+from questions import decision_questions_top10
+from deep_analysis import classify_number_clues, humanize_number_output, parse_competitor_page
+from page_parser import scan_html
+from synth_data import SIZES, SNIPPET_CHARS, corpus_urls, load_templates, make_corpus, write_school_csv
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+TOLERANCE = 1.5
+MIN_SEC = 0.005        # 差距小於這個（秒）不算退步：太短的量測雜訊比例大
+MIN_MB = 1.0
+DEPT_SAMPLE = 40       # 每系呼叫的目標：抽幾個科系
+PAGES = {"10k": 100, "100k": 300, "1M": 600}
+SNIPPETS = {"1M": 48}  # 其他規模用 synth_data.SNIPPET_CHARS
+
+TARGETS = [
+    "load_normalize", "competitor_index",
+    "competitor_top5_from_dept", "decision_questions_top10", "content_gap_suggestions",
+    "classify_number_clues", "humanize_number_output", "parse_competitor_page",
+]
+
+
+class MemPageStore:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, url):
+        return self.data.get(url)
+
+    def get_many(self, urls):
+        return {u: self.data[u] for u in urls if u in self.data}
+
+    def put(self, url, data):
+        self.data[url] = data
+
+
+# =========================
+# 1) 量測
+# =========================
+def measure(fn, repeat=3, memory=True) -> dict:
+    """最佳秒數（repeat 次）+ 另跑一次量 tracemalloc 峰值（不跟計時混在一起，tracemalloc 本身很慢）"""
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    out = {"sec": round(best, 4)}
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            fn()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        out["peak_mb"] = round(peak / 2**20, 2)
+    return out
+
+
+def _dept_frames(df: pd.DataFrame, n: int, seed=0) -> list:
+    """抽 n 個科系，各自依 DEPT_SORT 排好（= 一頁式拿到的 dept_df）"""
+    depts = sorted(df["Department"].astype(str).unique())
+    pick = random.Random(seed).sample(depts, min(n, len(depts)))
+    cols, asc = DEPT_SORT
+    dept = df["Department"].astype(str)
+    return [df[dept == d].sort_values(cols, ascending=asc, kind="stable") for d in pick]
+
+
+def run_size(size: str, targets, repeat=3, memory=True, workdir=None, seed=0, snippet_chars=None) -> dict:
+    """一個規模：產生資料 → 逐一量測；回傳 {target: {"sec", "peak_mb", "items"}}"""
+    n_rows = SIZES[size]
+    snippet_chars = snippet_chars or SNIPPETS.get(size, SNIPPET_CHARS)
+    T = load_templates()
+    workdir = workdir or tempfile.mkdtemp(prefix="powergeo_bench_")
+    csv = os.path.join(workdir, f"synth_{size}_s{snippet_chars}.csv")
+    t0 = time.perf_counter()
+    if not os.path.exists(csv):
+        write_school_csv(csv, n_rows, seed=seed, templates=T, snippet_chars=snippet_chars)
+    print(f"\n[{size}] {n_rows} 列（{os.path.getsize(csv) / 2**20:.1f} MB，產生 {time.perf_counter() - t0:.1f}s）", flush=True)
+
+    res = {}
+
+    def record(name, fn, items):
+        if name not in targets:
+            return
+        r = measure(fn, repeat=repeat, memory=memory)
+        r["items"] = int(items)
+        res[name] = r
+        per = r["sec"] / items * 1e3 if items else 0.0
+        mem = f"{r['peak_mb']:>9.1f}" if "peak_mb" in r else f"{'-':>9}"
+        print(f"  {name:<28} {r['sec']:>9.3f} {mem} {items:>8} {per:>10.3f}", flush=True)
+
+    print(f"  {'target':<28} {'sec':>9} {'peak_MB':>9} {'items':>8} {'ms/item':>10}")
+    df, _ = load_school_data(csv, use_sidecar=False)
+    record("load_normalize", lambda: load_school_data(csv, use_sidecar=False), n_rows)
+    record("competitor_index", lambda: CompetitorIndex(df), len(df))
+
+    frames = _dept_frames(df, DEPT_SAMPLE, seed)
+    record("competitor_top5_from_dept", lambda: [competitor_top5_from_dept(d) for d in frames], len(frames))
+    record("decision_questions_top10", lambda: [decision_questions_top10(d) for d in frames], len(frames))
+    record("content_gap_suggestions", lambda: [content_gap_suggestions(d) for d in frames], len(frames))
+
+    # 語料：大表裡真的 Top3 網址 → 合成頁面
+    page_targets = {"classify_number_clues", "humanize_number_output", "parse_competitor_page"}
+    if page_targets & set(targets):
+        corpus = make_corpus(corpus_urls(df, PAGES[size]), seed=seed, templates=T)
+        texts = [scan_html(h)["text"] for h in corpus.values()]
+        clues = [classify_number_clues(t) for t in texts]
+        record("classify_number_clues", lambda: [classify_number_clues(t) for t in texts], len(texts))
+        record("humanize_number_output", lambda: [humanize_number_output(c) for c in clues], len(clues))
+
+        def fetcher(url, etag=None, last_modified=None, timeout=None):
+            return {"status": 200, "html": corpus.get(url, ""), "etag": "", "last_modified": ""}
+
+        def parse_all():
+            deep_analysis.set_page_store(MemPageStore())
+            return [parse_competitor_page(u, fetcher=fetcher) for u in corpus]
+
+        try:
+            record("parse_competitor_page", parse_all, len(corpus))
+        finally:
+            deep_analysis.set_page_store(None)
+    return res
+
+
+# =========================
+# 2) 基準
+# =========================
+def env_meta() -> dict:
+    return {"python": platform.python_version(), "pandas": pd.__version__, "numpy": np.__version__,
+            "machine": platform.machine(), "cpus": os.cpu_count()}
+
+
+def load_baselines(path=BASELINE_FILE) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baselines(results: dict, path=BASELINE_FILE) -> dict:
+    """{size: {target: ...}} 合併進既有基準（沒量到的保留原值）"""
+    base = load_baselines(path)
+    for size, res in results.items():
+        for target, r in res.items():
+            base[f"{size}|{target}"] = {k: r[k] for k in ("sec", "peak_mb", "items") if k in r}
+    base["_meta"] = env_meta()
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(dict(sorted(base.items())), f, ensure_ascii=False, indent=2)
+        f.write("\n")
+    os.replace(tmp, path)
+    return base
+
+
+def compare(results: dict, baselines: dict, tolerance=TOLERANCE) -> pd.DataFrame:
+    """每個 (size, target)：現在 / 基準 / 倍數 / 是否退步（秒數或峰值任一）"""
+    rows = []
+    for size, res in results.items():
+        for target, r in res.items():
+            b = baselines.get(f"{size}|{target}")
+            row = {"Size": size, "Target": target, "Sec": r["sec"], "Base_Sec": None, "Sec_x": None,
+                   "Peak_MB": r.get("peak_mb"), "Base_MB": None, "MB_x": None, "Status": "new"}
+            if b:
+                row["Base_Sec"] = b["sec"]
+                row["Sec_x"] = round(r["sec"] / b["sec"], 2) if b["sec"] else None
+                slow = r["sec"] > b["sec"] * tolerance and r["sec"] - b["sec"] > MIN_SEC
+                fat = False
+                if "peak_mb" in r and b.get("peak_mb") is not None:
+                    row["Base_MB"] = b["peak_mb"]
+                    row["MB_x"] = round(r["peak_mb"] / b["peak_mb"], 2) if b["peak_mb"] else None
+                    fat = r["peak_mb"] > b["peak_mb"] * tolerance and r["peak_mb"] - b["peak_mb"] > MIN_MB
+                row["Status"] = "REGRESSION" if slow or fat else "ok"
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="合成規模效能回歸測試")
+    ap.add_argument("--sizes", nargs="+", default=["10k", "100k"], choices=list(SIZES))
+    ap.add_argument("--targets", nargs="+", default=TARGETS, choices=TARGETS)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--no-memory", action="store_true", help="不量記憶體峰值（省一輪）")
+    ap.add_argument("--snippet-chars", type=int, default=None, help="摘要截到幾字（預設 1M 列 48、其他 160）")
+    ap.add_argument("--workdir", default=None, help="合成 CSV 放哪（預設暫存資料夾；同一個資料夾重跑會沿用）")
+    ap.add_argument("--baseline", default=BASELINE_FILE)
+    ap.add_argument("--tolerance", type=float, default=TOLERANCE)
+    ap.add_argument("--save", action="store_true", help="這次結果寫回基準")
+    ap.add_argument("--out", default=None, help="這次結果另存 JSON")
+    args = ap.parse_args(argv)
+
+    print(f"cpu={os.cpu_count()}  python={platform.python_version()}  pandas={pd.__version__}")
+    results = {}
+    for size in args.sizes:
+        results[size] = run_size(size, args.targets, repeat=args.repeat, memory=not args.no_memory,
+                                 workdir=args.workdir, snippet_chars=args.snippet_chars)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"meta": env_meta(), "results": results}, f, ensure_ascii=False, indent=2)
+
+    baselines = load_baselines(args.baseline)
+    table = compare(results, baselines, args.tolerance)
+    meta = baselines.get("_meta")
+    if meta and meta != env_meta():
+        print(f"\n注意：基準是在不同環境量的（{meta}），倍數僅供參考")
+    print(f"\n與基準比較（tolerance ×{args.tolerance}）")
+    with pd.option_context("display.width", 200):
+        print(table.to_string(index=False))
+
+    if args.save:
+        save_baselines(results, args.baseline)
+        print(f"\n已寫入基準 → {args.baseline}")
+        return 0
+    return 1 if (table["Status"] == "REGRESSION").any() else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+# 檔案名稱：bench/check_fetch_engine.py
+# FetchEngine 對本機替身 HTTP server 的行為檢查（不連外網）
+# - 每個 host 同時最多 per_host 個請求：server 端依 Host 記錄同時進行中的請求數峰值
+# - 不同 host 之間確實並行：整體峰值要大於 per_host
+# - ETag / 304：快取過期後帶 If-None-Match，server 回 304 → 沿用快取內容，不重解析
+# - 快取還新鮮：完全不發請求
+# 127.0.0.1 跟 localhost 都指到同一個 server，當成兩個 host
+#
+# 用法（在專案根目錄）：
+#   python bench/check_fetch_engine.py
+#   python bench/check_fetch_engine.py --pages 20 --per-host 3 --workers 12 --delay 0.05
+
+import os
+import sys
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import deep_analysis
+from domain_health import DomainHealth
+from fetch_engine import FetchEngine
+from bench_suite import MemPageStore
+
+
+class StandInServer:
+    """每個路徑回一頁固定的 HTML + ETag；If-None-Match 對得上就回 304"""
+
+    def __init__(self, delay=0.1):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.active = {}
+        self.peak = {}
+        self.peak_total = 0
+        self.status = {}
+        self.conditional = 0
+
+        owner = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *a):
+                pass
+
+            def do_GET(self):
+                owner._handle(self)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def _handle(self, h):
+        host = (h.headers.get("Host") or "").split(":")[0]
+        with self.lock:
+            self.active[host] = self.active.get(host, 0) + 1
+            self.peak[host] = max(self.peak.get(host, 0), self.active[host])
+            self.peak_total = max(self.peak_total, sum(self.active.values()))
+        try:
+            time.sleep(self.delay)
+            etag = f'"v1-{abs(hash(h.path)) % 10 ** 8}"'
+            if h.headers.get("If-None-Match") == etag:
+                status, body = 304, b""
+            else:
+                status = 200
+                body = (f"<html><head><title>替身頁 {h.path}</title></head><body><h2>薪資</h2>"
+                        f"<p>起薪約 3 萬 2 千元，實習 {len(h.path)} 週</p></body></html>").encode("utf-8")
+            h.send_response(status)
+            h.send_header("ETag", etag)
+            if status == 200:
+                h.send_header("Content-Type", "text/html; charset=utf-8")
+            h.send_header("Content-Length", str(len(body)))
+            h.end_headers()
+            h.wfile.write(body)
+        finally:
+            with self.lock:
+                self.active[host] -= 1
+                self.status[status] = self.status.get(status, 0) + 1
+                self.conditional += 1 if h.headers.get("If-None-Match") else 0
+
+    def reset_counts(self):
+        with self.lock:
+            self.peak, self.peak_total, self.status, self.conditional = {}, 0, {}, 0
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def run_all(engine: FetchEngine, urls: list) -> dict:
+    return dict(engine.run(urls))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="FetchEngine 對本機替身 server 的限流 / ETag 檢查")
+    ap.add_argument("--pages", type=int, default=12, help="每個 host 幾頁")
+    ap.add_argument("--per-host", type=int, default=2)
+    ap.add_argument("--workers", type=int, default=8)
+    ap.add_argument("--delay", type=float, default=0.1, help="server 每個請求停幾秒（讓請求重疊）")
+    args = ap.parse_args(argv)
+
+    if not deep_analysis.HAS_REQUESTS:
+        print("❌ 需要 requests：pip install requests", file=sys.stderr)
+        return 2
+
+    srv = StandInServer(delay=args.delay)
+    hosts = ["127.0.0.1", "localhost"]
+    urls = [f"http://{h}:{srv.port}/page/{i}" for h in hosts for i in range(args.pages)]
+    store = MemPageStore()
+    deep_analysis.set_page_store(store)
+    engine = FetchEngine(max_workers=args.workers, per_host=args.per_host, timeout=5, health=DomainHealth(None))
+    checks = []
+    try:
+        # 1) 冷快取：全部 200，每個 host 峰值 ≤ per_host，整體有並行
+        t0 = time.perf_counter()
+        first = run_all(engine, urls)
+        cold_sec = time.perf_counter() - t0
+        checks.append(("冷快取全部成功", all(r.get("ok") == 1 for r in first.values()),
+                       f"{sum(r.get('ok') == 1 for r in first.values())}/{len(urls)}，{cold_sec:.2f}s"))
+        checks.append(("每個 host 峰值 ≤ per_host", all(p <= args.per_host for p in srv.peak.values()),
+                       f"peak={srv.peak} per_host={args.per_host}"))
+        checks.append(("不同 host 並行", srv.peak_total > args.per_host, f"整體峰值 {srv.peak_total}"))
+        checks.append(("冷快取全是 200", srv.status == {200: len(urls)}, f"status={srv.status}"))
+
+        # 2) 快取過期 → 條件請求 → 304 → 沿用快取內容
+        for u in urls:
+            store.data[u]["fetched_at"] = 0
+        srv.reset_counts()
+        second = run_all(engine, urls)
+        checks.append(("過期後帶 If-None-Match", srv.conditional == len(urls), f"{srv.conditional}/{len(urls)}"))
+        checks.append(("server 全回 304", srv.status == {304: len(urls)}, f"status={srv.status}"))
+        same = all(second[u].get("ok") == 1 and second[u].get("title") == first[u].get("title")
+                   and second[u].get("fetched_at", 0) > 0 for u in urls)
+        checks.append(("304 沿用快取內容", same, "title 相同、fetched_at 已更新"))
+
+        # 3) 快取新鮮：不發請求
+        srv.reset_counts()
+        run_all(engine, urls)
+        checks.append(("新鮮快取不發請求", not srv.status, f"status={srv.status}"))
+    finally:
+        engine.close()
+        srv.close()
+        deep_analysis.set_page_store(None)
+
+    for name, ok, detail in checks:
+        print(f"{'✅' if ok else '❌'} {name:<20} {detail}")
+    return 0 if all(ok for _, ok, _ in checks) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+# 檔案名稱：bench/check_keyword_clusters.py
+# 近似重複關鍵字分群（keyword_clusters.py）對真實資料的檢查
+# - 不同問題（意圖不同 / 主詞不同 / 中段是不同的詞）一定要分開：例子都是 school_data.csv 裡曾經被誤併的
+# - 只是主詞換個說法的寫法要併成一群
+# - 整份資料：同一群裡的意圖（最後一個詞組）、問題類別（categorize_question）都只有一種
+#
+# 用法（在專案根目錄）：
+#   python bench/check_keyword_clusters.py
+#   python bench/check_keyword_clusters.py --csv school_data.csv
+
+import os
+import sys
+import argparse
+from itertools import combinations
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_loader import DATA_FILE, load_school_data
+from keyword_clusters import split_keyword
+from questions import categorize_question
+
+# (科系, [關鍵字...])：彼此都要在不同群
+SEPARATE = [
+    ("幼兒保育系", ["幼保 系到底在幹嘛 怎麼準備", "幼保 系到底在幹嘛 實習", "幼保 系到底在幹嘛 工作內容",
+                "幼保 系到底在幹嘛 需要證照嗎", "幼保 系到底在幹嘛 是什麼"]),
+    ("幼兒保育系", ["教保員 是什麼", "托育 是什麼", "幼保 是什麼"]),
+    ("幼兒保育系", ["幼保 幼保 需要證照嗎", "幼保 教保員 需要證照嗎"]),
+    ("寵物照護與美容系", ["動物醫院 是什麼", "動物醫院 出路"]),
+    ("護理系", ["護理 臨床護理 會學到什麼", "護理 護理國考 會學到什麼", "護理 護理師 會學到什麼"]),
+]
+
+# (科系, [關鍵字...])：要在同一群
+MERGED = [
+    ("幼兒保育系", ["幼保 幼保科 需要證照嗎", "幼保 我是幼保人 需要證照嗎", "幼保 幼保 需要證照嗎"]),
+    ("幼兒保育系", ["幼保 實習", "幼保 幼保 實習", "幼保 幼保科 實習", "幼保 我是幼保人 實習"]),
+    ("語言治療系", ["語言治療 實習", "語言治療 語言治療師 實習", "語言治療 什麼是語言治療師 實習"]),
+]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="近似重複關鍵字分群：真實資料的分開 / 合併檢查")
+    ap.add_argument("--csv", default=DATA_FILE)
+    args = ap.parse_args(argv)
+
+    df, _ = load_school_data(args.csv, use_sidecar=False)
+    cid = {(str(d), str(k)): int(c) for d, k, c in zip(df["Department"], df["Keyword"], df["Cluster_Id"])}
+    checks = []
+
+    def lookup(dept, kws):
+        missing = [k for k in kws if (dept, k) not in cid]
+        if missing:
+            checks.append((f"{dept} 資料裡找不到", False, "、".join(missing)))
+        return [cid[(dept, k)] for k in kws if (dept, k) not in missing]
+
+    for dept, kws in SEPARATE:
+        ids = lookup(dept, kws)
+        together = [f"{a} = {b}" for (a, x), (b, y) in combinations(zip(kws, ids), 2) if x == y]
+        checks.append((f"{dept} 分開", not together, "；".join(together) or "、".join(kws)))
+    for dept, kws in MERGED:
+        ids = lookup(dept, kws)
+        checks.append((f"{dept} 合併", len(set(ids)) == 1, "、".join(kws)))
+
+    intents = df.groupby("Cluster_Id")["Keyword"].agg(lambda s: len({split_keyword(k)[2] for k in s}))
+    cats = df.groupby("Cluster_Id")["Keyword"].agg(lambda s: len({categorize_question(k) for k in s}))
+    checks.append(("每群只有一種意圖", int((intents > 1).sum()) == 0, f"{int((intents > 1).sum())} 群混到"))
+    checks.append(("每群只有一種問題類別", int((cats > 1).sum()) == 0, f"{int((cats > 1).sum())} 群混到"))
+
+    print(f"{args.csv}：{len(df)} 列 → {df['Cluster_Id'].nunique()} 群\n")
+    for name, ok, detail in checks:
+        print(f"{'✅' if ok else '❌'} {name}  {detail}")
+    return 0 if all(ok for _, ok, _ in checks) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
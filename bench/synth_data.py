@@ -0,0 +1,278 @@
+# 檔案名稱：bench/synth_data.py
+# 合成資料：跟 school_data.csv 同欄位 / 同型別的大表（10k / 100k / 1M 列）+ 競品 HTML 頁面語料
+# 詞彙全部取自真的 school_data.csv：
+# - 科系：真的科系名複製成好幾份（「幼兒保育系-2」…），每份掛在對應學院的複本下；科系數 ≈ √列數（列數越多每系也越多列）
+# - 關鍵字：同一個原始科系的「開頭詞 + 1~2 個後綴詞」重新組合（「幼保 我是幼保人 需要證照嗎」這種）
+# - 數值欄位：拿同系某一列的值再加一點雜訊；Top3 標題 / 網址 / 摘要各自從同系隨機一列抽
+# - 網址：一半沿用原本的（共用頁面的比例接近真實），其餘加查詢參數變成新頁面，少部分帶追蹤參數
+# - 摘要：截到 snippet_chars 字，三成再補一句帶數字的句子（起薪、錄取分數、學分、及格率）
+# HTML 頁面：真的標題 / 摘要 / 關鍵字拼成 h1 / h2 / 段落 / 清單 / 表格 / FAQ，外加 script / style 雜訊
+#
+# 用法（在專案根目錄）：
+#   python bench/synth_data.py --rows 100000 --out /tmp/synth_100k.csv
+#   python bench/synth_data.py --rows 10000 --out /tmp/synth.csv --pages 200 --html-dir /tmp/synth_pages
+
+import os
+import sys
+import html
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from data_loader import DATA_FILE, TEXT_DEFAULTS
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1M": 1_000_000}
+SNIPPET_CHARS = 160
+LINK_KEEP = 0.5         # 沿用原本網址的比例
+LINK_TRACKING = 0.1     # 新網址裡帶 utm 參數的比例（url_index 正規化會拿掉）
+NUMBER_RATE = 0.3       # 摘要補一句數字句的比例
+RANKS = (1, 2, 3)
+
+NUMBER_PHRASES = [
+    "畢業後起薪約 {a} 萬元，工作三年月薪可達 {b} 萬",
+    "去年錄取分數約 {s} 級分，備取到第 {n} 名",
+    "畢業學分 {c} 學分，其中必修 {d} 學分",
+    "近三年國考及格率 {p}%，全國平均 {q}%",
+    "實習時數至少 {h} 小時，合作機構 {n} 家",
+]
+
+HEADINGS = ["課程地圖", "畢業學分", "升學管道", "錄取分數", "國考及格率", "薪資待遇", "實習機構", "證照", "出路", "常見問題"]
+
+
+# =========================
+# 1) 樣板：真的 school_data.csv
+# =========================
+def load_templates(path: str = DATA_FILE) -> pd.DataFrame:
+    """原始 CSV（文字欄位空值補預設值）；合成資料的所有詞彙都從這裡抽"""
+    df = pd.read_csv(path, dtype={c: str for c in TEXT_DEFAULTS})
+    for c, v in TEXT_DEFAULTS.items():
+        if c in df.columns:
+            df[c] = df[c].fillna(v)
+    return df.reset_index(drop=True)
+
+
+def _number_phrase(rng: random.Random) -> str:
+    return rng.choice(NUMBER_PHRASES).format(
+        a=round(rng.uniform(2.8, 4.2), 1), b=round(rng.uniform(3.5, 6.5), 1),
+        s=rng.randint(30, 60), n=rng.randint(3, 40), c=rng.randint(128, 140), d=rng.randint(60, 100),
+        p=round(rng.uniform(40, 98), 1), q=round(rng.uniform(30, 80), 1), h=rng.choice([320, 640, 960, 1040]),
+    )
+
+
+def _by_group(codes: np.ndarray, n_groups: int):
+    """codes（每列屬於哪一組）→ (依組排好的列號, 每組起點, 每組列數)"""
+    order = np.argsort(codes, kind="stable")
+    counts = np.bincount(codes, minlength=n_groups)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    return order, starts, counts
+
+
+def _pick(rng: np.random.Generator, group: np.ndarray, order, starts, counts) -> np.ndarray:
+    """每個 group 值各從自己那組隨機抽一個（回傳原始列號）"""
+    off = (rng.random(len(group)) * counts[group]).astype(np.int64)
+    return order[starts[group] + off]
+
+
+# =========================
+# 2) school_data.csv 形狀的大表
+# =========================
+def default_depts(n_rows: int, n_base: int) -> int:
+    return max(n_base, int(round(np.sqrt(n_rows))))
+
+
+def make_school_df(n_rows: int, seed=0, templates=None, snippet_chars=SNIPPET_CHARS,
+                   n_depts=None, dept_range=None) -> pd.DataFrame:
+    """
+    n_rows 列、欄位順序與型別跟原始 CSV 一樣；同一個 seed 結果固定
+    n_depts：整份資料的科系數（預設 ≈ √n_rows）；dept_range=(lo, hi)：這一批只產生第 lo~hi-1 個科系（分批寫檔用）
+    """
+    T = load_templates() if templates is None else templates
+    rng = np.random.default_rng(seed)
+    prng = random.Random(seed)
+
+    base_depts, t_base = np.unique(T["Department"].astype(str).to_numpy(), return_inverse=True)
+    n_base = len(base_depts)
+    base_college = T.groupby(t_base)["College"].first().to_numpy()
+    t_order, t_starts, t_counts = _by_group(t_base, n_base)
+
+    # 科系：真的科系 × 份數；每列依序分到一個科系（跟原始 CSV 一樣同系的列連在一起）
+    n_depts = n_depts or default_depts(n_rows, n_base)
+    lo, hi = dept_range or (0, n_depts)
+    dept_base = np.arange(n_depts) % n_base
+    dept_copy = np.arange(n_depts) // n_base
+    dept_names = np.array([b if k == 0 else f"{b}-{k + 1}" for b, k in zip(base_depts[dept_base], dept_copy)], dtype=object)
+    college_names = np.array([c if k == 0 else f"{c}-{k + 1}" for c, k in zip(base_college[dept_base], dept_copy)], dtype=object)
+    row_dept = np.sort(rng.integers(lo, hi, n_rows))
+    row_base = dept_base[row_dept]
+
+    src = _pick(rng, row_base, t_order, t_starts, t_counts)
+    out = T.iloc[src].reset_index(drop=True)
+    out["College"] = college_names[row_dept]
+    out["Department"] = dept_names[row_dept]
+
+    # 關鍵字：開頭詞（系的簡稱）+ 同系的後綴詞 1~2 個
+    toks = T["Keyword"].astype(str).str.split()
+    heads = toks.str[0].fillna("").to_numpy(dtype=object)
+    tail = toks.str[1:].explode().dropna()
+    tail_words = tail.to_numpy(dtype=object)
+    tail_base = t_base[tail.index.to_numpy()]
+    w_order, w_starts, w_counts = _by_group(tail_base, n_base)
+    w1 = tail_words[_pick(rng, row_base, w_order, w_starts, w_counts)]
+    w2 = tail_words[_pick(rng, row_base, w_order, w_starts, w_counts)]
+    two = (rng.random(n_rows) < 0.6) & (w1 != w2)
+    kw = pd.Series(heads[src]) + " " + pd.Series(w1)
+    kw[two] = kw[two] + " " + pd.Series(w2)[two]
+    out["Keyword"] = kw.str.strip().to_numpy()
+
+    # 數值欄位：同系那一列的值 + 雜訊
+    out["Opportunity_Score"] = np.clip(out["Opportunity_Score"] + rng.normal(0, 4, n_rows), 0, 100).round(1)
+    out["AI_Potential"] = np.clip(out["AI_Potential"] + rng.integers(-4, 5, n_rows), 0, 100).astype("int64")
+    out["Citable_Score"] = np.clip(out["Citable_Score"] + rng.normal(0, 3, n_rows), 0, 100).round(1)
+    out["Answerable_Avg"] = np.clip(out["Answerable_Avg"] + rng.normal(0, 2, n_rows), 0, 100).round(1)
+    out["Page_Word_Count_Max"] = (out["Page_Word_Count_Max"] * rng.uniform(0.7, 1.4, n_rows)).astype("int64")
+
+    # Top3：標題 / 網址 / 摘要各自從同系隨機一列抽
+    for r in RANKS:
+        pick = _pick(rng, row_base, t_order, t_starts, t_counts)
+        out[f"Rank{r}_Title"] = T[f"Rank{r}_Title"].to_numpy(dtype=object)[pick]
+
+        link = T[f"Rank{r}_Link"].astype(str).to_numpy(dtype=object)[pick]
+        new = rng.random(n_rows) >= LINK_KEEP
+        if new.any():
+            sep = np.where(pd.Series(link[new]).str.contains("?", regex=False), "&", "?")
+            pid = rng.integers(0, max(1, n_rows // 4), int(new.sum())).astype(str)
+            q = pd.Series(link[new]) + pd.Series(sep) + "p=" + pd.Series(pid)
+            tracking = rng.random(len(q)) < LINK_TRACKING
+            q[tracking] = q[tracking] + "&utm_source=synth"
+            link[new] = q.to_numpy()
+        out[f"Rank{r}_Link"] = link
+
+        snip = pd.Series(T[f"Rank{r}_Snippet"].astype(str).to_numpy(dtype=object)[pick]).str.slice(0, snippet_chars)
+        add = np.flatnonzero(rng.random(n_rows) < NUMBER_RATE)
+        snip.iloc[add] = snip.iloc[add] + " " + pd.Series([_number_phrase(prng) for _ in range(len(add))], index=add)
+        out[f"Rank{r}_Snippet"] = snip.to_numpy()
+
+    return out[list(T.columns)]
+
+
+def write_school_csv(path: str, n_rows: int, seed=0, templates=None, snippet_chars=SNIPPET_CHARS,
+                     chunk=200_000) -> str:
+    """分批產生 + append（每批負責一段科系），1M 列時不用整張表一次留在記憶體"""
+    T = load_templates() if templates is None else templates
+    n_depts = default_depts(n_rows, T["Department"].nunique())
+    parts = min(n_depts, max(1, -(-n_rows // chunk)))
+    for i in range(parts):
+        n = n_rows // parts + (1 if i < n_rows % parts else 0)
+        dept_range = (i * n_depts // parts, (i + 1) * n_depts // parts)
+        part = make_school_df(n, seed=seed * 1000 + i, templates=T, snippet_chars=snippet_chars,
+                              n_depts=n_depts, dept_range=dept_range)
+        part.to_csv(path, mode="w" if i == 0 else "a", header=(i == 0), index=False,
+                    encoding="utf-8-sig" if i == 0 else "utf-8")
+    return path
+
+
+# =========================
+# 3) 競品 HTML 頁面語料
+# =========================
+def make_page_html(rng: random.Random, T: pd.DataFrame, n_blocks: int) -> str:
+    """一頁：真的標題 / 摘要 / 關鍵字拼成的中文頁面，含表格 / 清單 / FAQ / 數字句"""
+    def row():
+        return T.iloc[rng.randrange(len(T))]
+
+    def snippet():
+        r = row()
+        return str(r[f"Rank{rng.choice(RANKS)}_Snippet"])
+
+    esc = html.escape
+    first = row()
+    title = str(first["Rank1_Title"])
+    parts = [
+        "<!DOCTYPE html><html lang='zh-Hant'><head><meta charset='utf-8'>",
+        f"<title>{esc(title)}</title>",
+        f"<meta name='description' content='{esc(str(first['Rank1_Snippet'])[:120])}'>",
+        "<style>body{font-family:sans-serif}.nav li{display:inline}</style>",
+        "<script>window.dataLayer=window.dataLayer||[];function gtag(){dataLayer.push(arguments)}</script>",
+        "</head><body><nav class='nav'><ul><li><a href='/'>首頁</a></li><li><a href='/about'>關於我們</a></li>"
+        "<li><a href='/news'>最新消息</a></li></ul></nav>",
+        f"<h1>{esc(title)}</h1>",
+    ]
+    for _ in range(n_blocks):
+        kind = rng.random()
+        if kind < 0.45:
+            text = snippet()
+            if rng.random() < 0.4:
+                text += " " + _number_phrase(rng)
+            parts.append(f"<p>{esc(text)}</p>")
+        elif kind < 0.6:
+            head = rng.choice(HEADINGS) if rng.random() < 0.5 else str(row()["Keyword"])
+            parts.append(f"<h2>{esc(head)}</h2>")
+        elif kind < 0.7:
+            parts.append(f"<h3>{esc(str(row()['Keyword']))}</h3>")
+        elif kind < 0.82:
+            items = [s for s in snippet().replace("。", "，").split("，") if s.strip()][:6]
+            items += [_number_phrase(rng) for _ in range(rng.randint(0, 2))]
+            parts.append("<ul>" + "".join(f"<li>{esc(s.strip())}</li>" for s in items) + "</ul>")
+        elif kind < 0.9:
+            body = "".join(
+                f"<tr><td>{y} 學年度</td><td>{rng.randint(30, 60)} 級分</td>"
+                f"<td>{round(rng.uniform(2.8, 4.5), 1)} 萬</td><td>{round(rng.uniform(40, 98), 1)}%</td></tr>"
+                for y in range(110, 110 + rng.randint(2, 5)))
+            parts.append("<table><tr><th>年度</th><th>錄取分數</th><th>起薪</th><th>及格率</th></tr>" + body + "</table>")
+        elif kind < 0.96:
+            q = str(row()["Keyword"])
+            parts.append(f"<div class='faq'><h3>Q：{esc(q)}？</h3><p>A：{esc(snippet())}</p></div>")
+        else:
+            parts.append(f"<script>var s{rng.randrange(10**6)}={{\"k\":\"{'x' * rng.randint(50, 400)}\"}};</script>")
+    parts.append("<footer><p>版權所有 © 2024</p></footer></body></html>")
+    return "".join(parts)
+
+
+def make_corpus(urls, seed=0, templates=None, blocks=(40, 400)) -> dict:
+    """{網址: html}；每頁的區塊數在 blocks 範圍內隨機（大約 5~60 KB）"""
+    T = load_templates() if templates is None else templates
+    out = {}
+    for i, u in enumerate(urls):
+        rng = random.Random(seed * 1_000_003 + i)
+        out[u] = make_page_html(rng, T, rng.randint(*blocks))
+    return out
+
+
+def corpus_urls(df: pd.DataFrame, n_pages: int) -> list:
+    """大表裡的 Top3 網址，依出現順序取前 n_pages 個不重複的"""
+    links = pd.unique(df[[f"Rank{r}_Link" for r in RANKS]].astype(str).to_numpy().ravel())
+    return [u for u in links if u.startswith("http")][:n_pages]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="合成 school_data.csv 形狀的大表 + 競品 HTML 語料")
+    ap.add_argument("--rows", default="10k", help="列數或 10k / 100k / 1M")
+    ap.add_argument("--out", default="synth_school_data.csv")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--snippet-chars", type=int, default=SNIPPET_CHARS)
+    ap.add_argument("--pages", type=int, default=0, help="另外產生幾頁 HTML（0 = 不產生）")
+    ap.add_argument("--html-dir", default="synth_pages")
+    args = ap.parse_args(argv)
+
+    n_rows = SIZES.get(args.rows) or int(args.rows)
+    T = load_templates()
+    write_school_csv(args.out, n_rows, seed=args.seed, templates=T, snippet_chars=args.snippet_chars)
+    print(f"{n_rows} 列 → {args.out}（{os.path.getsize(args.out) / 2**20:.1f} MB）")
+
+    if args.pages:
+        os.makedirs(args.html_dir, exist_ok=True)
+        df = make_school_df(min(n_rows, 20_000), seed=args.seed, templates=T)
+        corpus = make_corpus(corpus_urls(df, args.pages), seed=args.seed, templates=T)
+        for i, (u, h) in enumerate(corpus.items()):
+            with open(os.path.join(args.html_dir, f"page_{i:05d}.html"), "w", encoding="utf-8") as f:
+                f.write(f"<!-- {u} -->\n{h}")
+        size = sum(len(h.encode("utf-8")) for h in corpus.values())
+        print(f"{len(corpus)} 頁 HTML → {args.html_dir}/（{size / 2**20:.1f} MB）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,315 @@
+# 檔案名稱：competitors.py
+# 從 SERP Title 抽「學校名」+ 網域 → 競品 Top5
+# 欄式做法：Rank1~3 攤平成長表，整份資料一次做完抽校名 / 解析網域，建成 mentions 表
+# 計分規則跟原本逐列版一樣：標題提到校名 +2、網域 +1、雜訊網域每命中一個 -2，同分依第一次出現順序
+# 另外整份資料建一個「科系 × 競品」稀疏矩陣（同樣的計分，不截前 20 名）：跨系重疊 / 學院主要對手直接查
+
+import re
+
+import numpy as np
+import pandas as pd
+
+from geo_utils import clip_text
+
+SELF_BRAND_TOKENS = ["中華醫事", "華醫", "中華醫事科技大學"]
+
+SCHOOL_SUFFIX = r"(?:大學|科技大學|醫學院|學院|專科學校|護理健康大學|護理專科學校|醫護管理專科學校|護專|醫專)"
+SCHOOL_REGEX = re.compile(rf"([\u4e00-\u9fff]{{2,12}}{SCHOOL_SUFFIX})")
+
+# 明顯不是競品的 domain（論壇 / 社群 / 人力銀行）
+NOISE_DOMAINS = ["dcard.tw", "ptt.cc", "facebook.com", "youtube.com", "104.com.tw", "instagram.com"]
+
+# urlparse(...).netloc 的向量化版本：有 scheme:// 或 // 開頭才有 netloc
+_NETLOC_REGEX = r"^(?:[A-Za-z][A-Za-z0-9+.\-]*:)?//([^/?#]*)"
+_SELF_REGEX = "|".join(re.escape(t) for t in SELF_BRAND_TOKENS)
+
+MENTION_COLS = ["row_id", "seq", "key", "weight", "title"]
+
+
+def extract_school_names(text: str):
+    if not text:
+        return []
+    found = SCHOOL_REGEX.findall(text)
+    out = []
+    for f in found:
+        f = f.strip()
+        if not f:
+            continue
+        # 排除自己
+        if any(t in f for t in SELF_BRAND_TOKENS):
+            continue
+        out.append(f)
+    return out
+
+
+def _safe_str_col(s: pd.Series, default="無") -> pd.Series:
+    """safe_str 的向量化版本"""
+    s = s.astype(object).where(s.notna(), default).astype(str)
+    return s.where(s.str.strip() != "", default)
+
+
+# =========================
+# 1) 整份資料 → mentions 長表
+# =========================
+def build_mentions(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    每一筆「競品線索」一列：row_id（df 的 index）、seq（同一列內的出現順序）、key、weight、title
+    seq = rank * 100 + 第幾個校名；網域固定排在該 rank 校名之後（= 原本逐列版的插入順序）
+    """
+    parts = []
+    for i in range(1, 4):
+        tcol, lcol = f"Rank{i}_Title", f"Rank{i}_Link"
+        titles = _safe_str_col(df[tcol]) if tcol in df.columns else pd.Series("無", index=df.index)
+        links = _safe_str_col(df[lcol]) if lcol in df.columns else pd.Series("無", index=df.index)
+        parts.append(pd.DataFrame({"row_id": df.index.to_numpy(), "rank": i,
+                                   "title": titles.to_numpy(), "link": links.to_numpy()}))
+    long = pd.concat(parts, ignore_index=True)
+
+    # 校名：同一個標題只跑一次 regex
+    uniq = pd.Series(long["title"].unique())
+    found = uniq.str.findall(SCHOOL_REGEX)
+    names = pd.DataFrame({"title": uniq, "key": found}).explode("key").dropna(subset=["key"])
+    names["key"] = names["key"].str.strip()
+    names = names[names["key"] != ""]
+    if _SELF_REGEX:
+        names = names[~names["key"].str.contains(_SELF_REGEX, regex=True)]
+    names["sub"] = names.groupby(level=0).cumcount()
+
+    name_rows = long[["row_id", "rank", "title"]].merge(names, on="title", how="inner")
+    name_rows["seq"] = name_rows["rank"] * 100 + name_rows["sub"]
+    name_rows["weight"] = 2
+
+    # 網域
+    dom = long["link"].str.strip().str.extract(_NETLOC_REGEX, expand=False).fillna("").str.lower()
+    dom_rows = long.assign(key=dom)
+    dom_rows = dom_rows[dom_rows["key"] != ""]
+    dom_rows = dom_rows.assign(seq=dom_rows["rank"] * 100 + 99, weight=1)
+
+    mentions = pd.concat([name_rows[MENTION_COLS], dom_rows[MENTION_COLS]], ignore_index=True)
+    mentions["weight"] = mentions["weight"].astype("int32")
+    return mentions.sort_values(["row_id", "seq"], kind="stable").reset_index(drop=True)
+
+
+def noise_penalty(keys: pd.Series) -> pd.Series:
+    """每個 key 含幾個雜訊網域就扣幾次 2"""
+    pen = pd.Series(0, index=keys.index, dtype="int64")
+    for nd in NOISE_DOMAINS:
+        pen += keys.str.contains(nd, regex=False).astype("int64") * 2
+    return pen
+
+
+def _top_by_group(m: pd.DataFrame, by: str, top_n=5) -> pd.DataFrame:
+    """
+    m：mentions + by 欄 + order 欄（同分時先出現的排前面）
+    每組：加總 → 扣雜訊 → 取前 20 → 去掉 <=0 與本校 → 取前 top_n（= 原本 most_common(20) 的語意）
+    """
+    m = m.sort_values("order", kind="stable")
+    g = m.groupby([by, "key"], sort=False, observed=True).agg(
+        cnt=("weight", "sum"), first=("order", "min"), example=("title", "first")
+    ).reset_index()
+    g["cnt"] = g["cnt"] - noise_penalty(g["key"])
+    g = g.sort_values([by, "cnt", "first"], ascending=[True, False, True], kind="stable")
+    g = g.groupby(by, sort=False, observed=True).head(20)
+
+    g = g[g["cnt"] > 0]
+    if _SELF_REGEX:
+        g = g[~g["key"].str.contains(_SELF_REGEX, regex=True)]
+    return g.groupby(by, sort=False, observed=True).head(top_n)
+
+
+def _to_items(g: pd.DataFrame) -> list:
+    return [
+        {"Competitor": k, "Mentions": int(c), "Example_Title": clip_text(e, 90)}
+        for k, c, e in zip(g["key"], g["cnt"], g["example"])
+    ]
+
+
+def rank_competitors(mentions: pd.DataFrame, row_order: pd.Index, top_n=5) -> list:
+    """
+    mentions 只保留 row_order 裡的 row，依 row_order 的順序決定同分先後
+    回傳跟原本 competitor_top5_from_dept 一樣的 [{"Competitor", "Mentions", "Example_Title"}]
+    """
+    if mentions.empty or len(row_order) == 0:
+        return []
+    pos = pd.Series(np.arange(len(row_order)), index=row_order)
+    m = mentions[mentions["row_id"].isin(row_order)]
+    if m.empty:
+        return []
+    m = m.assign(_g=0, order=pos.reindex(m["row_id"]).to_numpy() * 1000 + m["seq"].to_numpy())
+    return _to_items(_top_by_group(m, "_g", top_n))
+
+
+def competitor_top5_from_dept(dept_df: pd.DataFrame, mentions=None):
+    """mentions 有預先建好就直接用，沒有就只對 dept_df 現算"""
+    if mentions is None:
+        mentions = build_mentions(dept_df)
+    return rank_competitors(mentions, dept_df.index)
+
+
+# =========================
+# 2) 每一版資料預先算好：每個科系的 Top5
+# =========================
+DEPT_SORT = (["Opportunity_Score", "AI_Potential"], False)
+
+class CompetitorIndex:
+    """
+    整份資料一次建 mentions，並預先算好每個科系（未篩選時）的 Top5
+    一頁式的 dept_df 若就是整個科系 → 直接查表；有被 sidebar 篩掉部分 row → 只對子集合排名
+    prev + unchanged：上一版的 CompetitorIndex 與沒變的科系（data_loader.diff_departments）
+    → 這些系的 mentions 換成新的 row id 沿用、Top5 直接沿用；只對其他科系抽校名 / 排名
+    """
+
+    def __init__(self, df: pd.DataFrame, prev=None, unchanged=()):
+        # 每個科系內依 DEPT_SORT 排好的 row 順序（= 一頁式 dept_df 的順序）
+        cols, asc = DEPT_SORT
+        dept = df["Department"].astype(str)
+        ordered = df.assign(_dept=dept).sort_values(["_dept"] + cols, ascending=[True] + [asc] * len(cols), kind="stable")
+        self.dept_order = {d: g.index for d, g in ordered.groupby("_dept", sort=True)}
+
+        # 沒變的科系：row 內容與順序都一樣，只是 row id 換了 → 依位置一對一對應
+        reuse = []
+        if prev is not None:
+            reuse = [d for d in unchanged
+                     if d in self.dept_order and len(prev.dept_order.get(d, ())) == len(self.dept_order[d])]
+        self.reused = set(reuse)
+
+        if reuse:
+            old_ids = np.concatenate([prev.dept_order[d].to_numpy() for d in reuse])
+            new_ids = np.concatenate([self.dept_order[d].to_numpy() for d in reuse])
+            remap = pd.Series(new_ids, index=old_ids)
+            kept = prev.mentions[prev.mentions["row_id"].isin(old_ids)]
+            kept = kept.assign(row_id=remap.reindex(kept["row_id"]).to_numpy())
+            parts = [kept]
+            fresh_rows = ~dept.isin(self.reused).to_numpy()
+            if fresh_rows.any():
+                parts.append(build_mentions(df[fresh_rows]))
+            self.mentions = (pd.concat(parts, ignore_index=True)
+                             .sort_values(["row_id", "seq"], kind="stable").reset_index(drop=True))
+        else:
+            self.mentions = build_mentions(df)
+
+        # 需要排名的科系一次排完
+        pos = ordered.groupby("_dept", sort=False).cumcount()
+        m = self.mentions.assign(
+            dept=dept.reindex(self.mentions["row_id"]).to_numpy(),
+            order=pos.reindex(self.mentions["row_id"]).to_numpy() * 1000 + self.mentions["seq"].to_numpy(),
+        )
+        if reuse:
+            m = m[~m["dept"].isin(self.reused)]
+        top = _top_by_group(m, "dept")
+        self.top5_by_dept = {d: (prev.top5_by_dept.get(d, []) if d in self.reused else []) for d in self.dept_order}
+        for d, g in top.groupby("dept", sort=False):
+            self.top5_by_dept[d] = _to_items(g)
+
+        # 科系 × 競品矩陣：mentions 已經是最新的（含沿用的科系），整份重新分組一次就好
+        self.matrix = CompetitorMatrix(self.mentions, dept)
+
+    def top5(self, dept_name: str, dept_df: pd.DataFrame) -> list:
+        """dept_df 就是整個科系（且依 DEPT_SORT 排序）→ 查表；否則只對子集合排名"""
+        ordered = self.dept_order.get(dept_name)
+        if ordered is not None and ordered.equals(dept_df.index):
+            return self.top5_by_dept.get(dept_name, [])
+        return rank_competitors(self.mentions, dept_df.index)
+
+
+# =========================
+# 3) 科系 × 競品 稀疏矩陣（整份資料）
+# =========================
+class CompetitorMatrix:
+    """
+    每格 = 某系所有 row 對某競品的分數（標題 +2、網域 +1，再扣雜訊網域 2 × 命中數），只留 > 0 的格子、排除本校
+    依科系存成 CSR（indptr / comp / score），每系內依分數、第一次出現排好
+    查一組科系 = 切幾段 + bincount，不用回頭掃 mentions
+    """
+
+    def __init__(self, mentions: pd.DataFrame, dept_of_row: pd.Series):
+        self.departments = sorted(dept_of_row.astype(str).unique().tolist())
+        self._dept_code = {d: i for i, d in enumerate(self.departments)}
+        m = mentions
+        if _SELF_REGEX and len(m):
+            m = m[~m["key"].str.contains(_SELF_REGEX, regex=True)]
+        d = pd.Series(dept_of_row.astype(str).reindex(m["row_id"]).to_numpy()).map(self._dept_code).to_numpy()
+        c, keys = pd.factorize(m["key"].to_numpy())
+        self.competitors = list(keys)
+        self._comp_code = {k: i for i, k in enumerate(self.competitors)}
+        first_pos = np.arange(len(m))
+        self._example = (pd.Series(m["title"].to_numpy()).groupby(c).first().reindex(range(len(keys))).to_numpy()
+                         if len(m) else np.zeros(0, dtype=object))
+        pen = noise_penalty(pd.Series(self.competitors, dtype=object)).to_numpy() if len(keys) else np.zeros(0)
+
+        cells = (pd.DataFrame({"d": d, "c": c, "w": m["weight"].to_numpy(), "first": first_pos})
+                 .groupby(["d", "c"], sort=False).agg(w=("w", "sum"), first=("first", "min")).reset_index())
+        cells["w"] = cells["w"] - pen[cells["c"].to_numpy()]
+        cells = cells[cells["w"] > 0].sort_values(["d", "w", "first"], ascending=[True, False, True], kind="stable")
+
+        self._comp = cells["c"].to_numpy(dtype=np.int64)
+        self._score = cells["w"].to_numpy(dtype=np.int64)
+        self._cell_dept = cells["d"].to_numpy(dtype=np.int64)
+        self._indptr = np.searchsorted(self._cell_dept, np.arange(len(self.departments) + 1))
+
+    @property
+    def nnz(self) -> int:
+        return len(self._score)
+
+    def departments_matching(self, text: str) -> list:
+        """系名包含 text 的科系（例如「醫」「護理」）"""
+        return [d for d in self.departments if text in d]
+
+    def _rows(self, departments):
+        idx = [self._dept_code[d] for d in dict.fromkeys(map(str, departments)) if d in self._dept_code]
+        if not idx:
+            return np.zeros(0, dtype=np.int64), idx
+        sl = np.concatenate([np.arange(self._indptr[i], self._indptr[i + 1]) for i in idx])
+        return sl, idx
+
+    def dept_competitors(self, dept: str, top_n=20) -> pd.DataFrame:
+        """單一科系的完整競品排行（不截 20 名）"""
+        i = self._dept_code.get(str(dept))
+        if i is None:
+            return pd.DataFrame(columns=["Competitor", "Score"])
+        s = slice(self._indptr[i], self._indptr[i + 1])
+        comp = self._comp[s][:top_n]
+        return pd.DataFrame({"Competitor": [self.competitors[k] for k in comp], "Score": self._score[s][:top_n]})
+
+    def query(self, departments, min_departments=1, top_n=20, by="score") -> pd.DataFrame:
+        """
+        一組科系的共同對手：Competitor / Departments（幾系有它）/ Score（加總）/ Dept_List / Example_Title
+        min_departments：至少出現在幾個系（= len(departments) → 所有系都有的對手）
+        by="score" 依總分、"overlap" 依出現系數排
+        """
+        cols = ["Competitor", "Departments", "Score", "Dept_List", "Example_Title"]
+        sl, idx = self._rows(departments)
+        if len(sl) == 0:
+            return pd.DataFrame(columns=cols)
+        comp = self._comp[sl]
+        n_comp = len(self.competitors)
+        score = np.bincount(comp, weights=self._score[sl], minlength=n_comp)
+        n_dept = np.bincount(comp, minlength=n_comp)
+        cand = np.flatnonzero(n_dept >= max(1, min_departments))
+        keys = (-score[cand], -n_dept[cand], cand) if by == "score" else (-n_dept[cand], -score[cand], cand)
+        cand = cand[np.lexsort(keys[::-1])][:top_n]
+
+        sel = np.isin(comp, cand)
+        dept_lists = {}
+        for k, di in zip(comp[sel], self._cell_dept[sl][sel]):
+            dept_lists.setdefault(int(k), []).append(self.departments[di])
+        return pd.DataFrame({
+            "Competitor": [self.competitors[k] for k in cand],
+            "Departments": n_dept[cand].astype(int),
+            "Score": score[cand].astype(int),
+            "Dept_List": ["、".join(dept_lists.get(int(k), [])) for k in cand],
+            "Example_Title": [clip_text(self._example[k], 90) for k in cand],
+        }, columns=cols)
+
+    def departments_for(self, competitor: str) -> pd.DataFrame:
+        """某個競品出現在哪些系（依分數）"""
+        k = self._comp_code.get(competitor)
+        if k is None:
+            return pd.DataFrame(columns=["Department", "Score"])
+        hit = np.flatnonzero(self._comp == k)
+        hit = hit[np.argsort(-self._score[hit], kind="stable")]
+        return pd.DataFrame({"Department": [self.departments[i] for i in self._cell_dept[hit]],
+                             "Score": self._score[hit]})
+
+    def stats(self) -> dict:
+        return {"departments": len(self.departments), "competitors": len(self.competitors), "cells": self.nnz}
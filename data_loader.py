@@ -0,0 +1,480 @@
+# 檔案名稱：data_loader.py
+# 讀取 school_data.csv（對齊新版 powergeo.py）→ 補欄位、轉型、排序
+# 同一版檔案只整理一次：版本 = mtime + 大小 + 內容雜湊；有 pyarrow 時另存 Parquet 旁檔，冷啟動直接讀
+# 冷熱分離：總覽 / 一頁式用的數值・類別欄位留在記憶體（熱表）；
+# 只有戰情室選中那一筆才看的長文字（Evidence / 摘要）放進 SQLite 旁檔，依 row id 現查
+# 增量更新：每列一個 Row_Hash、每系一個摘要（manifest）；新版檔案只重算「有變動的科系」的衍生結果，其他沿用上一版
+#   （補值 / 轉型 / Row_Hash / 排序本身還是整張表做：要先算出 Row_Hash 才知道哪些沒變）
+# 近似重複關鍵字：同系內分群（keyword_clusters.py）→ Cluster_Id / Canonical_Keyword
+
+import os
+import re
+import glob
+import json
+import sqlite3
+import hashlib
+import threading
+
+import numpy as np
+import pandas as pd
+
+from keyword_clusters import add_cluster_columns, cluster_keywords
+from profiler import stage
+from questions import add_question_columns
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_ARROW = True
+except ImportError:
+    HAS_ARROW = False
+
+
+DATA_FILE = "school_data.csv"
+SIDECAR_DIR = ".school_data_cache"
+# 整理邏輯 / 衍生欄位 / 冷熱欄位有改就 +1，舊的旁檔自動失效
+SCHEMA_VERSION = 6
+
+TEXT_DEFAULTS = {
+    "College": "無",
+    "Department": "無",
+    "Keyword": "無",
+    "Keyword_Source": "無",
+    "Seed_Term": "無",
+    "Evidence": "無",
+    "Keyword_Type": "一般",
+    "Strategy_Tag": "無",
+    "Rank1_Title": "無", "Rank1_Link": "#", "Rank1_Snippet": "",
+    "Rank2_Title": "無", "Rank2_Link": "#", "Rank2_Snippet": "",
+    "Rank3_Title": "無", "Rank3_Link": "#", "Rank3_Snippet": "",
+}
+
+NUM_DEFAULTS = {
+    "Trends_Score": 0.0,
+    "Trends_Fetched": 0,
+    "Search_Volume": 0,
+    "Opportunity_Score": 0.0,
+    "AI_Potential": 0,
+    "Authority_Count": 0,
+    "Forum_Count": 0,
+    "Answerable_Avg": 0.0,
+    "Citable_Score": 0.0,
+    "Fetch_OK_Count": 0,
+    "Schema_Hit_Count": 0,
+    "Has_FAQ": 0,
+    "Has_Table": 0,
+    "Has_List": 0,
+    "Has_Headings": 0,
+    "Page_Word_Count_Max": 0,
+    "Result_Count": 0,
+}
+
+# 低基數欄位 → category（省記憶體、篩選/分組更快）
+CATEGORY_COLS = ["College", "Department", "Keyword_Source", "Keyword_Type", "Strategy_Tag"]
+
+# 冷欄位：只有戰情室會讀、而且一次只讀一筆 → 不放進熱表
+COLD_COLS = ["Evidence", "Rank1_Snippet", "Rank2_Snippet", "Rank3_Snippet"]
+
+
+# =========================
+# 1) 檔案版本
+# =========================
+_hash_memo = {}
+_hash_lock = threading.Lock()
+
+def file_version(path: str = DATA_FILE) -> str:
+    """
+    "<mtime_ns>-<size>-<內容雜湊>"；stat 沒變就不重算雜湊（每次 rerun 只花一次 os.stat）
+    檔案不存在 → FileNotFoundError
+    """
+    st_ = os.stat(path)
+    stat_key = (os.path.abspath(path), st_.st_mtime_ns, st_.st_size)
+    with _hash_lock:
+        digest = _hash_memo.get(stat_key)
+    if digest is None:
+        h = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = h.hexdigest()[:16]
+        with _hash_lock:
+            _hash_memo[stat_key] = digest
+    return f"{st_.st_mtime_ns}-{st_.st_size}-{digest}"
+
+def _content_hash(version: str) -> str:
+    return version.rsplit("-", 1)[-1]
+
+
+# =========================
+# 2) 整理（補欄位 / 轉型 / 排序）
+# =========================
+def row_hashes(df: pd.DataFrame) -> np.ndarray:
+    """
+    每列一個 uint64：(Department, Keyword) + 其他所有欄位的值（補好預設值之後、轉 category 之前）
+    數值欄一律當 float 算，某天多一個空值讓整欄變 float 也不會讓每一列都「變了」
+    categorize=False：摘要 / 連結幾乎每列都不同，先去重反而更慢（雜湊值跟預設一樣）
+    """
+    cols = {c: df[c].astype(str) for c in TEXT_DEFAULTS}
+    cols.update({c: df[c].astype("float64") for c in NUM_DEFAULTS})
+    return pd.util.hash_pandas_object(pd.DataFrame(cols), index=False, categorize=False).to_numpy(dtype="uint64")
+
+
+def _question_columns(df: pd.DataFrame, prev=None) -> pd.DataFrame:
+    """上一版已經算過的 row（同 Row_Hash）直接沿用問句旗標 / 分類，只算新的 row"""
+    if prev is None or "Row_Hash" not in prev.columns or "Question_Category" not in prev.columns:
+        return add_question_columns(df)
+
+    known = prev.drop_duplicates("Row_Hash").set_index("Row_Hash")
+    hit = df["Row_Hash"].isin(known.index).to_numpy()
+    if not hit.any():
+        return add_question_columns(df)
+
+    fresh = add_question_columns(df.loc[~hit, ["Keyword"]].copy())
+    cats = list(fresh["Question_Category"].cat.categories)
+    is_q = np.zeros(len(df), dtype=bool)
+    cat = np.empty(len(df), dtype=object)
+    old = known.loc[df["Row_Hash"].to_numpy()[hit]]
+    is_q[hit] = old["Is_Question"].to_numpy(dtype=bool)
+    cat[hit] = old["Question_Category"].astype(str).to_numpy()
+    is_q[~hit] = fresh["Is_Question"].to_numpy(dtype=bool)
+    cat[~hit] = fresh["Question_Category"].astype(str).to_numpy()
+    df["Is_Question"] = is_q
+    df["Question_Category"] = pd.Categorical(cat, categories=cats)
+    return df
+
+
+def _cluster_columns(df: pd.DataFrame, prev=None) -> pd.DataFrame:
+    """
+    df 要已經排序好。分群不跨科系：沒變的科系（dept_digests 一樣 = 排序後的 Row_Hash 一列一列都一樣）
+    直接搬上一版的 Cluster_Id / Canonical_Keyword，只有新增 / 變動的科系重新分群
+    上一版的群號原樣當 key、新分的群號加上 offset 接在後面，最後依列順序 factorize
+    → 編號跟整張表重算一樣（依排序後第一次出現）
+    """
+    if prev is None or "Cluster_Id" not in prev.columns or "Row_Hash" not in prev.columns or df.empty:
+        return add_cluster_columns(df)
+
+    old, new = dept_digests(prev), dept_digests(df)
+    same = [d for d, h in new.items() if old.get(d) == h]
+    if not same:
+        return add_cluster_columns(df)
+
+    reuse = df["Department"].isin(same).to_numpy()
+    prev_rows = np.flatnonzero(prev["Department"].isin(same).to_numpy())
+    if len(prev_rows) != int(reuse.sum()) or not np.array_equal(
+            prev["Row_Hash"].to_numpy(dtype="uint64")[prev_rows], df["Row_Hash"].to_numpy(dtype="uint64")[reuse]):
+        return add_cluster_columns(df)
+
+    key = np.empty(len(df), dtype=np.int64)
+    canon = np.empty(len(df), dtype=object)
+    prev_id = prev["Cluster_Id"].to_numpy(dtype=np.int64)
+    prev_canon = prev["Canonical_Keyword"].astype("category")
+    key[reuse] = prev_id[prev_rows]
+    canon[reuse] = prev_canon.cat.categories.to_numpy(dtype=object)[prev_canon.cat.codes.to_numpy()[prev_rows]]
+    if not reuse.all():
+        fresh = df.loc[~reuse, ["Keyword", "Department"]].astype(str)
+        cid, c = cluster_keywords(fresh["Keyword"].to_numpy(), fresh["Department"].to_numpy())
+        key[~reuse] = cid.astype(np.int64) + (int(prev_id.max()) + 1 if len(prev_id) else 0)
+        canon[~reuse] = c
+
+    cluster_id, _ = pd.factorize(key)
+    df["Cluster_Id"] = cluster_id.astype(np.int32)
+    df["Canonical_Keyword"] = pd.Categorical(canon)
+    return df
+
+
+def normalize_school_df(df: pd.DataFrame, prev=None) -> pd.DataFrame:
+    """
+    prev：上一版整理好的熱表（有的話，沒變的 row 不重算問句分類、沒變的科系不重新分群）
+    補預設值 / 轉數值 / Row_Hash / 轉 category / 排序一律整張表做：判斷哪些 row 沒變靠的 Row_Hash
+    就是用補好、轉好型別的值算的，得先做完才知道能沿用哪些；這幾步加起來在 10 萬列約 1.9 秒，其中 Row_Hash 約 1.6 秒
+    沿用上一版的是後面比較貴的衍生欄位（問句分類、近似重複分群）
+    """
+    for c, v in TEXT_DEFAULTS.items():
+        if c not in df.columns:
+            df[c] = v
+
+    for c, v in NUM_DEFAULTS.items():
+        if c not in df.columns:
+            df[c] = v
+
+    for c in TEXT_DEFAULTS.keys():
+        df[c] = df[c].fillna(TEXT_DEFAULTS[c]).astype(str)
+
+    for c in NUM_DEFAULTS.keys():
+        df[c] = pd.to_numeric(df[c], errors="coerce").fillna(NUM_DEFAULTS[c])
+
+    with stage("row_hash"):
+        df["Row_Hash"] = row_hashes(df)
+
+    for c in CATEGORY_COLS:
+        df[c] = df[c].astype("category")
+
+    # 衍生欄位：是否問句 / 決策問題分類（questions.py）
+    with stage("questions"):
+        df = _question_columns(df, prev)
+
+    # stable：同分的 row 維持 CSV 裡的先後 → 某系的順序只跟該系自己的 row 有關
+    df = df.sort_values(["College", "Department", "Opportunity_Score"], ascending=[True, True, False], kind="stable")
+    df = df.reset_index(drop=True)
+
+    # 近似重複關鍵字分群（只在同系內分；Cluster_Id 依排序後第一次出現編號）
+    with stage("clusters"):
+        return _cluster_columns(df, prev)
+
+
+# =========================
+# 2.5) 每系摘要 + 變動偵測
+# =========================
+def dept_digests(df: pd.DataFrame) -> dict:
+    """{科系: 摘要}；該系任何一列新增 / 刪除 / 變動（含順序），摘要就不同"""
+    if df.empty:
+        return {}
+    codes, uniques = pd.factorize(df["Department"].astype(str))
+    hashes = df["Row_Hash"].to_numpy(dtype="uint64")
+    order = np.argsort(codes, kind="stable")
+    bounds = np.flatnonzero(np.diff(codes[order])) + 1
+    out = {}
+    for idx in np.split(order, bounds):
+        dept = uniques[codes[idx[0]]]
+        out[dept] = hashlib.sha1(hashes[idx].tobytes()).hexdigest()[:16]
+    return out
+
+def dept_colleges(df: pd.DataFrame) -> dict:
+    """{學院: [科系...]}"""
+    pairs = df[["College", "Department"]].astype(str).drop_duplicates()
+    return {c: sorted(g["Department"].tolist()) for c, g in pairs.groupby("College", sort=True)}
+
+def diff_departments(old: dict, new: dict) -> dict:
+    """兩版 dept_digests 比對 → added / removed / changed / unchanged（科系名單）"""
+    return {
+        "added": sorted(set(new) - set(old)),
+        "removed": sorted(set(old) - set(new)),
+        "changed": sorted(d for d in set(new) & set(old) if new[d] != old[d]),
+        "unchanged": sorted(d for d in set(new) & set(old) if new[d] == old[d]),
+    }
+
+
+# =========================
+# 3) 冷欄位：依 row id 查的長文字
+# =========================
+class ColdStore:
+    """
+    冷欄位（COLD_COLS）存放處：row id = 熱表的 index
+    平常是唯讀的 SQLite 旁檔（row_id 主鍵，一次只讀需要的那幾筆）；
+    旁檔寫不了（唯讀目錄等）才退回記憶體裡的 DataFrame
+    """
+
+    _CHUNK = 500
+
+    def __init__(self, path=None, frame=None):
+        self.path = path
+        self.frame = frame
+        self._local = threading.local()
+
+    @classmethod
+    def build(cls, path: str, df: pd.DataFrame) -> "ColdStore":
+        """df 的 COLD_COLS 寫成 SQLite（先寫暫存檔再換名，不會讀到寫一半的檔）"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        conn = sqlite3.connect(tmp)
+        try:
+            cols = ", ".join(f'"{c}" TEXT' for c in COLD_COLS)
+            conn.execute(f"CREATE TABLE cold (row_id INTEGER PRIMARY KEY, {cols})")
+            rows = zip(df.index.tolist(), *(df[c].tolist() for c in COLD_COLS))
+            conn.executemany(f"INSERT INTO cold VALUES ({', '.join('?' * (len(COLD_COLS) + 1))})", rows)
+            conn.commit()
+        finally:
+            conn.close()
+        os.replace(tmp, path)
+        return cls(path=path)
+
+    @classmethod
+    def open(cls, path: str):
+        """旁檔存在而且讀得到 → ColdStore；否則 None"""
+        if not os.path.exists(path):
+            return None
+        store = cls(path=path)
+        try:
+            store._conn().execute("SELECT 1 FROM cold LIMIT 1").fetchall()
+        except Exception:
+            return None
+        return store
+
+    def _conn(self) -> sqlite3.Connection:
+        # 唯讀開啟；sqlite3 連線不能跨執行緒共用 → 每個執行緒一條
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, timeout=30)
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, row_ids) -> dict:
+        """{row_id: {col: 文字}}；查不到的 row 不會出現"""
+        ids = [int(i) for i in dict.fromkeys(row_ids)]
+        if self.frame is not None:
+            sub = self.frame.loc[self.frame.index.intersection(ids), COLD_COLS]
+            return {int(i): dict(zip(COLD_COLS, vals)) for i, vals in zip(sub.index, sub.itertuples(index=False))}
+
+        out = {}
+        conn = self._conn()
+        cols = ", ".join(f'"{c}"' for c in COLD_COLS)
+        for i in range(0, len(ids), self._CHUNK):
+            chunk = ids[i:i + self._CHUNK]
+            q = f"SELECT row_id, {cols} FROM cold WHERE row_id IN ({','.join('?' * len(chunk))})"
+            for row in conn.execute(q, chunk):
+                out[row[0]] = dict(zip(COLD_COLS, row[1:]))
+        return out
+
+    def get(self, row_id) -> dict:
+        """單筆；查不到就回預設值"""
+        found = self.get_many([row_id]).get(int(row_id))
+        return found or {c: TEXT_DEFAULTS[c] for c in COLD_COLS}
+
+
+# =========================
+# 4) 旁檔（熱表 Parquet：需要 pyarrow；冷欄位 SQLite：標準庫；彙整結果見 aggregates.py）
+# =========================
+def sidecar_path(path: str, version: str, suffix=".parquet") -> str:
+    """.school_data_cache/<stem>-v<SCHEMA_VERSION>-<內容雜湊><suffix>（其他模組的衍生檔也放這裡）"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    name = f"{stem}-v{SCHEMA_VERSION}-{_content_hash(version)}{suffix}"
+    return os.path.join(os.path.dirname(os.path.abspath(path)), SIDECAR_DIR, name)
+
+def _read_sidecar(fp: str):
+    if not HAS_ARROW or not os.path.exists(fp):
+        return None
+    try:
+        return pd.read_parquet(fp)
+    except Exception:
+        return None
+
+def _write_sidecar(fp: str, df: pd.DataFrame):
+    if not HAS_ARROW:
+        return
+    try:
+        os.makedirs(os.path.dirname(fp), exist_ok=True)
+        tmp = fp + ".tmp"
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, fp)
+    except Exception:
+        pass
+
+_SIDECAR_RE = r"-v(\d+)-([0-9a-f]+)\.(?:parquet|cold\.sqlite|agg\.sqlite(?:-wal|-shm)?|depts\.json)$"
+
+def _remove_old_sidecars(path: str, keep_hashes):
+    """
+    舊版本的旁檔順手清掉（還有人開著就先留著，下次再清）
+    keep_hashes：目前這版 + 上一版（增量更新要用上一版的結果）
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    d = os.path.dirname(sidecar_path(path, "x"))
+    pat = re.compile(re.escape(stem) + _SIDECAR_RE)
+    for old in glob.glob(os.path.join(d, f"{stem}-*")):
+        m = pat.match(os.path.basename(old))
+        if not m or (int(m.group(1)) == SCHEMA_VERSION and m.group(2) in keep_hashes):
+            continue
+        try:
+            os.remove(old)
+        except Exception:
+            pass
+
+
+# =========================
+# 5) manifest：每一版的科系摘要（增量更新靠它找上一版、比對哪些系有變）
+# =========================
+def _write_manifest(path: str, version: str, df: pd.DataFrame) -> dict:
+    manifest = {"version": version, "departments": dept_digests(df), "colleges": dept_colleges(df)}
+    fp = sidecar_path(path, version, ".depts.json")
+    try:
+        os.makedirs(os.path.dirname(fp), exist_ok=True)
+        tmp = fp + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp, fp)
+    except Exception:
+        pass
+    return manifest
+
+def load_manifest(path: str, version: str):
+    fp = sidecar_path(path, version, ".depts.json")
+    try:
+        with open(fp, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+def previous_manifest(path: str, version: str):
+    """同一個 CSV、同一個 SCHEMA_VERSION 的其他版本裡最新的那個 manifest（沒有就 None）"""
+    cur = os.path.basename(sidecar_path(path, version, ".depts.json"))
+    pattern = sidecar_path(path, "*", ".depts.json")
+    found = [fp for fp in glob.glob(pattern) if os.path.basename(fp) != cur]
+    for fp in sorted(found, key=os.path.getmtime, reverse=True):
+        try:
+            with open(fp, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            continue
+    return None
+
+
+def diff_manifests(old: dict, new: dict) -> dict:
+    """
+    兩版 manifest → diff_departments 的四份名單，外加
+    unchanged_colleges（所屬科系一樣、每一系都沒變）、prev_version（上一版的 version）
+    """
+    d = diff_departments(old.get("departments", {}), new.get("departments", {}))
+    same = set(d["unchanged"])
+    old_colleges = old.get("colleges", {})
+    d["unchanged_colleges"] = sorted(
+        c for c, depts in new.get("colleges", {}).items()
+        if old_colleges.get(c) == depts and set(depts) <= same
+    )
+    d["prev_version"] = old.get("version")
+    return d
+
+
+def load_school_data(path: str = DATA_FILE, version=None, use_sidecar=True):
+    """
+    回傳 (熱表 df, ColdStore)；df 唯讀使用（呼叫端要改就自己 .copy()）
+    熱表不含 COLD_COLS，index 就是 row id（cold.get(row_id) 查長文字）
+    version 只是給上層快取當 key 用；沒給就現算
+    新版檔案：上一版的熱表還在的話，沒變的 row 沿用上一版的衍生欄位
+    """
+    version = version or file_version(path)
+    hot_fp = sidecar_path(path, version)
+    cold_fp = sidecar_path(path, version, ".cold.sqlite")
+
+    cold = ColdStore.open(cold_fp) if use_sidecar else None
+    if cold is not None:
+        hot = _read_sidecar(hot_fp)
+        if hot is not None:
+            if load_manifest(path, version) is None:
+                _write_manifest(path, version, hot)
+            return hot, cold
+
+    prev_manifest = previous_manifest(path, version) if use_sidecar else None
+    prev = _read_sidecar(sidecar_path(path, prev_manifest["version"])) if prev_manifest else None
+
+    with stage("read_csv"):
+        df = pd.read_csv(path, dtype={c: str for c in TEXT_DEFAULTS})
+    with stage("normalize"):
+        df = normalize_school_df(df, prev=prev)
+    hot = df.drop(columns=COLD_COLS)
+
+    if use_sidecar:
+        with stage("write_sidecars"):
+            if cold is None:
+                try:
+                    cold = ColdStore.build(cold_fp, df)
+                except Exception:
+                    cold = None
+            _write_sidecar(hot_fp, hot)
+            _write_manifest(path, version, hot)
+            keep = {_content_hash(version)}
+            if prev_manifest:
+                keep.add(_content_hash(prev_manifest["version"]))
+            _remove_old_sidecars(path, keep)
+    if cold is None:
+        cold = ColdStore(frame=df[COLD_COLS].copy())
+    return hot, cold
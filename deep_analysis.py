@@ -0,0 +1,541 @@
+# 檔案名稱：deep_analysis.py
+# 深度解析：抓 Top3 頁面，挖「數字線索」與「結構」
+# 從 2_dashboard.py 拆出來（不依賴 streamlit），讓批次工具 / 並行抓取也能直接用
+
+import os
+import re
+import time
+import threading
+
+from geo_utils import _dedup_keep_order, _to_int_safe
+from page_store import DirPageStore, SqlitePageStore, open_page_store
+from domain_health import HEALTH_FILE, DomainHealth
+from page_parser import MAX_PARSE_CHARS, MAX_PARSE_SECONDS, scan_html
+from profiler import stage
+
+# ---- 可選：requests（深度解析用）----
+try:
+    import requests
+    HAS_REQUESTS = True
+except ImportError:
+    HAS_REQUESTS = False
+
+
+# =========================
+# 0) 基本設定
+# =========================
+# 深度解析快取：預設單檔 SQLite；舊版 serp_cache/ 資料夾第一次開啟時自動搬進來
+CACHE_PATH = "serp_cache.sqlite"
+LEGACY_CACHE_DIR = "serp_cache"
+
+# 快取有效期（秒）：成功頁面 vs 抓取失敗（失敗會依連續次數指數退避，到上限為止）
+CACHE_TTL_OK = 7 * 24 * 3600
+CACHE_TTL_FAIL = 30 * 60
+CACHE_TTL_FAIL_MAX = 3 * 24 * 3600
+
+HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+    ),
+    "Accept-Language": "zh-TW,zh;q=0.9,en;q=0.6",
+}
+
+FAQ_HINTS = ["常見問題", "FAQ", "問答", "Q&A", "QA", "問題"]
+
+
+# =========================
+# 1) 快取 + 抓取
+# =========================
+_store = None
+_store_lock = threading.Lock()
+
+def set_page_store(store):
+    """批次工具 / 測試可換快取後端（見 page_store.open_page_store）"""
+    global _store
+    with _store_lock:
+        _store = store
+
+def get_page_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = open_page_store(CACHE_PATH)
+            if isinstance(_store, SqlitePageStore) and os.path.isdir(LEGACY_CACHE_DIR) \
+                    and _store.stats()["entries"] == 0:
+                _store.migrate_from(DirPageStore(LEGACY_CACHE_DIR))
+        return _store
+
+_health = None
+
+def set_domain_health(health):
+    """批次工具 / 壓測可換網域健康度表（DomainHealth(None) = 只在記憶體）"""
+    global _health
+    with _store_lock:
+        _health = health
+
+def get_domain_health() -> DomainHealth:
+    global _health
+    with _store_lock:
+        if _health is None:
+            _health = DomainHealth(HEALTH_FILE)
+        return _health
+
+def fail_backoff(fail_count: int) -> float:
+    """連續失敗 n 次 → 等 CACHE_TTL_FAIL * 2^(n-1) 秒再試（上限 CACHE_TTL_FAIL_MAX）"""
+    n = max(1, int(fail_count or 1))
+    return min(CACHE_TTL_FAIL * (2 ** (n - 1)), CACHE_TTL_FAIL_MAX)
+
+def is_fresh(data: dict, now=None) -> bool:
+    """快取還能直接用嗎？舊版沒有時間戳記的條目一律視為過期"""
+    now = time.time() if now is None else now
+    fail_count = int(data.get("fail_count", 0) or 0)
+    if fail_count > 0 or data.get("ok") != 1:
+        checked = data.get("checked_at")
+        return bool(checked) and now < checked + fail_backoff(fail_count)
+    fetched = data.get("fetched_at")
+    return bool(fetched) and now < fetched + CACHE_TTL_OK
+
+def load_cached_page(url: str):
+    return get_page_store().get(url)
+
+def load_cached_pages(urls) -> dict:
+    """批次查快取：{url: data}，沒命中的不在結果裡"""
+    return get_page_store().get_many(urls)
+
+def save_cached_page(url: str, data: dict):
+    try:
+        get_page_store().put(url, data)
+    except Exception:
+        pass
+
+# 會重試的暫時性錯誤（其他 4xx 重試也沒用）
+RETRY_STATUS = [429, 500, 502, 503, 504]
+
+def fetch_page(url: str, timeout=10, session=None, etag=None, last_modified=None, retries=0, backoff=0.5,
+               health=None) -> dict:
+    """
+    回傳 {"status", "html", "etag", "last_modified"}；status=0 代表連線失敗/逾時
+    - etag / last_modified：帶條件請求，頁面沒變會拿到 304（html 為空）
+    - retries：逾時 / 連線錯誤 / 5xx / 429 的重試次數，間隔 backoff * 2^n 秒
+    - session 可傳入共用的 requests.Session（keep-alive 連線池）
+    - health：網域健康度（預設 get_domain_health()）；黑名單 / 斷路器打開 → 不發請求，多一個 "reason"；
+      timeout 是上限，樣本夠的網域用自適應的較短 timeout；每次請求（含重試）的狀態碼 / 耗時都回報
+    """
+    out = {"status": 0, "html": "", "etag": "", "last_modified": ""}
+    if not HAS_REQUESTS:
+        return out
+
+    health = health or get_domain_health()
+    reason = health.check(url)
+    if reason:
+        out["reason"] = reason
+        return out
+    timeout = health.timeout_for(url, timeout)
+
+    headers = dict(HEADERS)
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    getter = session.get if session is not None else requests.get
+
+    for attempt in range(retries + 1):
+        if attempt:
+            if health.is_open(url):
+                # 重試途中斷路器打開了：不用再等退避
+                break
+            time.sleep(backoff * (2 ** (attempt - 1)))
+        t0 = time.perf_counter()
+        try:
+            r = getter(url, headers=headers, timeout=timeout, allow_redirects=True)
+        except Exception:
+            health.record(url, 0, time.perf_counter() - t0, timeout=timeout)
+            out["status"] = 0
+            continue
+        health.record(url, r.status_code, time.perf_counter() - t0)
+
+        out["status"] = r.status_code
+        out["etag"] = r.headers.get("ETag") or ""
+        out["last_modified"] = r.headers.get("Last-Modified") or ""
+        if r.status_code == 304:
+            return out
+        if r.status_code in RETRY_STATUS:
+            continue
+        if r.status_code >= 400:
+            return out
+        ct = (r.headers.get("Content-Type") or "").lower()
+        if "text/html" not in ct and "application/xhtml" not in ct:
+            return out
+        out["html"] = r.text or ""
+        return out
+    return out
+
+def fetch_html(url: str, timeout=10, session=None) -> str:
+    return fetch_page(url, timeout=timeout, session=session)["html"]
+
+# =========================
+# 2) 數字線索（薪資 / 分數 / 學分 / 通過率）
+# =========================
+NUM_PATTERN = r"\d+(?:\.\d+)?%?"
+MONEY_PATTERN = r"(\d+(?:\.\d+)?)(\s*萬|\s*元|\s*[kK])"
+RANGE_PATTERN = r"(\d+(?:\.\d+)?)[\s]*[~～\-–—][\s]*(\d+(?:\.\d+)?)"
+
+KW_SALARY = ["薪", "薪資", "月薪", "年薪", "起薪", "待遇", "元", "萬", "k", "K"]
+KW_SCORE = ["分數", "級分", "錄取", "門檻", "最低", "統測", "繁星", "甄選", "落點", "PR", "倍率", "級距"]
+KW_CREDITS = ["學分", "必修", "選修", "總學分", "畢業學分", "課程地圖", "課表"]
+KW_PASS = ["及格", "通過", "合格", "及格率", "通過率", "合格率", "錄取率", "國考", "證照", "考科"]
+
+CLUE_CATS = ["passrate", "credits", "salary", "score"]  # 判斷優先順序
+CLUE_CAP = 12
+CLUE_WINDOW = 26
+CLUE_WORDS = {
+    "passrate": KW_PASS,
+    "credits": KW_CREDITS + ["學分"],
+    "salary": KW_SALARY,
+    "score": KW_SCORE,
+}
+
+def _alternation(words) -> re.Pattern:
+    """一組關鍵字 → 一條 regex（「有沒有出現」跟逐一 `k in ctx` 完全等價）"""
+    return re.compile("|".join(re.escape(w) for w in sorted(set(words), key=len)))
+
+NUM_REGEX = re.compile(NUM_PATTERN)
+CLUE_ANY_REGEX = _alternation([w for ws in CLUE_WORDS.values() for w in ws])
+CLUE_REGEXES = [(c, _alternation(CLUE_WORDS[c])) for c in CLUE_CATS]
+
+
+def _classify_ctx(val: str, ctx: str):
+    """逐字比對版（只給超長數字、context 被截斷的少數情況用）"""
+    if ("%" in val or "%" in ctx) and any(k in ctx for k in KW_PASS):
+        return "passrate"
+    if any(k in ctx for k in KW_CREDITS) or ("學分" in ctx):
+        return "credits"
+    if any(k in ctx for k in KW_SALARY):
+        return "salary"
+    if any(k in ctx for k in KW_SCORE):
+        return "score"
+    return None
+
+
+def classify_number_clues(text: str) -> dict:
+    """
+    每個數字取前後 26 字當 context，依序判斷：通過率（要有 %）> 學分 > 薪資 > 分數
+    - 關鍵字比對直接在原文 [s, e) 上跑編譯好的 regex（pos/endpos），不切字串、不逐一 `k in ctx`
+    - 視窗內完全沒有任何關鍵字（大多數數字）→ 一次 search 就跳過
+    - 四類都收滿 12 則（去重後）就提早結束，後面的文字不用再掃
+    """
+    clues = {"salary": [], "score": [], "credits": [], "passrate": []}
+    if not text:
+        return clues
+    t = text.replace("％", "%")
+    n = len(t)
+
+    seen = {c: set() for c in CLUE_CATS}
+    open_cats = len(CLUE_CATS)
+
+    for m in NUM_REGEX.finditer(t):
+        s = max(0, m.start() - CLUE_WINDOW)
+        e = min(n, m.end() + CLUE_WINDOW)
+        if CLUE_ANY_REGEX.search(t, s, e) is None:
+            continue
+
+        val = m.group()
+        ctx = t[s:e].strip()
+        if len(ctx) > 95:
+            # 截斷後的 context 才是比對範圍 → 走逐字比對
+            ctx = ctx[:95] + "…"
+            cat = _classify_ctx(val, ctx)
+        else:
+            # strip 只去空白，關鍵字 / % 是否落在視窗內不受影響
+            has_pct = "%" in val or t.find("%", s, e) >= 0
+            cat = None
+            for c, rx in CLUE_REGEXES:
+                if c == "passrate" and not has_pct:
+                    continue
+                if rx.search(t, s, e) is not None:
+                    cat = c
+                    break
+        if cat is None:
+            continue
+
+        got = clues[cat]
+        if len(got) >= CLUE_CAP or ctx in seen[cat]:
+            continue
+        seen[cat].add(ctx)
+        got.append(ctx)
+        if len(got) == CLUE_CAP:
+            open_cats -= 1
+            if not open_cats:
+                break
+    return clues
+
+def _normalize_money(num_str, unit):
+    try:
+        x = float(num_str)
+    except Exception:
+        return None
+    u = unit.lower()
+    if "萬" in u:
+        return int(x * 10000)
+    if "k" in u:
+        return int(x * 1000)
+    if "元" in u:
+        return int(x)
+    return None
+
+def summarize_salary(clues_salary: list) -> dict:
+    if not clues_salary:
+        return {"found": False, "type": "無", "range": None, "points": [], "note": ""}
+
+    types = {"月薪": 0, "年薪": 0, "起薪": 0}
+    ranges = []
+    points = []
+
+    for ctx in clues_salary[:12]:
+        points.append(ctx)
+        for t in types:
+            if t in ctx:
+                types[t] += 1
+
+        rm = re.search(RANGE_PATTERN, ctx)
+        if rm and any(k in ctx for k in ["萬", "元", "k", "K", "薪", "月薪", "年薪", "起薪"]):
+            a, b = rm.group(1), rm.group(2)
+            unit = "元" if "元" in ctx else ("萬" if "萬" in ctx else ("k" if ("k" in ctx or "K" in ctx) else "元"))
+            va = _normalize_money(a, unit)
+            vb = _normalize_money(b, unit)
+            if va and vb:
+                lo, hi = min(va, vb), max(va, vb)
+                if 15000 <= lo <= 200000 and 15000 <= hi <= 200000:
+                    ranges.append((lo, hi, ctx))
+
+    best_type = max(types, key=lambda k: types[k])
+    if types[best_type] == 0:
+        best_type = "薪資"
+
+    summary_range = None
+    if ranges:
+        lo, hi, _ = ranges[0]
+        summary_range = (lo, hi)
+
+    return {
+        "found": True,
+        "type": best_type,
+        "range": summary_range,
+        "points": _dedup_keep_order(points, max_n=6),
+        "note": "用『區間 + 年資/職務』寫法最像人，也最不容易被質疑。"
+    }
+
+def summarize_score(clues_score: list) -> dict:
+    if not clues_score:
+        return {"found": False, "points": [], "note": ""}
+    points = _dedup_keep_order(clues_score, max_n=6)
+    return {
+        "found": True,
+        "points": points,
+        "note": "門檻會浮動，最穩的寫法是『近 2–3 年區間』＋標註入學管道＋引用官方簡章。"
+    }
+
+def summarize_credits(clues_credits: list) -> dict:
+    if not clues_credits:
+        return {"found": False, "total": None, "required": None, "elective": None, "points": [], "note": ""}
+
+    text = " ".join(clues_credits[:10])
+    total = required = elective = None
+    m_total = re.search(r"(總學分|畢業學分)[^\d]{0,6}(\d{2,3})", text)
+    if m_total:
+        total = _to_int_safe(m_total.group(2))
+    m_req = re.search(r"(必修)[^\d]{0,6}(\d{2,3})", text)
+    if m_req:
+        required = _to_int_safe(m_req.group(2))
+    m_ele = re.search(r"(選修)[^\d]{0,6}(\d{2,3})", text)
+    if m_ele:
+        elective = _to_int_safe(m_ele.group(2))
+
+    return {
+        "found": True,
+        "total": total,
+        "required": required,
+        "elective": elective,
+        "points": _dedup_keep_order(clues_credits, max_n=6),
+        "note": "學分/課程用『課程地圖 + 表格』呈現最有效，並標註來源（系網/課程系統）。"
+    }
+
+def summarize_passrate(clues_pass: list) -> dict:
+    if not clues_pass:
+        return {"found": False, "rates": [], "points": [], "note": ""}
+    points = _dedup_keep_order(clues_pass, max_n=6)
+    rates = []
+    for ctx in points:
+        for p in re.findall(r"\d+(?:\.\d+)?%", ctx):
+            rates.append(p)
+    rates = _dedup_keep_order(rates, max_n=6)
+    return {
+        "found": True,
+        "rates": rates,
+        "points": points,
+        "note": "通過率/及格率要交代『年份、口徑、母數』並標註來源（考選部/校方公開成果）。"
+    }
+
+def humanize_number_output(agg_clues: dict) -> dict:
+    return {
+        "salary": summarize_salary(agg_clues.get("salary", [])),
+        "score": summarize_score(agg_clues.get("score", [])),
+        "credits": summarize_credits(agg_clues.get("credits", [])),
+        "passrate": summarize_passrate(agg_clues.get("passrate", [])),
+    }
+
+def build_rational_citation_paragraphs(human: dict) -> str:
+    paras = []
+
+    sal = human.get("salary", {})
+    if sal.get("found"):
+        r = sal.get("range")
+        if r:
+            lo, hi = r
+            lo_w = round(lo / 10000, 1)
+            hi_w = round(hi / 10000, 1)
+            line = f"薪資不要寫成單點：比較像人會寫的方式是『區間』，大概 **{lo_w}～{hi_w} 萬/月**（依地區、班別、職務而動）。"
+        else:
+            line = "薪資建議用『區間 + 年資/職務』描述，避免單一數字造成誤解。"
+
+        paras.append(
+            "### 薪資（建議引用段落）\n"
+            f"{line}\n"
+            "- **引用建議**：104 職缺薪資區間、醫院/機構徵才公告（註明年份/職務）。"
+        )
+
+    sc = human.get("score", {})
+    if sc.get("found"):
+        paras.append(
+            "### 分數/門檻（建議引用段落）\n"
+            "錄取門檻每年會動，最穩的寫法是：**整理近 2–3 年區間**，並標註『入學管道』（統測分發/甄選/繁星）。\n"
+            "- **引用建議**：官方招生簡章、分發/甄選入學公告。"
+        )
+
+    cr = human.get("credits", {})
+    if cr.get("found"):
+        t = cr.get("total")
+        req = cr.get("required")
+        ele = cr.get("elective")
+        rows = []
+        if t: rows.append(f"- 畢業總學分：{t}")
+        if req: rows.append(f"- 必修：{req}")
+        if ele: rows.append(f"- 選修：{ele}")
+        detail = "\n".join(rows) if rows else "- 建議直接貼『學分結構表 + 課程地圖』，讀者會更安心。"
+
+        paras.append(
+            "### 學分/課程（建議引用段落）\n"
+            "課程資訊用表格最清楚：把『學分結構』＋『年級學習路徑』講清楚。\n"
+            f"{detail}\n"
+            "- **引用建議**：系網課程規劃、課程查詢系統、招生簡章附錄。"
+        )
+
+    pr = human.get("passrate", {})
+    if pr.get("found"):
+        rates = pr.get("rates") or []
+        rate_line = "片段出現的 % 包含：" + "、".join(rates) + "（仍需核對年份與口徑）。" if rates else \
+                    "若要寫通過率/及格率，務必補齊年份與來源，否則容易被質疑。"
+
+        paras.append(
+            "### 國考/證照通過率（建議引用段落）\n"
+            f"{rate_line}\n"
+            "- **引用建議**：考選部/官方公告、校方公開成果（附年份/母數）。"
+        )
+
+    if not paras:
+        return (
+            "### 建議引用段落（通用）\n"
+            "如果 Top3 缺少可查證數據，建議用『官方來源 + 表格整理 + FAQ』補齊，文章更容易被 AI 摘錄。"
+        )
+
+    return "\n\n".join(paras)
+
+
+# =========================
+# 3) 單頁解析（含快取）
+# =========================
+def parse_html(url: str, html: str, max_chars=MAX_PARSE_CHARS, max_seconds=MAX_PARSE_SECONDS) -> dict:
+    """
+    純解析（不抓、不寫快取）：html → 結果 dict
+    串流解析（page_parser.scan_html），不建 DOM；超過字元數 / 時間上限就用已讀到的部分
+    """
+    page = scan_html(html, max_chars=max_chars, max_seconds=max_seconds)
+    text = page["text"]
+
+    has_faq = 1 if any(h in text for h in FAQ_HINTS) else 0
+    bullets = [t for t in page["list_items"] if 8 <= len(t) <= 90]
+    bullets = _dedup_keep_order(bullets, max_n=14)
+
+    number_clues = classify_number_clues(text)
+
+    data = {
+        "url": url, "ok": 1,
+        "title": page["title"],
+        "meta_desc": page["meta_desc"],
+        "h1": page["h1"],
+        "h2": page["h2"],
+        "h3": page["h3"],
+        "has_table": page["has_table"],
+        "has_list": page["has_list"],
+        "has_faq": has_faq,
+        "number_clues": number_clues,
+        "bullets": bullets,
+        "text_preview": text[:900],
+    }
+    return data
+
+
+def parse_competitor_page(url: str, fetcher=None, parser=None) -> dict:
+    """
+    讀快取 → 過期才抓 → 解析 → 寫回快取
+    fetcher(url, etag=, last_modified=) -> fetch_page 格式；預設 fetch_page，並行抓取時由 FetchEngine.fetch_page 傳入
+    parser(url, html) -> parse_html 格式；預設 parse_html，批次工作可換成丟給 process pool 的版本
+    - 成功：CACHE_TTL_OK 內直接用快取；過期用 ETag / Last-Modified 條件請求，304 只更新時間不重解析
+    - 失敗：不再永久快取，依連續失敗次數指數退避後重試；手上有舊的成功結果就先沿用
+    - 網域健康度跳過（黑名單 / 斷路器打開）：沒發請求，不寫快取；有舊的成功結果就沿用
+    """
+    now = time.time()
+    with stage("page_cache"):
+        cached = load_cached_page(url)
+    if cached and is_fresh(cached, now):
+        return cached
+
+    good = cached if cached and cached.get("ok") == 1 else None
+    with stage("fetch_html"):
+        page = (fetcher or fetch_page)(
+            url,
+            etag=(good or {}).get("etag") or None,
+            last_modified=(good or {}).get("last_modified") or None,
+        )
+
+    if page["status"] == 304 and good:
+        data = dict(good)
+        data.update(fetched_at=now, checked_at=now, fail_count=0)
+        save_cached_page(url, data)
+        return data
+
+    if page.get("reason") in ("denied", "circuit_open"):
+        # 網域健康度擋下、根本沒發請求：不寫快取、不加 fail_count（退避交給斷路器的冷卻時間）
+        return dict(good) if good else {"url": url, "ok": 0, "reason": page["reason"], "status": 0}
+
+    if not page["html"]:
+        fail_count = int((cached or {}).get("fail_count", 0) or 0) + 1
+        if good:
+            # stale-on-error：保留舊內容，退避一段時間再重抓
+            data = dict(good)
+            data.update(checked_at=now, fail_count=fail_count, last_status=page["status"])
+        else:
+            data = {"url": url, "ok": 0, "reason": page.get("reason") or "fetch_failed",
+                    "status": page["status"], "checked_at": now, "fail_count": fail_count}
+        save_cached_page(url, data)
+        return data
+
+    with stage("parse"):
+        data = (parser or parse_html)(url, page["html"])
+    data.update(
+        fetched_at=now, checked_at=now, fail_count=0,
+        etag=page["etag"], last_modified=page["last_modified"],
+    )
+    save_cached_page(url, data)
+    return data
@@ -0,0 +1,287 @@
+# 檔案名稱：domain_health.py
+# 每個網域的抓取健康度：延遲 p50 / p95、失敗率、最後狀態碼，存成一個 JSON 檔（跨 rerun / 跨次執行沿用）
+# 用途（deep_analysis.fetch_page 每次抓取前後都會問 / 記一次）：
+# - 自適應 timeout：樣本夠的網域用 p95 × 2 + 1 秒（不低於 2 秒、不超過呼叫端給的上限），快的站不用每次等滿 10 秒；
+#   逾時的那次以用掉的 timeout 當樣本，變慢的站 timeout 會跟著拉回來
+# - 斷路器：連續失敗（逾時 / 連線錯誤 / 5xx / 401 / 403 / 429 / 451）3 次就打開，冷卻期內直接跳過不抓；
+#   冷卻到了放一個試探請求（half-open），成功就關、失敗冷卻時間加倍（最長 1 天）
+# - 黑名單：抓了也解析不出東西的網域（社群 / 影音，要登入或全是 JS）直接跳過；可手動加 / 解除
+# 404 / 非 HTML 只跟那一頁有關，算網域正常
+#
+# 用法（命令列）：
+#   python domain_health.py                       # 失敗率最高的 30 個網域
+#   python domain_health.py --deny www.dcard.tw   # 手動加入黑名單
+#   python domain_health.py --allow youtube.com   # 解除（內建黑名單也可以解除）
+#   python domain_health.py --reset www.dcard.tw  # 清掉某網域的統計（all = 全部）
+
+import os
+import sys
+import json
+import time
+import atexit
+import argparse
+import threading
+
+import numpy as np
+import pandas as pd
+
+from geo_utils import domain_of
+
+HEALTH_FILE = os.environ.get("POWERGEO_DOMAIN_HEALTH", "domain_health.json")
+
+# 抓了也沒用：要登入 / 內容全靠 JS（competitors.NOISE_DOMAINS 裡的社群站也在這）
+DENY_DOMAINS = ["facebook.com", "instagram.com", "threads.net", "youtube.com", "tiktok.com", "x.com", "twitter.com"]
+
+LATENCY_WINDOW = 50      # 每個網域留最近幾筆延遲
+MIN_SAMPLES = 5          # 至少幾筆才用自適應 timeout
+TIMEOUT_MIN = 2.0
+TIMEOUT_FACTOR = 2.0
+TIMEOUT_PAD = 1.0
+FAIL_THRESHOLD = 3       # 連續失敗幾次打開斷路器
+COOLDOWN = 10 * 60
+COOLDOWN_MAX = 24 * 3600
+TRIAL_TIMEOUT = 120      # half-open 的試探請求多久沒回報就再放一個
+BLOCK_STATUS = {401, 403, 407, 429, 451}
+SAVE_EVERY = 20          # 累積幾筆更新就寫檔
+SAVE_INTERVAL = 30.0     # 或距離上次寫檔幾秒
+
+
+def domain_key(url: str) -> str:
+    """網址 → host（小寫、去 port、去 www.）"""
+    host = domain_of(url).split("@")[-1].split(":")[0].rstrip(".")
+    return host[4:] if host.startswith("www.") else host
+
+
+def _matches(host: str, domains) -> bool:
+    return any(host == d or host.endswith("." + d) for d in domains)
+
+
+def is_failure(status: int) -> bool:
+    return status == 0 or status >= 500 or status in BLOCK_STATUS
+
+
+def _new_rec() -> dict:
+    return {"requests": 0, "ok": 0, "fail": 0, "timeouts": 0, "consecutive_fail": 0, "last_status": None,
+            "last_ts": 0.0, "lat_ms": [], "opens": 0, "open_until": 0.0, "trial_at": 0.0}
+
+
+class DomainHealth:
+    """
+    path=None → 只在記憶體（測試 / 壓測用）；enabled=False → 只記統計，不跳過、不改 timeout（壓測對照組）
+    check(url) → ""（可以抓）或跳過原因 "denied" / "circuit_open"
+    timeout_for(url, default) → 這次用幾秒
+    record(url, status, elapsed_sec, timeout=) → 每次請求（含重試）回報一次；status=0 = 逾時 / 連線失敗
+      逾時也算一筆延遲樣本（至少記這次用的 timeout）：不然 p95 只看成功的，timeout 越縮越短、逾時越來越多
+    """
+
+    def __init__(self, path=HEALTH_FILE, deny=DENY_DOMAINS, enabled=True):
+        self.path = path
+        self.enabled = enabled
+        self.deny_builtin = [d.lower() for d in deny]
+        self.deny_extra = set()
+        self.allow = set()
+        self.domains = {}
+        self._lock = threading.RLock()
+        self._dirty = 0
+        self._saved_at = time.time()
+        if path and os.path.exists(path):
+            self._load()
+        if path:
+            atexit.register(self.save)
+
+    # ---- 讀 / 寫 ----
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            return
+        for host, rec in (data.get("domains") or {}).items():
+            r = _new_rec()
+            r.update({k: v for k, v in rec.items() if k in r})
+            self.domains[host] = r
+        self.deny_extra = set(data.get("deny") or [])
+        self.allow = set(data.get("allow") or [])
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            data = {"domains": self.domains, "deny": sorted(self.deny_extra), "allow": sorted(self.allow)}
+            tmp = self.path + ".tmp"
+            try:
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+                os.replace(tmp, self.path)
+            except Exception:
+                return
+            self._dirty = 0
+            self._saved_at = time.time()
+
+    def _touch(self):
+        self._dirty += 1
+        if self.path and (self._dirty >= SAVE_EVERY or time.time() - self._saved_at >= SAVE_INTERVAL):
+            self.save()
+
+    # ---- 黑名單 ----
+    def is_denied(self, url: str) -> bool:
+        host = domain_key(url)
+        if _matches(host, self.allow):
+            return False
+        return _matches(host, self.deny_builtin) or _matches(host, self.deny_extra)
+
+    def deny(self, domain: str):
+        with self._lock:
+            d = domain_key(domain if "//" in domain else f"https://{domain}")
+            self.deny_extra.add(d)
+            self.allow.discard(d)
+            self._touch()
+
+    def allow_domain(self, domain: str):
+        with self._lock:
+            d = domain_key(domain if "//" in domain else f"https://{domain}")
+            self.deny_extra.discard(d)
+            self.allow.add(d)
+            self._touch()
+
+    def reset(self, domain=None):
+        with self._lock:
+            if domain is None:
+                self.domains.clear()
+            else:
+                self.domains.pop(domain_key(domain if "//" in domain else f"https://{domain}"), None)
+            self._touch()
+
+    # ---- 抓取前 ----
+    def check(self, url: str, now=None) -> str:
+        if not self.enabled:
+            return ""
+        if self.is_denied(url):
+            return "denied"
+        now = now or time.time()
+        with self._lock:
+            rec = self.domains.get(domain_key(url))
+            if rec is None or not rec["open_until"]:
+                return ""
+            if now < rec["open_until"]:
+                return "circuit_open"
+            # 冷卻到了：一次只放一個試探請求
+            if rec["trial_at"] and now - rec["trial_at"] < TRIAL_TIMEOUT:
+                return "circuit_open"
+            rec["trial_at"] = now
+            return ""
+
+    def is_open(self, url: str, now=None) -> bool:
+        """斷路器是不是開著（不佔試探名額；重試迴圈用）"""
+        if not self.enabled:
+            return False
+        with self._lock:
+            rec = self.domains.get(domain_key(url))
+            return rec is not None and (now or time.time()) < rec["open_until"]
+
+    def skips(self, url: str) -> bool:
+        """一定會被 check 擋下（黑名單 / 冷卻中）；不佔試探名額"""
+        return self.enabled and (self.is_denied(url) or self.is_open(url))
+
+    def timeout_for(self, url: str, default: float) -> float:
+        if not self.enabled:
+            return default
+        with self._lock:
+            rec = self.domains.get(domain_key(url))
+            lat = list(rec["lat_ms"]) if rec else []
+        if len(lat) < MIN_SAMPLES:
+            return default
+        p95 = float(np.percentile(lat, 95)) / 1000
+        return round(min(default, max(TIMEOUT_MIN, p95 * TIMEOUT_FACTOR + TIMEOUT_PAD)), 2)
+
+    # ---- 抓取後 ----
+    def record(self, url: str, status: int, elapsed_sec: float, now=None, timeout=None):
+        host = domain_key(url)
+        if not host:
+            return
+        now = now or time.time()
+        status = int(status or 0)
+        with self._lock:
+            rec = self.domains.setdefault(host, _new_rec())
+            rec["requests"] += 1
+            rec["last_status"] = status
+            rec["last_ts"] = round(now, 3)
+            sample = elapsed_sec if status else max(elapsed_sec, timeout or 0)
+            rec["lat_ms"] = (rec["lat_ms"] + [round(sample * 1000, 1)])[-LATENCY_WINDOW:]
+            if is_failure(status):
+                rec["fail"] += 1
+                rec["timeouts"] += 1 if status == 0 else 0
+                rec["consecutive_fail"] += 1
+                half_open = rec["open_until"] and now >= rec["open_until"]
+                if half_open or (not rec["open_until"] and rec["consecutive_fail"] >= FAIL_THRESHOLD):
+                    rec["opens"] += 1
+                    rec["open_until"] = round(now + min(COOLDOWN * 2 ** (rec["opens"] - 1), COOLDOWN_MAX), 3)
+                    rec["trial_at"] = 0.0
+            else:
+                rec["ok"] += 1
+                rec.update(consecutive_fail=0, opens=0, open_until=0.0, trial_at=0.0)
+            self._touch()
+
+    # ---- 報表 ----
+    def state(self, url: str, now=None) -> str:
+        if self.is_denied(url):
+            return "denied"
+        rec = self.domains.get(domain_key(url))
+        if rec is None or not rec["open_until"]:
+            return "ok"
+        return "open" if (now or time.time()) < rec["open_until"] else "half_open"
+
+    def table(self, domains=None) -> pd.DataFrame:
+        """Domain / Requests / OK / Fail / Fail_Rate / Timeouts / P50_ms / P95_ms / Timeout_s / Last_Status / State"""
+        cols = ["Domain", "Requests", "OK", "Fail", "Fail_Rate", "Timeouts", "P50_ms", "P95_ms",
+                "Timeout_s", "Last_Status", "State"]
+        now = time.time()
+        with self._lock:
+            hosts = list(self.domains) if domains is None else list(dict.fromkeys(domain_key(u) for u in domains))
+            rows = []
+            for h in hosts:
+                rec = self.domains.get(h) or _new_rec()
+                lat = rec["lat_ms"]
+                url = f"https://{h}/"
+                rows.append([h, rec["requests"], rec["ok"], rec["fail"],
+                             round(rec["fail"] / rec["requests"], 2) if rec["requests"] else 0.0, rec["timeouts"],
+                             round(float(np.percentile(lat, 50)), 1) if lat else None,
+                             round(float(np.percentile(lat, 95)), 1) if lat else None,
+                             self.timeout_for(url, 10.0), rec["last_status"], self.state(url, now)])
+        return pd.DataFrame(rows, columns=cols)
+
+    def stats(self) -> dict:
+        t = self.table()
+        return {"domains": len(t), "open": int((t["State"] == "open").sum()) if len(t) else 0,
+                "denied_extra": len(self.deny_extra), "requests": int(t["Requests"].sum()) if len(t) else 0}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="網域抓取健康度 / 斷路器 / 黑名單")
+    ap.add_argument("--file", default=HEALTH_FILE)
+    ap.add_argument("--top", type=int, default=30)
+    ap.add_argument("--deny", nargs="+", default=[])
+    ap.add_argument("--allow", nargs="+", default=[])
+    ap.add_argument("--reset", default=None, help="網域或 all")
+    args = ap.parse_args(argv)
+
+    h = DomainHealth(args.file)
+    for d in args.deny:
+        h.deny(d)
+    for d in args.allow:
+        h.allow_domain(d)
+    if args.reset:
+        h.reset(None if args.reset == "all" else args.reset)
+    if args.deny or args.allow or args.reset:
+        h.save()
+
+    t = h.table().sort_values(["Fail_Rate", "Requests"], ascending=False, kind="stable").head(args.top)
+    print(f"{len(h.domains)} 個網域（{args.file}）；黑名單：內建 {len(h.deny_builtin)}、手動 {sorted(h.deny_extra)}、"
+          f"解除 {sorted(h.allow)}\n")
+    with pd.option_context("display.width", 200):
+        print(t.to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
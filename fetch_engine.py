@@ -0,0 +1,93 @@
+# 檔案名稱：fetch_engine.py
+# 並行抓取引擎：共用 keep-alive 連線池 + 每個 host 限流 + 完成一筆回一筆
+# 戰情室 Top3 / 批次預抓都走這裡，總等待時間 ≈ 最慢的那一頁，而不是三頁相加
+
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from geo_utils import domain_of
+from deep_analysis import HAS_REQUESTS, fetch_page, get_domain_health, parse_competitor_page
+
+if HAS_REQUESTS:
+    import requests
+    from requests.adapters import HTTPAdapter
+
+
+class FetchEngine:
+    """
+    有上限的並行抓取：
+    - 一個 requests.Session 共用連線池（同 host 重用 TCP/TLS 連線）
+    - per_host：同一個 host 同時最多幾個請求（避免被對方擋）
+    - max_workers：整體執行緒上限
+    - retries：暫時性錯誤（逾時 / 5xx / 429）重試次數，間隔指數退避
+    - session：外部給的 Session（例如 http_replay 的錄製 / 重播版）；沒給就自己建
+    - health：網域健康度（domain_health.DomainHealth）；沒給就用 deep_analysis 的共用那一份
+      timeout 是上限：樣本夠的網域用自適應 timeout；黑名單 / 斷路器打開的網域直接跳過，不佔等待時間
+    """
+
+    def __init__(self, max_workers=8, per_host=2, timeout=10, pool_size=16, retries=0, session=None, health=None):
+        self.max_workers = max_workers
+        self.per_host = per_host
+        self.timeout = timeout
+        self.retries = retries
+        self.health = health
+
+        self._session = session
+        if self._session is None and HAS_REQUESTS:
+            self._session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+            self._session.mount("http://", adapter)
+            self._session.mount("https://", adapter)
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="geo-fetch")
+        self._host_sems = {}
+        self._lock = threading.Lock()
+
+    def _host_sem(self, url: str) -> threading.Semaphore:
+        host = domain_of(url)
+        with self._lock:
+            sem = self._host_sems.get(host)
+            if sem is None:
+                sem = threading.Semaphore(self.per_host)
+                self._host_sems[host] = sem
+            return sem
+
+    def fetch_page(self, url: str, etag=None, last_modified=None, timeout=None) -> dict:
+        """跟 deep_analysis.fetch_page 同一個合約；只有網路 I/O 佔 host 名額，解析不佔"""
+        health = self.health or get_domain_health()
+        kwargs = dict(timeout=timeout or self.timeout, session=self._session, etag=etag,
+                      last_modified=last_modified, retries=self.retries, health=health)
+        if health.skips(url):
+            # 一定會被跳過：不用排 host 名額
+            return fetch_page(url, **kwargs)
+        with self._host_sem(url):
+            return fetch_page(url, **kwargs)
+
+    def fetch(self, url: str, timeout=None) -> str:
+        """跟 fetch_html 同一個合約：失敗回空字串"""
+        return self.fetch_page(url, timeout=timeout)["html"]
+
+    def parse(self, url: str) -> dict:
+        return parse_competitor_page(url, fetcher=self.fetch_page)
+
+    def run(self, urls, fn=None):
+        """
+        並行跑 fn(url)（預設 = 抓取 + 解析），依「完成順序」yield (url, result)
+        同一個 url 只跑一次；fn 內的例外會變成 {"url", "ok": 0, "reason"}
+        """
+        fn = fn or self.parse
+        futures = {}
+        for u in dict.fromkeys(urls):
+            futures[self._executor.submit(fn, u)] = u
+
+        for fut in as_completed(futures):
+            u = futures[fut]
+            try:
+                yield u, fut.result()
+            except Exception as e:
+                yield u, {"url": u, "ok": 0, "reason": f"error:{type(e).__name__}"}
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._session is not None:
+            self._session.close()
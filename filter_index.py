@@ -0,0 +1,113 @@
+# 檔案名稱：filter_index.py
+# Sidebar STEP 1–4 + 兩個門檻滑桿的預建索引
+# 每一版資料只建一次：類別欄位 → factorize 成整數代碼（每列 4 bytes，跟值有幾種無關）；門檻欄位 → 預先排序好的陣列
+# 任何篩選組合都只是幾次「代碼 == k」再 AND，最後回傳 row 位置，不用先 df.copy() 整張表
+# 總表分頁：整份資料每種排序只排一次，篩選後用 mask 過濾排好的順序，只取看得到的那一頁
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+CATEGORY_COLS = ["College", "Department", "Keyword_Type", "Keyword_Source"]
+THRESHOLD_COLS = ["AI_Potential", "Opportunity_Score"]
+
+
+class FilterIndex:
+    def __init__(self, df: pd.DataFrame):
+        self.n = len(df)
+        self._df = df
+        self._orders = {}
+        self._order_lock = threading.Lock()
+
+        # {col: 每列的代碼}、{col: 代碼 → 值（已排序）}、{col: 值 → 代碼}
+        self.codes = {}
+        self.uniques = {}
+        self.lookup = {}
+        for c in CATEGORY_COLS:
+            codes, uniques = pd.factorize(df[c].astype(str), sort=True)
+            self.codes[c] = codes.astype(np.int32, copy=False)
+            self.uniques[c] = [str(v) for v in uniques]
+            self.lookup[c] = {v: i for i, v in enumerate(self.uniques[c])}
+
+        # {col: (row 位置依值遞增排序, 排好的值)}
+        self.sorted_cols = {}
+        for c in THRESHOLD_COLS:
+            vals = df[c].to_numpy(dtype=float)
+            order = np.argsort(vals, kind="stable")
+            self.sorted_cols[c] = (order, vals[order])
+
+        # 學院 → 科系（sidebar STEP 2 用）：(學院代碼, 科系代碼) 配對去重一次，O(N log N)
+        n_dept = max(len(self.uniques["Department"]), 1)
+        pairs = np.unique(self.codes["College"].astype(np.int64) * n_dept + self.codes["Department"])
+        depts = self.uniques["Department"]
+        self._depts_by_college = {college: [] for college in self.uniques["College"]}
+        for p in pairs.tolist():
+            self._depts_by_college[self.uniques["College"][p // n_dept]].append(depts[p % n_dept])
+
+    def values(self, col: str, mask=None) -> list:
+        """某欄位出現過的值（已排序）；給 mask 就只看被選中的 row"""
+        uniques = self.uniques[col]
+        if mask is None:
+            return list(uniques)
+        return [uniques[k] for k in np.unique(self.codes[col][mask]).tolist()]
+
+    def departments(self, college=None) -> list:
+        if college is None:
+            return self.values("Department")
+        return self._depts_by_college.get(college, [])
+
+    def threshold_mask(self, col: str, min_value) -> np.ndarray:
+        """col >= min_value 的 bool mask（二分搜尋，不掃全欄）"""
+        order, svals = self.sorted_cols[col]
+        start = int(np.searchsorted(svals, min_value, side="left"))
+        mask = np.zeros(self.n, dtype=bool)
+        mask[order[start:]] = True
+        return mask
+
+    def mask(self, equals=None, minimums=None) -> np.ndarray:
+        """
+        equals：{col: value}，value 為 None 表示不篩
+        minimums：{col: 最低門檻}
+        """
+        out = np.ones(self.n, dtype=bool)
+        for col, v in (equals or {}).items():
+            if v is None:
+                continue
+            k = self.lookup[col].get(str(v))
+            if k is None:
+                return np.zeros(self.n, dtype=bool)
+            out &= self.codes[col] == k
+        for col, v in (minimums or {}).items():
+            order, svals = self.sorted_cols[col]
+            if self.n and v <= svals[0]:
+                continue
+            out &= self.threshold_mask(col, v)
+        return out
+
+    def select(self, equals=None, minimums=None) -> np.ndarray:
+        """篩選結果的 row 位置（遞增 = 保留原本排序），直接給 df.take() 用"""
+        return np.flatnonzero(self.mask(equals, minimums))
+
+    # ---- 排序 + 分頁 ----
+    def sort_order(self, by, ascending=False) -> np.ndarray:
+        """
+        整份資料依 by 排序後的 row 位置（stable：同值維持原本順序 = 對子集合 sort_values 的結果）
+        每組 (by, ascending) 只排一次
+        """
+        key = (tuple(by), bool(ascending))
+        order = self._orders.get(key)
+        if order is None:
+            with self._order_lock:
+                order = self._orders.get(key)
+                if order is None:
+                    cols = self._df[list(by)].reset_index(drop=True)
+                    order = cols.sort_values(list(by), ascending=ascending, kind="stable").index.to_numpy()
+                    self._orders[key] = order
+        return order
+
+    def page(self, mask: np.ndarray, by, ascending=False, offset=0, limit=100):
+        """(這一頁的 row 位置, 篩選後總筆數)；O(N) 過濾、不重排"""
+        order = self.sort_order(by, ascending)
+        hits = order[mask[order]]
+        return hits[offset:offset + limit], len(hits)
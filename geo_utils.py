@@ -0,0 +1,46 @@
+# 檔案名稱：geo_utils.py
+# 共用小工具：dashboard / 深度解析 / 批次工具都會用到（不依賴 streamlit）
+
+from urllib.parse import urlparse
+
+
+def safe_str(x, default="無"):
+    if x is None:
+        return default
+    s = str(x)
+    return s if s.strip() else default
+
+def clip_text(s, n=180):
+    s = safe_str(s, "")
+    return (s[:n] + "…") if len(s) > n else s
+
+def domain_of(url: str) -> str:
+    try:
+        return urlparse(url).netloc.lower()
+    except Exception:
+        return ""
+
+def _dedup_keep_order(items, max_n=10):
+    seen = set()
+    out = []
+    for x in items:
+        x = str(x).strip()
+        if not x or x in seen:
+            continue
+        out.append(x)
+        seen.add(x)
+        if len(out) >= max_n:
+            break
+    return out
+
+def _to_int_safe(s):
+    try:
+        return int(s)
+    except Exception:
+        return None
+
+def _to_float_safe(s):
+    try:
+        return float(s)
+    except Exception:
+        return 0.0
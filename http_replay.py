@@ -0,0 +1,443 @@
+# 檔案名稱：http_replay.py
+# 抓取路徑的錄製 / 重播：不連外網也能重現 fetch_page → parse_competitor_page 的行為與耗時
+# - 錄製：RecordingSession 包住 requests.Session，每個回應（狀態碼 / Content-Type / ETag / 轉址 / 耗時 / 內文）
+#   寫進 cassette（keyword_cache.KeywordCache 的 JSONL 記錄檔，key = url_index.normalize_url）
+# - 重播：ReplayServer 是本機 HTTP server，依 cassette 回應；session() 給一個把所有 http(s) 請求
+#   改寫到本機 server 的 requests.Session（FetchEngine(session=...) / fetch_page(session=...) 直接用，原始網址不用改）
+# - 故障注入（Faults）：延遲 + 抖動、頻寬限速、錯誤狀態碼、轉址、非 HTML 內容、卡住不回；可依網域覆寫
+#   每個網址第 n 次請求的結果只由 (seed, 網址, n) 決定 → 並行順序不同，結果還是一樣
+#
+# 用法（命令列）：
+#   python http_replay.py record replay.jsonl --limit 100            # 真的去抓 school_data.csv 的 Top3，錄下來
+#   python http_replay.py serve replay.jsonl --port 8765 --latency 0.3 --error-rate 0.05 --hang-rate 0.02
+#   python http_replay.py stats replay.jsonl
+
+import sys
+import time
+import random
+import argparse
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, quote, urlencode, urlsplit
+
+from geo_utils import domain_of
+from keyword_cache import KeywordCache
+from url_index import normalize_url
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+    HAS_REQUESTS = True
+except ImportError:
+    HAS_REQUESTS = False
+
+MAX_BODY_CHARS = 2_000_000
+HOP_PARAM = "__replay_hop"       # 注入的轉址：第二跳帶這個參數，查 cassette 前拿掉
+NON_HTML_BODY = b"%PDF-1.4\n% replay stand-in\n"
+
+
+# =========================
+# 1) Cassette（錄下來的回應）
+# =========================
+class Cassette:
+    """
+    {normalize_url(網址): {"url", "status", "content_type", "etag", "last_modified", "final_url", "elapsed_ms", "body"}}
+    status=0：錄製時連線失敗 / 逾時（重播時當成卡住不回）
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._cache = KeywordCache(path)
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def get(self, url: str):
+        return self._cache.get(normalize_url(url))
+
+    def put(self, url: str, rec: dict):
+        key = normalize_url(url)
+        if key:
+            self._cache.put(key, dict(rec, url=url))
+
+    def put_pages(self, pages: dict, content_type="text/html; charset=utf-8") -> int:
+        """{網址: html}（例如合成語料）一次寫入；回傳寫了幾筆"""
+        items = {}
+        for u, html in pages.items():
+            key = normalize_url(u)
+            if key:
+                items[key] = {"url": u, "status": 200, "content_type": content_type, "etag": "",
+                              "last_modified": "", "final_url": "", "elapsed_ms": 0.0, "body": html}
+        return self._cache.put_many(items)
+
+    def urls(self) -> list:
+        return [rec.get("url") or k for k, rec in self._cache.items()]
+
+    def stats(self) -> dict:
+        recs = [rec for _, rec in self._cache.items()]
+        status = Counter(int(r.get("status") or 0) for r in recs)
+        ms = sorted(float(r.get("elapsed_ms") or 0) for r in recs)
+        return {
+            "entries": len(recs),
+            "status": dict(sorted(status.items())),
+            "html": sum(1 for r in recs if "html" in str(r.get("content_type", "")).lower()),
+            "body_mb": round(sum(len(r.get("body") or "") for r in recs) / 2**20, 2),
+            "elapsed_ms_p50": ms[len(ms) // 2] if ms else 0.0,
+            "elapsed_ms_p95": ms[int(len(ms) * 0.95)] if ms else 0.0,
+        }
+
+
+class RecordingSession:
+    """
+    requests.Session 的薄包裝：get() 照常打出去，回應順便寫進 cassette
+    fetch_page(session=...) / FetchEngine(session=...) 只用到 get / mount / close
+    """
+
+    def __init__(self, cassette: Cassette, session=None):
+        self.cassette = cassette
+        self.session = session if session is not None else requests.Session()
+
+    def get(self, url, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            r = self.session.get(url, **kwargs)
+        except Exception as e:
+            self.cassette.put(url, {"status": 0, "content_type": "", "etag": "", "last_modified": "",
+                                    "final_url": "", "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1),
+                                    "body": "", "error": type(e).__name__})
+            raise
+        ct = r.headers.get("Content-Type") or ""
+        is_html = "text/html" in ct.lower() or "application/xhtml" in ct.lower()
+        if r.status_code != 304:
+            # 304 是條件請求的結果，不蓋掉原本錄到的內文
+            self.cassette.put(url, {
+                "status": r.status_code, "content_type": ct,
+                "etag": r.headers.get("ETag") or "", "last_modified": r.headers.get("Last-Modified") or "",
+                "final_url": r.url if r.history and r.url != url else "",
+                "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1),
+                "body": (r.text or "")[:MAX_BODY_CHARS] if is_html and r.status_code < 400 else "",
+            })
+        return r
+
+    def mount(self, prefix, adapter):
+        self.session.mount(prefix, adapter)
+
+    def close(self):
+        self.session.close()
+
+
+# =========================
+# 2) 故障注入設定
+# =========================
+class Faults:
+    """
+    latency / jitter：回第一個 byte 前等幾秒（jitter 是 0~jitter 的均勻亂數）
+    bytes_per_sec：內文限速（0 = 不限）
+    error_rate / error_status：這個比例的請求回錯誤狀態碼（從 error_status 輪流抽）
+    redirect_rate：先回 302 到同一頁（多一跳）
+    non_html_rate：回 application/pdf
+    hang_rate / hang_sec：收到請求後卡 hang_sec 秒都不回（測 timeout）
+    replay_latency：照 cassette 錄到的耗時等（加在 latency 上）
+    by_domain：{網域（含子網域）: {上面任一欄位, "status": 固定回這個狀態碼}}
+    """
+
+    FIELDS = ("latency", "jitter", "bytes_per_sec", "error_rate", "error_status", "redirect_rate",
+              "non_html_rate", "hang_rate", "hang_sec", "replay_latency", "status")
+
+    def __init__(self, latency=0.0, jitter=0.0, bytes_per_sec=0, error_rate=0.0, error_status=(500, 503, 429),
+                 redirect_rate=0.0, non_html_rate=0.0, hang_rate=0.0, hang_sec=30.0, replay_latency=False,
+                 by_domain=None, seed=0):
+        self.base = {"latency": latency, "jitter": jitter, "bytes_per_sec": bytes_per_sec,
+                     "error_rate": error_rate, "error_status": tuple(error_status), "redirect_rate": redirect_rate,
+                     "non_html_rate": non_html_rate, "hang_rate": hang_rate, "hang_sec": hang_sec,
+                     "replay_latency": replay_latency, "status": None}
+        self.by_domain = {d.lower().lstrip("."): dict(v) for d, v in (by_domain or {}).items()}
+        self.seed = seed
+
+    def for_url(self, url: str) -> dict:
+        """這個網址適用的設定（最長的網域後綴覆寫）"""
+        host = domain_of(url).split(":")[0]
+        best = None
+        for d in self.by_domain:
+            if (host == d or host.endswith("." + d)) and (best is None or len(d) > len(best)):
+                best = d
+        if best is None:
+            return self.base
+        out = dict(self.base)
+        out.update({k: v for k, v in self.by_domain[best].items() if k in self.FIELDS})
+        return out
+
+    def rng(self, key: str, n: int) -> random.Random:
+        return random.Random(f"{self.seed}|{key}|{n}")
+
+
+# =========================
+# 3) 本機重播 server
+# =========================
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def do_GET(self):
+        self.server.replay._handle(self)
+
+    def do_HEAD(self):
+        self.server.replay._handle(self, head=True)
+
+
+def _header_url(url: str) -> str:
+    """放進 header 的網址：中文路徑等非 ASCII 字元先 percent-encode（header 只能送 latin-1）；已編碼的 %XX 不動"""
+    return quote(url, safe=":/?#[]@!$&'()*+,;=%")
+
+
+class ReplayServer:
+    """
+    with ReplayServer(cassette, faults) as srv:
+        engine = FetchEngine(session=srv.session())
+    本機網址格式：http://127.0.0.1:<port>/<scheme>/<host[:port]>/<path>?<query>
+    """
+
+    def __init__(self, cassette, faults=None, host="127.0.0.1", port=0):
+        self.cassette = cassette
+        self.faults = faults or Faults()
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.replay = self
+        self.base_url = f"http://{host}:{self._httpd.server_address[1]}"
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._seen = Counter()       # 每個網址第幾次被請求（決定這次注入什麼）
+        self.counts = Counter()      # 各種結果的次數
+        self.bytes_sent = 0
+
+    # ---- 啟動 / 關閉 ----
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._httpd.serve_forever, name="replay-server", daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self):
+        self._stop.set()
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---- 網址改寫 ----
+    def local_url(self, url: str) -> str:
+        if url.startswith(self.base_url):
+            return url
+        p = urlsplit(url)
+        q = f"?{p.query}" if p.query else ""
+        return f"{self.base_url}/{p.scheme}/{p.netloc}{p.path or '/'}{q}"
+
+    def _original_url(self, path: str):
+        """本機路徑 → (原始網址, 是不是注入轉址的第二跳)"""
+        p = urlsplit(path)
+        parts = p.path.lstrip("/").split("/", 2)
+        if len(parts) < 2 or parts[0] not in ("http", "https"):
+            return "", False
+        query = parse_qsl(p.query, keep_blank_values=True)
+        hop = any(k == HOP_PARAM for k, _ in query)
+        q = urlencode([(k, v) for k, v in query if k != HOP_PARAM])
+        rest = "/" + parts[2] if len(parts) > 2 else "/"
+        return f"{parts[0]}://{parts[1]}{rest}" + (f"?{q}" if q else ""), hop
+
+    def session(self, pool_size=16):
+        """所有 http(s) 請求都改打本機 server 的 requests.Session（不吃系統 proxy 設定）"""
+        s = requests.Session()
+        s.trust_env = False
+        adapter = _ReplayAdapter(self, pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        s.mount("http://", adapter)
+        s.mount("https://", adapter)
+        return s
+
+    # ---- 回應 ----
+    def _count(self, outcome: str, nbytes=0):
+        with self._lock:
+            self.counts[outcome] += 1
+            self.bytes_sent += nbytes
+
+    def _handle(self, h: BaseHTTPRequestHandler, head=False):
+        url, hop = self._original_url(h.path)
+        key = normalize_url(url)
+        with self._lock:
+            n = self._seen[key]
+            self._seen[key] += 1
+        f = self.faults.for_url(url)
+        rnd = self.faults.rng(key, n)
+        rec = self.cassette.get(url) if key else None
+
+        if rnd.random() < f["hang_rate"] or (rec is not None and int(rec.get("status") or 0) == 0):
+            self._count("hang")
+            self._stop.wait(f["hang_sec"])
+            h.close_connection = True
+            return
+
+        delay = f["latency"] + rnd.random() * f["jitter"]
+        if f["replay_latency"] and rec is not None:
+            delay += float(rec.get("elapsed_ms") or 0) / 1000
+        if delay > 0 and self._stop.wait(delay):
+            return
+
+        status = f["status"]
+        if status is None and rnd.random() < f["error_rate"] and f["error_status"]:
+            status = rnd.choice(f["error_status"])
+        if status is not None:
+            self._send(h, int(status), b"", "text/html; charset=utf-8", head=head, outcome="error")
+            return
+        if rec is None:
+            self._send(h, 404, b"", "text/html; charset=utf-8", head=head, outcome="not_found")
+            return
+        if not hop and rnd.random() < f["redirect_rate"]:
+            sep = "&" if urlsplit(url).query else "?"
+            self._send(h, 302, b"", "text/html; charset=utf-8", head=head, outcome="redirect",
+                       headers={"Location": _header_url(f"{url}{sep}{HOP_PARAM}=1")})
+            return
+        if rec.get("final_url") and not hop:
+            # 錄製時有轉址：先回 301 到錄到的最終網址
+            self._send(h, 301, b"", "text/html; charset=utf-8", head=head, outcome="redirect",
+                       headers={"Location": _header_url(rec["final_url"])})
+            return
+
+        etag = rec.get("etag") or ""
+        headers = {}
+        if etag:
+            headers["ETag"] = etag
+        if rec.get("last_modified"):
+            headers["Last-Modified"] = rec["last_modified"]
+        if etag and h.headers.get("If-None-Match") == etag:
+            self._send(h, 304, b"", rec.get("content_type") or "", head=head, outcome="not_modified", headers=headers)
+            return
+        if rnd.random() < f["non_html_rate"]:
+            self._send(h, 200, NON_HTML_BODY, "application/pdf", head=head, outcome="non_html")
+            return
+        body = (rec.get("body") or "").encode("utf-8")
+        self._send(h, int(rec.get("status") or 200), body, rec.get("content_type") or "text/html; charset=utf-8",
+                   head=head, outcome="ok", headers=headers, bytes_per_sec=f["bytes_per_sec"])
+
+    def _send(self, h, status: int, body: bytes, content_type: str, head=False, outcome="ok",
+              headers=None, bytes_per_sec=0):
+        try:
+            h.send_response(status)
+            if content_type:
+                h.send_header("Content-Type", content_type)
+            h.send_header("Content-Length", str(len(body)))
+            for k, v in (headers or {}).items():
+                h.send_header(k, v)
+            h.end_headers()
+            if not head and body:
+                if bytes_per_sec > 0:
+                    chunk = max(1024, int(bytes_per_sec) // 20)
+                    for i in range(0, len(body), chunk):
+                        h.wfile.write(body[i:i + chunk])
+                        if self._stop.wait(chunk / bytes_per_sec):
+                            break
+                else:
+                    h.wfile.write(body)
+            self._count(outcome, 0 if head else len(body))
+        except (BrokenPipeError, ConnectionResetError):
+            # 用戶端先逾時斷線
+            self._count("client_gone")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"requests": sum(self._seen.values()), "urls": len(self._seen),
+                    "outcomes": dict(self.counts), "mb_sent": round(self.bytes_sent / 2**20, 2)}
+
+
+if HAS_REQUESTS:
+    class _ReplayAdapter(HTTPAdapter):
+        """送出前把網址改寫成本機 server（轉址的 Location 是原始網址，也會再被改寫）"""
+
+        def __init__(self, server: ReplayServer, **kwargs):
+            self._server = server
+            super().__init__(**kwargs)
+
+        def send(self, request, **kwargs):
+            request.url = self._server.local_url(request.url)
+            return super().send(request, **kwargs)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="抓取路徑的錄製 / 本機重播 server")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("record", help="真的抓 CSV 裡的 Top3 網址並錄下來")
+    p.add_argument("cassette")
+    p.add_argument("--csv", default="school_data.csv")
+    p.add_argument("--limit", type=int, default=0)
+    p.add_argument("--workers", type=int, default=8)
+    p.add_argument("--per-host", type=int, default=2)
+    p.add_argument("--timeout", type=float, default=10)
+    p = sub.add_parser("serve", help="本機重播 server（Ctrl+C 結束）")
+    p.add_argument("cassette")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--latency", type=float, default=0.0)
+    p.add_argument("--jitter", type=float, default=0.0)
+    p.add_argument("--bytes-per-sec", type=int, default=0)
+    p.add_argument("--error-rate", type=float, default=0.0)
+    p.add_argument("--redirect-rate", type=float, default=0.0)
+    p.add_argument("--non-html-rate", type=float, default=0.0)
+    p.add_argument("--hang-rate", type=float, default=0.0)
+    p.add_argument("--hang-sec", type=float, default=30.0)
+    p.add_argument("--replay-latency", action="store_true", help="照錄到的耗時等")
+    p.add_argument("--seed", type=int, default=0)
+    p = sub.add_parser("stats")
+    p.add_argument("cassette")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "stats":
+        print(Cassette(args.cassette).stats())
+        return 0
+    if not HAS_REQUESTS:
+        print("❌ 需要 requests：pip install requests", file=sys.stderr)
+        return 2
+
+    if args.cmd == "record":
+        from fetch_engine import FetchEngine
+        from precrawl import collect_links
+
+        urls = collect_links(args.csv)
+        if args.limit > 0:
+            urls = urls[:args.limit]
+        rec = RecordingSession(Cassette(args.cassette))
+        engine = FetchEngine(max_workers=args.workers, per_host=args.per_host, timeout=args.timeout, session=rec)
+        ok = 0
+        try:
+            for u, page in engine.run(urls, fn=engine.fetch_page):
+                ok += 1 if page["html"] else 0
+        finally:
+            engine.close()
+        print(f"錄了 {len(urls)} 個網址（{ok} 個 HTML）→ {args.cassette}")
+        return 0
+
+    faults = Faults(latency=args.latency, jitter=args.jitter, bytes_per_sec=args.bytes_per_sec,
+                    error_rate=args.error_rate, redirect_rate=args.redirect_rate, non_html_rate=args.non_html_rate,
+                    hang_rate=args.hang_rate, hang_sec=args.hang_sec, replay_latency=args.replay_latency,
+                    seed=args.seed)
+    cassette = Cassette(args.cassette)
+    srv = ReplayServer(cassette, faults, host=args.host, port=args.port).start()
+    print(f"重播 {len(cassette)} 頁：{srv.base_url}/https/<host>/<path>（Ctrl+C 結束）")
+    try:
+        while True:
+            time.sleep(5)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        srv.close()
+    print(srv.stats())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
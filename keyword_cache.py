@@ -0,0 +1,281 @@
+# 檔案名稱：keyword_cache.py
+# 關鍵字快取（autocomplete_cache.json / trends_cache.json 的替代格式）
+# 一個 append-only 的 JSONL 記錄檔 + 記憶體索引（dict）：查詢 / 新增都是 O(1)，寫入只 append 一行，不重寫整檔
+# 多個行程同時寫：append 與整理（compact）都拿檔案鎖（fcntl，沒有就只鎖同一行程）；
+# 每次寫入前先把別人 append 的新行讀進來；整理時寫暫存檔再 os.replace，其他行程發現換檔就整個重讀
+#
+# 用法（命令列）：
+#   python keyword_cache.py import autocomplete_cache.json autocomplete_cache.jsonl   # 一次性匯入舊 JSON
+#   python keyword_cache.py stats trends_cache.jsonl
+#   python keyword_cache.py compact trends_cache.jsonl
+#   python keyword_cache.py export trends_cache.jsonl trends_cache.json              # 轉回舊格式（給舊程式用）
+
+import os
+import sys
+import json
+import threading
+import argparse
+from contextlib import contextmanager
+
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:
+    HAS_FCNTL = False
+
+AUTOCOMPLETE_JSON = "autocomplete_cache.json"
+TRENDS_JSON = "trends_cache.json"
+AUTOCOMPLETE_CACHE = "autocomplete_cache.jsonl"
+TRENDS_CACHE = "trends_cache.jsonl"
+
+# 記錄檔裡「被覆蓋 / 刪掉的舊行」超過這個比例就整理
+COMPACT_RATIO = 0.5
+COMPACT_MIN_LINES = 1000
+
+_MISSING = object()
+
+
+def ac_key(seed: str, hl="zh-TW", gl="tw") -> str:
+    """autocomplete 快取的 key：ac::<hl>::<gl>::<seed>（跟舊 JSON 一樣）"""
+    return f"ac::{hl}::{gl}::{seed}"
+
+def ac_seed(key: str) -> str:
+    """ac_key 的反向：取出 seed（不是 ac:: 開頭就原樣回傳）"""
+    parts = key.split("::", 3)
+    return parts[3] if len(parts) == 4 and parts[0] == "ac" else key
+
+
+def _line(key: str, value=_MISSING) -> bytes:
+    rec = {"k": key, "d": 1} if value is _MISSING else {"k": key, "v": value}
+    return (json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+class KeywordCache:
+    """
+    get / put / delete / items 跟 dict 差不多；值要能 JSON 序列化
+    一行一筆：{"k": key, "v": value}；刪除 {"k": key, "d": 1}；同一個 key 後面的行蓋掉前面
+    寫到一半被中斷的最後一行（沒有換行）讀的時候跳過，下一次 append 先補換行
+    """
+
+    def __init__(self, path: str, compact_ratio=COMPACT_RATIO):
+        self.path = path
+        self.compact_ratio = compact_ratio
+        d = os.path.dirname(os.path.abspath(path))
+        os.makedirs(d, exist_ok=True)
+        self._data = {}
+        self._lines = 0        # 記錄檔裡完整的行數（含被覆蓋的）
+        self._offset = 0       # 已經讀到哪個 byte（只算到最後一個換行）
+        self._ino = None
+        self._lock = threading.RLock()
+        with self._lock:
+            self._catch_up()
+
+    # ---- 鎖 ----
+    @contextmanager
+    def _file_lock(self):
+        with self._lock:
+            if not HAS_FCNTL:
+                yield
+                return
+            with open(self.path + ".lock", "a") as lf:
+                fcntl.flock(lf.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lf.fileno(), fcntl.LOCK_UN)
+
+    # ---- 讀 ----
+    def _catch_up(self):
+        """把記錄檔裡還沒讀過的完整行讀進索引；檔案被整理（換 inode / 變短）就整個重讀"""
+        try:
+            st_ = os.stat(self.path)
+        except FileNotFoundError:
+            self._data, self._lines, self._offset, self._ino = {}, 0, 0, None
+            return
+        if st_.st_ino != self._ino or st_.st_size < self._offset:
+            self._data, self._lines, self._offset = {}, 0, 0
+            self._ino = st_.st_ino
+        if st_.st_size == self._offset:
+            return
+
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            chunk = f.read()
+        end = chunk.rfind(b"\n") + 1
+        for raw in chunk[:end].splitlines():
+            if not raw.strip():
+                continue
+            self._lines += 1
+            try:
+                rec = json.loads(raw)
+                k = rec["k"]
+            except Exception:
+                continue
+            if rec.get("d"):
+                self._data.pop(k, None)
+            else:
+                self._data[k] = rec.get("v")
+        self._offset += end
+
+    def refresh(self):
+        """讀進其他行程新寫的資料（長時間開著的讀者偶爾呼叫一次）"""
+        with self._lock:
+            self._catch_up()
+
+    def get(self, key: str, default=None):
+        return self._data.get(key, default)
+
+    def __contains__(self, key) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def keys(self):
+        return list(self._data.keys())
+
+    def items(self):
+        return list(self._data.items())
+
+    def to_dict(self) -> dict:
+        return dict(self._data)
+
+    # ---- 寫 ----
+    def _append(self, lines: list):
+        with open(self.path, "ab") as f:
+            # 上一個寫入者可能死在半行：先補換行，不要黏到下一筆
+            if f.tell() > 0:
+                with open(self.path, "rb") as r:
+                    r.seek(-1, os.SEEK_END)
+                    if r.read(1) != b"\n":
+                        f.write(b"\n")
+            f.write(b"".join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def put_many(self, items: dict) -> int:
+        """只 append 真的有變的 key；回傳寫了幾筆"""
+        with self._file_lock():
+            self._catch_up()
+            lines = []
+            for k, v in items.items():
+                if self._data.get(k, _MISSING) != v:
+                    lines.append(_line(k, v))
+            if not lines:
+                return 0
+            self._append(lines)
+            self._catch_up()
+            self._maybe_compact()
+        return len(lines)
+
+    def put(self, key: str, value):
+        self.put_many({key: value})
+
+    def delete(self, key: str):
+        with self._file_lock():
+            self._catch_up()
+            if key not in self._data:
+                return
+            self._append([_line(key)])
+            self._catch_up()
+            self._maybe_compact()
+
+    # ---- 整理 ----
+    def _maybe_compact(self):
+        dead = self._lines - len(self._data)
+        if self._lines >= COMPACT_MIN_LINES and dead > self._lines * self.compact_ratio:
+            self._compact_locked()
+
+    def _compact_locked(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(b"".join(_line(k, v) for k, v in self._data.items()))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self._ino = None
+        self._catch_up()
+
+    def compact(self):
+        """只留每個 key 的最新值，重寫成新檔（暫存檔 + os.replace）"""
+        with self._file_lock():
+            self._catch_up()
+            self._compact_locked()
+
+    def stats(self) -> dict:
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        return {"path": self.path, "entries": len(self._data), "lines": self._lines, "file_bytes": size}
+
+
+# =========================
+# 舊 JSON ↔ 記錄檔
+# =========================
+def import_json(json_path: str, cache) -> int:
+    """
+    舊的整包 JSON（{key: value}）匯入；已經一樣的 key 不重寫，可以重複執行
+    cache：KeywordCache 或記錄檔路徑；回傳寫了幾筆
+    """
+    if not isinstance(cache, KeywordCache):
+        cache = KeywordCache(cache)
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"{json_path} 不是 {{key: value}} 格式")
+    return cache.put_many(data)
+
+def export_json(cache, json_path: str) -> int:
+    """記錄檔 → 舊格式 JSON（暫存檔 + os.replace）；回傳筆數"""
+    if not isinstance(cache, KeywordCache):
+        cache = KeywordCache(cache)
+    tmp = json_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cache.to_dict(), f, ensure_ascii=False, indent=2)
+    os.replace(tmp, json_path)
+    return len(cache)
+
+def open_keyword_cache(path: str, legacy_json=None) -> KeywordCache:
+    """打開記錄檔；還沒有記錄檔、但舊 JSON 在 → 先匯入一次"""
+    fresh = not os.path.exists(path)
+    cache = KeywordCache(path)
+    if fresh and legacy_json and os.path.exists(legacy_json):
+        try:
+            import_json(legacy_json, cache)
+        except Exception:
+            pass
+    return cache
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="關鍵字快取（JSONL 記錄檔）")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("import", help="舊 JSON → 記錄檔")
+    p.add_argument("json_path")
+    p.add_argument("cache_path")
+    p = sub.add_parser("export", help="記錄檔 → 舊 JSON")
+    p.add_argument("cache_path")
+    p.add_argument("json_path")
+    p = sub.add_parser("stats")
+    p.add_argument("cache_path")
+    p = sub.add_parser("compact")
+    p.add_argument("cache_path")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "import":
+        n = import_json(args.json_path, args.cache_path)
+        print(f"匯入 {n} 筆 → {args.cache_path}")
+    elif args.cmd == "export":
+        n = export_json(args.cache_path, args.json_path)
+        print(f"匯出 {n} 筆 → {args.json_path}")
+    elif args.cmd == "compact":
+        cache = KeywordCache(args.cache_path)
+        before = cache.stats()
+        cache.compact()
+        after = cache.stats()
+        print(f"{before['lines']} 行 / {before['file_bytes']} bytes → {after['lines']} 行 / {after['file_bytes']} bytes")
+    else:
+        print(json.dumps(KeywordCache(args.cache_path).stats(), ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+# 檔案名稱：keyword_clusters.py
+# 近似重複關鍵字分群：字元 n-gram → MinHash 簽章 → LSH 分桶 → 桶內候選對用簽章估 Jaccard 確認 → 星狀分群
+# 關鍵字切成「主詞 / 中段 / 意圖」（第一個詞組 / 中間 / 最後一個詞組）：同科系、主詞跟意圖都一樣才可能同群，
+# 只比中段；中段裡只是主詞換個說法的詞組（主詞前後只多了「科」「我是…人」這類字）先拿掉
+# 意圖不同就是不同的問題：「幼保 系到底在幹嘛 實習」「幼保 系到底在幹嘛 是什麼」不同群；「托育 是什麼」「幼保 是什麼」也不同群
+# 星狀分群：依「代表寫法」的優先序，每個還沒分到群的當中心，把跟「它」夠像的鄰居收進來（不會 A~B~C 一路串下去）
+# 例：「幼保 幼保科 需要證照嗎」「幼保 我是幼保人 需要證照嗎」「幼保 幼保 需要證照嗎」→ 同一群
+# 全部用 numpy 向量化，不做兩兩比較：10 萬筆關鍵字只比同一個桶裡的（大桶只比排序後相鄰 WINDOW 個）
+# 每列得到 Cluster_Id + Canonical_Keyword（群裡出現最多次的寫法；同次數取短的、再取先出現的）
+
+import re
+import zlib
+import numpy as np
+import pandas as pd
+
+from keyword_index import normalize_keyword, split_tokens
+
+SHINGLE = 2          # 字元 n-gram（只在同一個詞組內取，不跨空白）
+NUM_PERM = 128
+BANDS = 32           # 32 個 band × 每 band 4 列：Jaccard 約 0.42 以上就很可能同桶
+THRESHOLD = 0.7      # 桶內確認：簽章一致比例（≈ Jaccard）至少這麼多才算同群
+WINDOW = 24          # 同桶候選對：排序後往後看幾個
+# 主詞前後只多了這些字（可以連著好幾個）= 同一個主詞換個說法：幼保科、我是幼保人、視光師是什麼、什麼是語言治療師
+HEAD_AFFIXES = ["我是", "什麼是", "是什麼", "科", "系", "人", "師", "學"]
+_AFFIX_REGEX = re.compile("(?:" + "|".join(HEAD_AFFIXES) + ")*")
+SEED = 1_234_567
+
+_U64 = np.uint64
+
+
+def shingles(keyword: str, n=SHINGLE, normalized=False) -> set:
+    """詞組內的字元 n-gram；太短的詞組整個當一個"""
+    if not normalized:
+        keyword = normalize_keyword(keyword)
+    out = set()
+    for tok in split_tokens(keyword):
+        if len(tok) <= n:
+            out.add(tok)
+        else:
+            out.update(tok[i:i + n] for i in range(len(tok) - n + 1))
+    return out or {keyword}
+
+
+def is_head_variant(token: str, head: str) -> bool:
+    """token 是不是主詞加上 HEAD_AFFIXES（「幼保科」之於「幼保」是；「護理國考」「臨床護理」之於「護理」不是）"""
+    k = token.find(head)
+    if k < 0:
+        return False
+    return bool(_AFFIX_REGEX.fullmatch(token[:k])) and bool(_AFFIX_REGEX.fullmatch(token[k + len(head):]))
+
+
+def split_keyword(keyword: str, normalized=False) -> tuple:
+    """
+    (主詞, 中段, 意圖)：第一個詞組 / 中間的詞組 / 最後一個詞組（只有一個詞組時意圖為空）
+    中段裡只是主詞換個說法的詞組（is_head_variant）拿掉
+    """
+    if not normalized:
+        keyword = normalize_keyword(keyword)
+    toks = split_tokens(keyword)
+    if not toks:
+        return keyword, (), ""
+    head = toks[0]
+    intent = toks[-1] if len(toks) > 1 else ""
+    middle = tuple(t for t in toks[1:-1] if not is_head_variant(t, head))
+    return head, middle, intent
+
+
+def shingle_sets(keywords) -> list:
+    """
+    keywords 要先 normalize_keyword 過
+    每個關鍵字「中段」的 shingle 集合（主詞 / 意圖由呼叫端放進分組，不在這裡比）；中段是空的 → {""}
+    """
+    return [shingles(" ".join(split_keyword(k, normalized=True)[1]), normalized=True) for k in keywords]
+
+
+def _perm_params(num_perm=NUM_PERM, seed=SEED):
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2**63, size=num_perm, dtype=np.uint64) | _U64(1)  # 奇數
+    b = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+    return a, b
+
+
+def minhash_signatures(sets, num_perm=NUM_PERM, seed=SEED) -> np.ndarray:
+    """
+    sets：每個關鍵字的 shingle 集合（shingle_sets）
+    (n, num_perm) uint32：每個 permutation = multiply-shift 雜湊 ((a·x + b) mod 2^64) >> 32
+    shingle 先用 crc32 變成 32-bit 整數；同一個關鍵字的 shingle 攤平後用 reduceat 取最小值
+    """
+    sets = [sorted(s) for s in sets]
+    lengths = np.fromiter((len(s) for s in sets), dtype=np.int64, count=len(sets))
+    if len(sets) == 0:
+        return np.zeros((0, num_perm), dtype=np.uint32)
+    offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    # 不同的 shingle 沒幾種：每種只算一次 crc32
+    crc = {}
+    for s in sets:
+        for g in s:
+            if g not in crc:
+                crc[g] = zlib.crc32(g.encode("utf-8"))
+    x = np.fromiter((crc[g] for s in sets for g in s), dtype=np.uint64, count=int(lengths.sum()))
+
+    a, b = _perm_params(num_perm, seed)
+    sig = np.empty((len(sets), num_perm), dtype=np.uint32)
+    with np.errstate(over="ignore"):
+        for i in range(num_perm):
+            hv = ((a[i] * x + b[i]) >> _U64(32)).astype(np.uint32)
+            sig[:, i] = np.minimum.reduceat(hv, offsets)
+    return sig
+
+
+def lsh_pairs(sig: np.ndarray, groups=None, bands=BANDS, window=WINDOW):
+    """
+    每個 band 的簽章片段雜湊成 bucket key（group 也混進去，不同組不同桶）
+    同桶的候選對：排序後距離 1..window 且同 key → 回傳去重後的 (i, j)，i < j
+    """
+    n, num_perm = sig.shape
+    rows = num_perm // bands
+    grp = np.zeros(n, dtype=np.uint64) if groups is None else np.asarray(groups).astype(np.uint64)
+    keys = []
+    with np.errstate(over="ignore"):
+        for band in range(bands):
+            part = sig[:, band * rows:(band + 1) * rows].astype(np.uint64)
+            h = (grp + _U64(1)) * _U64(0x9E3779B97F4A7C15) + _U64(band)
+            for j in range(rows):
+                h = (h ^ part[:, j]) * _U64(0x100000001B3)
+            order = np.argsort(h, kind="stable")
+            hs = h[order]
+            for d in range(1, min(window, n - 1) + 1):
+                same = np.flatnonzero(hs[d:] == hs[:-d])
+                if len(same) == 0:
+                    break
+                i, j = order[same], order[same + d]
+                lo, hi = np.minimum(i, j), np.maximum(i, j)
+                keys.append(lo.astype(np.int64) * n + hi)
+    if not keys:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    packed = np.unique(np.concatenate(keys))
+    return packed // n, packed % n
+
+
+def verify_pairs(sig: np.ndarray, i: np.ndarray, j: np.ndarray, threshold=THRESHOLD, chunk=200_000):
+    """簽章一致比例（≈ Jaccard）>= threshold 的候選對"""
+    keep = np.zeros(len(i), dtype=bool)
+    for s in range(0, len(i), chunk):
+        e = s + chunk
+        keep[s:e] = (sig[i[s:e]] == sig[j[s:e]]).mean(axis=1) >= threshold
+    return i[keep], j[keep]
+
+
+def star_clusters(n: int, i: np.ndarray, j: np.ndarray, priority: np.ndarray) -> np.ndarray:
+    """
+    priority：點的處理順序（越前面越適合當代表）
+    回傳每個點的中心編號；中心 = 自己
+    """
+    center = np.full(n, -1, dtype=np.int64)
+    if len(i):
+        src = np.concatenate([i, j])
+        dst = np.concatenate([j, i])
+        order = np.argsort(src, kind="stable")
+        src, dst = src[order], dst[order]
+        starts = np.searchsorted(src, np.arange(n + 1))
+    for c in priority:
+        if center[c] != -1:
+            continue
+        center[c] = c
+        if len(i):
+            nb = dst[starts[c]:starts[c + 1]]
+            nb = nb[center[nb] == -1]
+            center[nb] = c
+    return center
+
+
+def cluster_keywords(keywords, groups=None, threshold=THRESHOLD):
+    """
+    keywords：每列的關鍵字；groups：每列的分組（例如科系），不同組不會同群
+    組內再依（主詞, 意圖）細分：意圖不同 = 不同的問題，不會同群
+    回傳 (cluster_id ndarray[int32]，依第一次出現編號, canonical ndarray[object])
+    """
+    kw = pd.Series(keywords, dtype=object).astype(str).reset_index(drop=True)
+    norm = kw.map(normalize_keyword)
+    grp = (pd.Series(groups).astype(str).reset_index(drop=True) if groups is not None
+           else pd.Series("", index=kw.index))
+    grp_codes, _ = pd.factorize(grp)
+
+    # 完全一樣的寫法（同組）先併成一個
+    form_codes, forms = pd.factorize(pd.Series(grp_codes).astype(str) + "\x00" + norm)
+    first_row = pd.Series(np.arange(len(kw))).groupby(form_codes).first().to_numpy()
+    form_count = np.bincount(form_codes, minlength=len(forms)) if len(kw) else np.zeros(0, dtype=np.int64)
+    form_norm = norm.to_numpy()[first_row]
+    head_intent = [(h, t) for h, _, t in (split_keyword(k, normalized=True) for k in form_norm)]
+    form_grp, _ = pd.factorize(pd.Series(grp_codes[first_row]).astype(str) + "\x00"
+                               + pd.Series([f"{h}\x00{t}" for h, t in head_intent], dtype=object))
+
+    sig = minhash_signatures(shingle_sets(form_norm))
+    i, j = verify_pairs(sig, *lsh_pairs(sig, form_grp), threshold=threshold)
+
+    # 代表寫法的優先序：次數最多 → 字最短 → 最先出現
+    form_len = np.fromiter((len(s) for s in form_norm), dtype=np.int64, count=len(first_row))
+    priority = np.lexsort((first_row, form_len, -form_count))
+    center = star_clusters(len(first_row), i, j, priority)
+
+    row_center = center[form_codes]
+    cluster_id, _ = pd.factorize(row_center)
+    canonical = kw.to_numpy()[first_row[row_center]]
+    return cluster_id.astype(np.int32), canonical
+
+
+def add_cluster_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Cluster_Id（int32，同科系內才會同群）、Canonical_Keyword（category）"""
+    if df.empty:
+        df["Cluster_Id"] = np.zeros(0, dtype=np.int32)
+        df["Canonical_Keyword"] = pd.Categorical([])
+        return df
+    cid, canon = cluster_keywords(df["Keyword"].astype(str).to_numpy(), df["Department"].astype(str).to_numpy())
+    df["Cluster_Id"] = cid
+    df["Canonical_Keyword"] = pd.Categorical(canon)
+    return df
+
+
+def cluster_summary(df: pd.DataFrame, top_n=20) -> pd.DataFrame:
+    """最大的幾群：代表寫法 / 科系 / 幾列 / 幾種寫法 / 例子"""
+    if "Cluster_Id" not in df.columns or df.empty:
+        return pd.DataFrame(columns=["Canonical_Keyword", "Department", "Rows", "Variants", "Examples"])
+    g = df.groupby("Cluster_Id", sort=False, observed=True)
+    out = pd.DataFrame({
+        "Canonical_Keyword": g["Canonical_Keyword"].first().astype(str),
+        "Department": g["Department"].first().astype(str),
+        "Rows": g.size(),
+        "Variants": g["Keyword"].nunique(),
+        "Examples": g["Keyword"].agg(lambda s: "、".join(pd.unique(s.astype(str))[:4])),
+    })
+    out = out[out["Variants"] > 1]
+    return out.sort_values(["Rows", "Variants"], ascending=False, kind="stable").head(top_n).reset_index(drop=True)
@@ -0,0 +1,247 @@
+# 檔案名稱：keyword_index.py
+# Autocomplete / Trends 快取的反查索引（每一版快取建一次，全在記憶體）
+# - 建議詞前綴 trie：輸入前幾個字 → 有哪些建議詞
+# - 建議詞 → seeds：這個詞是哪些 seed 打出來的；同 seed 的其他建議詞 = 兄弟詞
+# - Trends：key 拆成 (時間範圍, 地區, 類別, 查詢詞)，查詢詞正規化後直接查（同一個詞的不同設定 = 替代分數）
+#   + 字元 bigram 倒排（某個詞 / 科系名出現在哪些查詢詞 / prompt）
+# 資料來源：keyword_cache 的 JSONL 記錄檔；還沒匯入就直接讀舊的整包 JSON（唯讀，不產生新檔）
+
+import os
+import re
+import json
+import unicodedata
+from collections import deque
+
+from keyword_cache import (AUTOCOMPLETE_CACHE, AUTOCOMPLETE_JSON, TRENDS_CACHE, TRENDS_JSON,
+                           KeywordCache, ac_seed)
+
+_TERM = "\0"
+_SPLIT_REGEX = re.compile(r"[\s\W_]+")
+
+
+def normalize_keyword(s: str) -> str:
+    """全形半形統一（NFKC）+ 不分大小寫 + 空白壓成一個"""
+    s = unicodedata.normalize("NFKC", str(s)).casefold()
+    return " ".join(s.split())
+
+def split_tokens(s: str) -> list:
+    """已經 normalize_keyword 過的字串依空白 / 標點切開（中文詞組本身不再切）"""
+    return [t for t in _SPLIT_REGEX.split(s) if t]
+
+def keyword_tokens(s: str) -> list:
+    """正規化後依空白 / 標點切開（中文詞組本身不再切）"""
+    return split_tokens(normalize_keyword(s))
+
+def parse_trends_key(key: str) -> dict:
+    """
+    "ts::<時間範圍>::<地區>::<類別>::<查詢詞>" → 拆開；其他（整句 prompt）→ 只有 Query
+    """
+    parts = str(key).split("::", 4)
+    if len(parts) == 5 and parts[0] == "ts":
+        return {"Query": parts[4], "Timeframe": parts[1], "Geo": parts[2], "Category": parts[3]}
+    return {"Query": str(key), "Timeframe": "", "Geo": "", "Category": ""}
+
+def _bigrams(s: str) -> set:
+    return {s[i:i + 2] for i in range(len(s) - 1)}
+
+
+def load_cache_dict(jsonl_path: str, json_path: str) -> dict:
+    """有 JSONL 記錄檔就讀它，沒有就讀舊 JSON；都沒有 → {}"""
+    if os.path.exists(jsonl_path):
+        return KeywordCache(jsonl_path).to_dict()
+    if os.path.exists(json_path):
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except Exception:
+            return {}
+    return {}
+
+def cache_files_version(base_dir=".") -> str:
+    """給上層快取當 key：四個檔案的 mtime + 大小"""
+    parts = []
+    for name in (AUTOCOMPLETE_CACHE, AUTOCOMPLETE_JSON, TRENDS_CACHE, TRENDS_JSON):
+        try:
+            st_ = os.stat(os.path.join(base_dir, name))
+            parts.append(f"{st_.st_mtime_ns}-{st_.st_size}")
+        except FileNotFoundError:
+            parts.append("-")
+    return "|".join(parts)
+
+
+class KeywordIndex:
+    """
+    ac：{ac_key(seed): [建議詞...]}（autocomplete_cache）
+    trends：{prompt: 分數}（trends_cache）
+    """
+
+    def __init__(self, ac: dict, trends: dict):
+        # ---- autocomplete ----
+        self.seeds = {}            # seed → [建議詞]
+        self._seed_norm = {}       # 正規化 seed → seed
+        self._seeds_by_head = {}   # seed 的第一個詞 → [seed]（「幼保」→「幼保」「幼保 薪水」…）
+        self.by_suggestion = {}    # 正規化建議詞 → [seed]（依出現順序）
+        self._display = {}         # 正規化建議詞 → 第一次看到的原樣
+        self._trie = {}
+        for key, sugs in ac.items():
+            seed = ac_seed(key)
+            sugs = [str(s) for s in (sugs or []) if str(s).strip()]
+            self.seeds[seed] = sugs
+            nseed = normalize_keyword(seed)
+            self._seed_norm.setdefault(nseed, seed)
+            self._seeds_by_head.setdefault(nseed.split(" ")[0], []).append(seed)
+            for s in sugs:
+                ns = normalize_keyword(s)
+                owners = self.by_suggestion.setdefault(ns, [])
+                if seed not in owners:
+                    owners.append(seed)
+                if ns not in self._display:
+                    self._display[ns] = s
+                    self._trie_add(ns)
+
+        # ---- trends ----
+        self.trends = {}           # 正規化查詢詞 → [{"Query", "Timeframe", "Geo", "Category", "Trends_Score"}]
+        self._queries = []         # [[正規化查詢詞, 最高分]]；編號給 bigram 倒排用
+        self._qid = {}             # 正規化查詢詞 → 編號
+        self._bigram_posting = {}  # bigram → {查詢詞編號}
+        for key, score in trends.items():
+            try:
+                score = float(score)
+            except Exception:
+                score = 0.0
+            rec = parse_trends_key(key)
+            rec["Trends_Score"] = score
+            nq = normalize_keyword(rec["Query"])
+            qid = self._qid.get(nq)
+            if qid is None:
+                qid = self._qid[nq] = len(self._queries)
+                self._queries.append([nq, score])
+                self.trends[nq] = []
+                for bg in _bigrams(nq):
+                    self._bigram_posting.setdefault(bg, set()).add(qid)
+            else:
+                self._queries[qid][1] = max(self._queries[qid][1], score)
+            self.trends[nq].append(rec)
+
+    # ---- trie ----
+    def _trie_add(self, ns: str):
+        node = self._trie
+        for ch in ns:
+            node = node.setdefault(ch, {})
+        node[_TERM] = True
+
+    def complete(self, prefix: str, limit=10) -> list:
+        """前綴補完：短的先（BFS），回傳原樣建議詞"""
+        node = self._trie
+        p = normalize_keyword(prefix)
+        for ch in p:
+            node = node.get(ch)
+            if node is None:
+                return []
+        out = []
+        q = deque([(node, p)])
+        while q and len(out) < limit:
+            node, s = q.popleft()
+            for ch, child in node.items():
+                if ch == _TERM:
+                    out.append(self._display[s])
+                    if len(out) >= limit:
+                        break
+                else:
+                    q.append((child, s + ch))
+        return out
+
+    # ---- 建議詞 ↔ seed ----
+    def seeds_for(self, keyword: str, seed=None) -> list:
+        """
+        這個詞可能來自哪些 seed：
+        1) 它本身就是某些 seed 的建議詞  2) 這一列的 Seed_Term  3) 詞的開頭就是某個 seed（取最長的）
+        """
+        nk = normalize_keyword(keyword)
+        out = list(self.by_suggestion.get(nk, []))
+        if seed is not None:
+            s = self._seed_norm.get(normalize_keyword(seed))
+            if s is not None:
+                out.append(s)
+        words = nk.split(" ")
+        for i in range(len(words), 0, -1):
+            s = self._seed_norm.get(" ".join(words[:i]))
+            if s is not None:
+                out.append(s)
+                break
+        return list(dict.fromkeys(out))
+
+    def siblings(self, keyword: str, seed=None, limit=20) -> list:
+        """同一個 seed 打出來的其他建議詞 → [{"Seed", "Suggestion"}]"""
+        nk = normalize_keyword(keyword)
+        out, seen = [], {nk}
+        for s in self.seeds_for(keyword, seed):
+            for sug in self.seeds.get(s, []):
+                ns = normalize_keyword(sug)
+                if ns in seen:
+                    continue
+                seen.add(ns)
+                out.append({"Seed": s, "Suggestion": sug})
+                if len(out) >= limit:
+                    return out
+        return out
+
+    def seed_table(self, seeds, limit_examples=5) -> list:
+        """一組 seed（含以它開頭的延伸 seed，例如「幼保」→「幼保 薪水」）→ 每個 seed 幾個建議詞 + 例子"""
+        rows = []
+        heads = dict.fromkeys(normalize_keyword(s) for s in seeds if str(s).strip())
+        for head in heads:
+            for seed in self._seeds_by_head.get(head, []):
+                sugs = self.seeds[seed]
+                rows.append({"Seed": seed, "Suggestions": len(sugs), "Examples": "、".join(sugs[:limit_examples])})
+        return rows
+
+    # ---- Trends ----
+    def trends_lookup(self, keyword: str) -> list:
+        """正規化後一樣的查詢詞，所有設定（時間範圍 / 地區 / 類別）下的分數；沒有就 []"""
+        return list(self.trends.get(normalize_keyword(keyword), []))
+
+    def _candidates(self, term: str) -> set:
+        postings = [self._bigram_posting.get(bg) for bg in _bigrams(term)]
+        if not postings or any(p is None for p in postings):
+            return set()
+        return set.intersection(*sorted(postings, key=len))
+
+    def _queries_containing(self, term: str) -> set:
+        """bigram 倒排取交集，再確認真的是子字串"""
+        if len(term) < 2:
+            return set()
+        return {qid for qid in self._candidates(term) if term in self._queries[qid][0]}
+
+    def trends_related(self, keyword: str, extra_terms=(), limit=10) -> list:
+        """
+        其他含有這個詞片段的 Trends 查詢詞（自己除外），依「含幾個片段」排序，同分看 Trends 分數
+        extra_terms：額外一起算分的詞（例如科系名）
+        → [{"Query", "Trends_Score", "Match"}]（分數取該查詢詞各設定裡最高的）
+        """
+        nk = normalize_keyword(keyword)
+        terms = list(dict.fromkeys(keyword_tokens(keyword) + [t for x in extra_terms for t in keyword_tokens(x)]))
+        hits = {}
+        for t in terms:
+            for qid in self._queries_containing(t):
+                hits[qid] = hits.get(qid, 0) + 1
+        ranked = sorted(hits.items(), key=lambda x: (-x[1], -self._queries[x[0]][1], x[0]))
+        out = []
+        for qid, n in ranked:
+            nq, score = self._queries[qid]
+            if nq == nk:
+                continue
+            out.append({"Query": self.trends[nq][0]["Query"], "Trends_Score": score, "Match": f"{n}/{len(terms)} 詞"})
+            if len(out) >= limit:
+                break
+        return out
+
+    def stats(self) -> dict:
+        return {"seeds": len(self.seeds), "suggestions": len(self.by_suggestion), "trends_queries": len(self._queries)}
+
+
+def load_keyword_index(base_dir=".") -> KeywordIndex:
+    ac = load_cache_dict(os.path.join(base_dir, AUTOCOMPLETE_CACHE), os.path.join(base_dir, AUTOCOMPLETE_JSON))
+    trends = load_cache_dict(os.path.join(base_dir, TRENDS_CACHE), os.path.join(base_dir, TRENDS_JSON))
+    return KeywordIndex(ac, trends)
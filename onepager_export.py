@@ -0,0 +1,277 @@
+# 檔案名稱：onepager_export.py
+# 系主任一頁式（Markdown）：單系渲染 + 整個學院 / 全校批次匯出（zip 或資料夾）
+# 模板在 import 時就編譯好（jinja2）；沒有 jinja2 就退回逐行組字串，輸出一模一樣
+# 批次：每系「取彙整結果 + 渲染」丟給執行緒池，完成一個就寫進 zip / 資料夾，另附每系耗時
+#
+# 用法（命令列）：
+#   python onepager_export.py                              # 全校 → onepagers.zip
+#   python onepager_export.py --college 護理學院 --out onepagers/
+#   python onepager_export.py --min-ai 40 --workers 8
+
+import io
+import os
+import re
+import sys
+import time
+import zipfile
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+try:
+    import jinja2
+    HAS_JINJA = True
+except ImportError:
+    HAS_JINJA = False
+
+DEFAULT_WORKERS = min(8, (os.cpu_count() or 1) + 4)
+TIMING_FILE = "_timing.csv"
+
+
+# =========================
+# 1) 模板
+# =========================
+ONEPAGER_TEMPLATE = """\
+# {{ dept_name }}｜系主任一頁式（招生決策依據）
+
+## 1) 招生快照
+- 關鍵字筆數：{{ snap.get('n', 0) }}
+- 平均 Opportunity：{{ snap.get('opp', 0) }}｜平均 AI：{{ snap.get('ai', 0) }}｜平均 Citable：{{ snap.get('citable', 0) }}
+- 平均聲量指標：{{ snap.get('vol_label', '') }} = {{ snap.get('vol', 0) }}
+
+## 2) 主要競品 Top5（來自 Top3 SERP 標題/網域）
+{% for x in comp_items %}
+- {{ x['Competitor'] }}（提及 {{ x['Mentions'] }}）例：{{ x['Example_Title'] }}
+{% endfor %}
+
+## 3) 學生決策問題（分類）
+{% for r in cat_rows %}
+- {{ r['Category'] }}：{{ r['Share'] }}%｜例：{{ r['Example'] }}
+{% endfor %}
+
+## 4) Top10 原句問題（最像學生真的會問的）
+{% for q in top10_q %}
+- [{{ q['Category'] }}] {{ q['Question'] }}（{{ q['Count'] }}）
+{% endfor %}
+
+## 5) 內容缺口（現在網路上容易缺的）
+{% for g in gaps %}
+- {{ g }}
+{% endfor %}
+
+## 6) 下月行動清單（30 天內做得完）
+{% for a in actions %}
+- {{ a }}
+{% endfor %}
+"""
+
+_TEMPLATE = None
+if HAS_JINJA:
+    try:
+        _env = jinja2.Environment(trim_blocks=True, keep_trailing_newline=True, autoescape=False)
+        _TEMPLATE = _env.from_string(ONEPAGER_TEMPLATE)
+    except Exception:
+        _TEMPLATE = None
+
+
+def _build_lines(dept_name, snapshot, comp_items, cat_rows, top10_q, gaps, actions) -> str:
+    """沒有 jinja2 時的退路（= 模板的逐行版）"""
+    md = []
+    md.append(f"# {dept_name}｜系主任一頁式（招生決策依據）")
+    md.append("")
+    md.append("## 1) 招生快照")
+    md.append(f"- 關鍵字筆數：{snapshot.get('n',0)}")
+    md.append(f"- 平均 Opportunity：{snapshot.get('opp',0)}｜平均 AI：{snapshot.get('ai',0)}｜平均 Citable：{snapshot.get('citable',0)}")
+    md.append(f"- 平均聲量指標：{snapshot.get('vol_label','')} = {snapshot.get('vol',0)}")
+    md.append("")
+    md.append("## 2) 主要競品 Top5（來自 Top3 SERP 標題/網域）")
+    for x in comp_items:
+        md.append(f"- {x['Competitor']}（提及 {x['Mentions']}）例：{x['Example_Title']}")
+    md.append("")
+    md.append("## 3) 學生決策問題（分類）")
+    for r in cat_rows:
+        md.append(f"- {r['Category']}：{r['Share']}%｜例：{r['Example']}")
+    md.append("")
+    md.append("## 4) Top10 原句問題（最像學生真的會問的）")
+    for q in top10_q:
+        md.append(f"- [{q['Category']}] {q['Question']}（{q['Count']}）")
+    md.append("")
+    md.append("## 5) 內容缺口（現在網路上容易缺的）")
+    for g in gaps:
+        md.append(f"- {g}")
+    md.append("")
+    md.append("## 6) 下月行動清單（30 天內做得完）")
+    for a in actions:
+        md.append(f"- {a}")
+    md.append("")
+    return "\n".join(md)
+
+
+def build_onepager_markdown(dept_name: str, snapshot: dict, comp_items: list, cat_rows: list, top10_q: list, gaps: list, actions: list):
+    if _TEMPLATE is None:
+        return _build_lines(dept_name, snapshot, comp_items, cat_rows, top10_q, gaps, actions)
+    return _TEMPLATE.render(dept_name=dept_name, snap=snapshot, comp_items=comp_items, cat_rows=cat_rows,
+                            top10_q=top10_q, gaps=gaps, actions=actions)
+
+def render_onepager(dept_name: str, summary: dict) -> str:
+    """summary = AggregateStore.onepager(...)"""
+    return build_onepager_markdown(dept_name, summary["snap"], summary["comp_top5"], summary["cat_rows"],
+                                   summary["top10_q"], summary["gaps"], summary["actions"])
+
+
+# =========================
+# 2) 輸出：zip / 資料夾
+# =========================
+def onepager_filename(dept_name: str) -> str:
+    return re.sub(r'[\\/:*?"<>|\s]+', "_", str(dept_name)).strip("_") + "_系主任一頁式.md"
+
+
+class _ZipSink:
+    def __init__(self, target):
+        # target：路徑或可寫的檔案物件（BytesIO）
+        self.zf = zipfile.ZipFile(target, "w", compression=zipfile.ZIP_DEFLATED)
+
+    def write(self, name: str, text: str):
+        self.zf.writestr(name, text.encode("utf-8"))
+
+    def close(self):
+        self.zf.close()
+
+
+class _DirSink:
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def write(self, name: str, text: str):
+        fp = os.path.join(self.path, name)
+        tmp = fp + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, fp)
+
+    def close(self):
+        pass
+
+
+def _open_sink(out):
+    if not isinstance(out, (str, os.PathLike)):
+        return _ZipSink(out)
+    if str(out).lower().endswith(".zip"):
+        d = os.path.dirname(os.path.abspath(out))
+        os.makedirs(d, exist_ok=True)
+        return _ZipSink(out)
+    return _DirSink(out)
+
+
+# =========================
+# 3) 批次匯出
+# =========================
+def export_onepagers(agg_store, departments: list, out, equals=None, minimums=None, workers=None, progress=None) -> dict:
+    """
+    departments 每一系：agg_store.onepager(...) → 渲染 → 寫進 out（*.zip 路徑 / 資料夾 / BytesIO）
+    篩選後沒有資料的科系不出檔（timing 裡 Skipped=1）；最後附一份 _timing.csv
+    progress(done, total, dept)：每完成一系呼叫一次
+    回傳 {"files": [...], "timing": DataFrame, "stats": {...}}
+    """
+    departments = list(dict.fromkeys(departments))
+
+    def job(dept):
+        t0 = time.perf_counter()
+        summary = agg_store.onepager(dept, equals, minimums)
+        t1 = time.perf_counter()
+        md = render_onepager(dept, summary) if summary["snap"]["n"] else None
+        t2 = time.perf_counter()
+        return dept, summary["snap"]["n"], md, (t1 - t0) * 1000, (t2 - t1) * 1000
+
+    sink = _open_sink(out)
+    files, rows = [], {}
+    t0 = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers or DEFAULT_WORKERS)) as pool:
+            futures = [pool.submit(job, d) for d in departments]
+            for n, fut in enumerate(as_completed(futures), start=1):
+                dept, n_rows, md, sum_ms, render_ms = fut.result()
+                t_w = time.perf_counter()
+                if md is not None:
+                    name = onepager_filename(dept)
+                    sink.write(name, md)
+                    files.append(name)
+                rows[dept] = {
+                    "Department": dept, "Rows": n_rows, "Skipped": int(md is None),
+                    "Summary_ms": round(sum_ms, 2), "Render_ms": round(render_ms, 2),
+                    "Write_ms": round((time.perf_counter() - t_w) * 1000, 2),
+                    "Bytes": len(md.encode("utf-8")) if md else 0,
+                }
+                if progress:
+                    progress(n, len(departments), dept)
+        timing = pd.DataFrame([rows[d] for d in departments])
+        sink.write(TIMING_FILE, timing.to_csv(index=False))
+    finally:
+        sink.close()
+    elapsed = time.perf_counter() - t0
+
+    stats = {
+        "departments": len(departments),
+        "files": len(files),
+        "skipped": len(departments) - len(files),
+        "workers": max(1, workers or DEFAULT_WORKERS),
+        "elapsed_sec": round(elapsed, 2),
+    }
+    return {"files": files, "timing": timing, "stats": stats}
+
+
+def export_onepagers_zip(agg_store, departments: list, equals=None, minimums=None, workers=None, progress=None):
+    """給下載按鈕用：(zip bytes, export_onepagers 的結果)"""
+    buf = io.BytesIO()
+    result = export_onepagers(agg_store, departments, buf, equals=equals, minimums=minimums,
+                              workers=workers, progress=progress)
+    return buf.getvalue(), result
+
+
+# =========================
+# 4) 命令列
+# =========================
+def main(argv=None):
+    from data_loader import DATA_FILE, file_version, load_school_data, sidecar_path
+    from filter_index import FilterIndex
+    from competitors import CompetitorIndex
+    from aggregates import AggregateStore
+
+    ap = argparse.ArgumentParser(description="批次匯出系主任一頁式（Markdown）")
+    ap.add_argument("--csv", default=DATA_FILE)
+    ap.add_argument("--college", default=None, help="只匯出這個學院（預設全校）")
+    ap.add_argument("--out", default="onepagers.zip", help="*.zip 或資料夾")
+    ap.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    ap.add_argument("--min-ai", type=float, default=0, help="AI_Potential 最低門檻")
+    ap.add_argument("--min-opp", type=float, default=0, help="Opportunity_Score 最低門檻")
+    ap.add_argument("--keyword-type", default=None)
+    ap.add_argument("--source", default=None, help="Keyword_Source")
+    ap.add_argument("--quiet", action="store_true")
+    args = ap.parse_args(argv)
+
+    version = file_version(args.csv)
+    df, _ = load_school_data(args.csv, version=version)
+    fidx = FilterIndex(df)
+    minimums = {"AI_Potential": args.min_ai, "Opportunity_Score": args.min_opp}
+    agg_store = AggregateStore(df, fidx, CompetitorIndex(df), path=sidecar_path(args.csv, version, ".agg.sqlite"),
+                               default_minimums=minimums)
+    equals = {"Keyword_Type": args.keyword_type, "Keyword_Source": args.source}
+
+    log = None
+    if not args.quiet:
+        def log(n, total, dept):
+            print(f"[{n}/{total}] {dept}", flush=True)
+
+    result = export_onepagers(agg_store, fidx.departments(args.college), args.out, equals=equals,
+                              minimums=minimums, workers=args.workers, progress=log)
+    print(result["timing"].to_string(index=False))
+    s = result["stats"]
+    print(f"\n{s['files']} 份一頁式（略過 {s['skipped']} 系沒資料），{s['elapsed_sec']} 秒"
+          f"（{s['workers']} 執行緒）→ {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+# 檔案名稱：page_parser.py
+# 串流版頁面解析：html.parser 事件邊讀邊收，不建 DOM
+# 只收 parse_html 真正用到的欄位：title / meta description / h1 / h2 / h3 / 表格・清單旗標 / 條列 / 全文
+# 欄位語意跟原本 BeautifulSoup(html, "html.parser") + get_text 版一致；另有字元數 / 時間上限，超過就停
+
+import time
+from html.parser import HTMLParser
+
+# 單頁最多吃多少字元、花多少秒（超過就用已經讀到的部分）
+MAX_PARSE_CHARS = 2_000_000
+MAX_PARSE_SECONDS = 2.0
+FEED_CHUNK = 64 * 1024
+
+MAX_HEADINGS = 25
+MAX_LISTS = 3           # 只看前 3 個 ul/ol
+MAX_ITEMS_PER_LIST = 8  # 每個清單前 8 個 li（含巢狀）
+
+SKIP_TAGS = {"script", "style", "noscript"}
+# 不會有結束標籤的元素（不進堆疊）
+VOID_TAGS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "keygen", "link",
+    "menuitem", "meta", "param", "source", "track", "wbr", "basefont", "bgsound",
+    "command", "frame", "image", "isindex", "nextid", "spacer",
+}
+
+
+class _Capture:
+    """正在收文字的元素（= 該元素的 get_text(" ", strip=True)）"""
+    __slots__ = ("depth", "parts", "slots")
+
+    def __init__(self, depth, slots=None):
+        self.depth = depth
+        self.parts = []
+        self.slots = slots  # li 用：[(清單編號, 第幾個 li)]
+
+    def text(self, sep=" "):
+        return sep.join(self.parts)
+
+
+class PageScanner(HTMLParser):
+    """
+    事件驅動：維護一個開啟中的標籤堆疊（結束標籤往回找同名的一路關掉，找不到就忽略）
+    script / style / noscript 整段跳過（= 原本的 decompose）
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack = []
+        self.skip_depth = None
+        self.pending = []          # 相鄰的文字事件併成一段（= 一個 NavigableString）
+        self.void_open = {}        # <br> 這類開頭標籤出現過、還沒被 </br> 抵掉的次數
+
+        self.texts = []
+        self.title = None
+        self.meta_desc = None
+        self.h1 = None
+        self.h2 = []
+        self.h3 = []
+        self.has_table = 0
+        self.has_list = 0
+
+        self.captures = []         # 開啟中的 _Capture
+        self.lists_seen = 0
+        self.open_lists = []       # [(清單編號, depth)]
+        self.list_items = [[] for _ in range(MAX_LISTS)]
+
+    # ---- 文字 ----
+    def _flush(self):
+        if not self.pending:
+            return
+        s = "".join(self.pending).strip()
+        self.pending = []
+        if not s:
+            return
+        self.texts.append(s)
+        for cap in self.captures:
+            cap.parts.append(s)
+
+    def handle_data(self, data):
+        if self.skip_depth is None:
+            self.pending.append(data)
+
+    def handle_comment(self, data):
+        self._flush()
+
+    def handle_decl(self, decl):
+        self._flush()
+
+    def handle_pi(self, data):
+        self._flush()
+
+    def unknown_decl(self, data):
+        self._flush()
+
+    # ---- 標籤 ----
+    def handle_startendtag(self, tag, attrs):
+        # <br/> 自己就關掉了，不會抵掉後面的 </br>
+        self._start(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_starttag(self, tag, attrs):
+        if tag in VOID_TAGS:
+            self.void_open[tag] = self.void_open.get(tag, 0) + 1
+        self._start(tag, attrs)
+
+    def _start(self, tag, attrs):
+        self._flush()
+        if self.skip_depth is not None:
+            if tag not in VOID_TAGS:
+                self.stack.append(tag)
+            return
+
+        if tag == "meta":
+            if self.meta_desc is None:
+                a = dict(attrs)
+                if a.get("name") == "description":
+                    self.meta_desc = (a.get("content") or "").strip()
+            return
+        if tag in VOID_TAGS:
+            return
+
+        self.stack.append(tag)
+        depth = len(self.stack)
+
+        if tag in SKIP_TAGS:
+            self.skip_depth = depth
+        elif tag == "title":
+            if self.title is None:
+                self.title = _Capture(depth)
+                self.captures.append(self.title)
+        elif tag == "h1":
+            if self.h1 is None:
+                self.h1 = _Capture(depth)
+                self.captures.append(self.h1)
+        elif tag in ("h2", "h3"):
+            bucket = self.h2 if tag == "h2" else self.h3
+            if len(bucket) < MAX_HEADINGS:
+                cap = _Capture(depth)
+                bucket.append(cap)
+                self.captures.append(cap)
+        elif tag == "table":
+            self.has_table = 1
+        elif tag in ("ul", "ol"):
+            self.has_list = 1
+            if self.lists_seen < MAX_LISTS:
+                self.open_lists.append((self.lists_seen, depth))
+                self.lists_seen += 1
+        elif tag == "li" and self.open_lists:
+            # 巢狀清單裡的 li 也算外層清單的（= find_all("li") 會往下找）
+            slots = []
+            for k, _ in self.open_lists:
+                items = self.list_items[k]
+                if len(items) < MAX_ITEMS_PER_LIST:
+                    slots.append((k, len(items)))
+                    items.append("")
+            if slots:
+                self.captures.append(_Capture(depth, slots))
+
+    def handle_endtag(self, tag):
+        if self.void_open.get(tag):
+            # <br>b</br>：多餘的結束標籤直接吃掉，前後文字不切開（= bs4 的 already_closed_empty_element）
+            self.void_open[tag] -= 1
+            return
+        # 其他結束標籤就算沒有對應的開頭也會切開文字（= bs4 handle_endtag 一律先 endData）
+        self._flush()
+        if tag not in self.stack:
+            return
+        while self.stack:
+            if self.stack.pop() == tag:
+                break
+        self._close_to(len(self.stack))
+
+    def _close_to(self, depth):
+        """depth 以上的元素都已經關掉：收尾對應的 capture / 清單 / 跳過區段"""
+        if self.skip_depth is not None and self.skip_depth > depth:
+            self.skip_depth = None
+        while self.open_lists and self.open_lists[-1][1] > depth:
+            self.open_lists.pop()
+        if self.captures and self.captures[-1].depth > depth:
+            keep = []
+            for cap in self.captures:
+                if cap.depth > depth:
+                    if cap.slots:
+                        t = cap.text()
+                        for k, i in cap.slots:
+                            self.list_items[k][i] = t
+                else:
+                    keep.append(cap)
+            self.captures = keep
+
+    def finish(self):
+        self.close()
+        self._flush()
+        self.stack = []
+        self._close_to(0)
+
+    # ---- 結果 ----
+    def result(self) -> dict:
+        return {
+            "title": self.title.text("") if self.title else "",
+            "meta_desc": self.meta_desc or "",
+            "h1": self.h1.text() if self.h1 else "",
+            "h2": [c.text() for c in self.h2],
+            "h3": [c.text() for c in self.h3],
+            "has_table": self.has_table,
+            "has_list": self.has_list,
+            "list_items": [t for items in self.list_items for t in items],
+            "text": " ".join(self.texts),
+        }
+
+
+def scan_html(html: str, max_chars=MAX_PARSE_CHARS, max_seconds=MAX_PARSE_SECONDS) -> dict:
+    """
+    分段餵給 PageScanner；超過字元數或時間上限就停，用已經讀到的部分
+    回傳 title / meta_desc / h1 / h2 / h3 / has_table / has_list / list_items / text / truncated
+    """
+    p = PageScanner()
+    t0 = time.perf_counter()
+    n = min(len(html), max_chars) if max_chars else len(html)
+    truncated = n < len(html)
+    for i in range(0, n, FEED_CHUNK):
+        p.feed(html[i:min(i + FEED_CHUNK, n)])
+        if max_seconds and time.perf_counter() - t0 > max_seconds and i + FEED_CHUNK < n:
+            truncated = True
+            break
+    p.finish()
+    out = p.result()
+    out["truncated"] = 1 if truncated else 0
+    return out
@@ -0,0 +1,247 @@
+# 檔案名稱：page_store.py
+# 深度解析結果的快取後端（可抽換）
+# - DirPageStore：舊格式，serp_cache/<md5>.json 一頁一檔
+# - SqlitePageStore：單檔 SQLite（WAL），一次查詢 / 批次讀寫 / 統計 / 壓縮
+#
+# 用法（命令列）：
+#   python page_store.py migrate serp_cache serp_cache.sqlite   # 舊資料夾 → SQLite（舊檔不刪）
+#   python page_store.py stats serp_cache.sqlite
+#   python page_store.py compact serp_cache.sqlite
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+
+def cache_key(url: str) -> str:
+    return hashlib.md5(url.encode("utf-8")).hexdigest()
+
+def _dumps(data: dict) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+# =========================
+# 1) 舊格式：一個 URL 一個 JSON 檔
+# =========================
+class DirPageStore:
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _fp(self, key: str) -> str:
+        return os.path.join(self.path, key + ".json")
+
+    def get(self, url: str):
+        fp = self._fp(cache_key(url))
+        if os.path.exists(fp):
+            try:
+                with open(fp, "r", encoding="utf-8") as f:
+                    return json.load(f)
+            except Exception:
+                return None
+        return None
+
+    def get_many(self, urls) -> dict:
+        out = {}
+        for u in urls:
+            data = self.get(u)
+            if data is not None:
+                out[u] = data
+        return out
+
+    def put(self, url: str, data: dict):
+        try:
+            with open(self._fp(cache_key(url)), "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+        except Exception:
+            pass
+
+    def put_many(self, items: dict):
+        for u, data in items.items():
+            self.put(u, data)
+
+    def iter_items(self):
+        """yield (key, data)：給搬家用"""
+        for name in sorted(os.listdir(self.path)):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.path, name), "r", encoding="utf-8") as f:
+                    yield name[:-5], json.load(f)
+            except Exception:
+                continue
+
+    def stats(self) -> dict:
+        n = 0
+        size = 0
+        for name in os.listdir(self.path):
+            if name.endswith(".json"):
+                n += 1
+                size += os.path.getsize(os.path.join(self.path, name))
+        return {"backend": "dir", "path": self.path, "entries": n, "data_bytes": size, "file_bytes": size}
+
+    def compact(self):
+        """改寫成緊湊 JSON、刪掉壞檔"""
+        for name in os.listdir(self.path):
+            if not name.endswith(".json"):
+                continue
+            fp = os.path.join(self.path, name)
+            try:
+                with open(fp, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except Exception:
+                os.remove(fp)
+                continue
+            with open(fp, "w", encoding="utf-8") as f:
+                f.write(_dumps(data))
+
+    def close(self):
+        pass
+
+
+# =========================
+# 2) 新格式：單檔 SQLite（WAL：多讀一寫不互卡）
+# =========================
+class SqlitePageStore:
+    _CHUNK = 500  # SQLite 參數上限保守值
+
+    def __init__(self, path: str):
+        self.path = path
+        d = os.path.dirname(os.path.abspath(path))
+        os.makedirs(d, exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " key TEXT PRIMARY KEY,"
+            " url TEXT,"
+            " data TEXT NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 連線不能跨執行緒共用 → 每個執行緒一條
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, url: str):
+        row = self._conn().execute("SELECT data FROM pages WHERE key = ?", (cache_key(url),)).fetchone()
+        if not row:
+            return None
+        try:
+            return json.loads(row[0])
+        except Exception:
+            return None
+
+    def get_many(self, urls) -> dict:
+        by_key = {cache_key(u): u for u in urls}
+        keys = list(by_key)
+        out = {}
+        conn = self._conn()
+        for i in range(0, len(keys), self._CHUNK):
+            chunk = keys[i:i + self._CHUNK]
+            q = "SELECT key, data FROM pages WHERE key IN (%s)" % ",".join("?" * len(chunk))
+            for k, raw in conn.execute(q, chunk):
+                try:
+                    out[by_key[k]] = json.loads(raw)
+                except Exception:
+                    continue
+        return out
+
+    def put(self, url: str, data: dict):
+        self.put_many({url: data})
+
+    def put_many(self, items: dict):
+        rows = [(cache_key(u), u, _dumps(d), time.time()) for u, d in items.items()]
+        self._write(rows)
+
+    def _write(self, rows):
+        if not rows:
+            return
+        conn = self._conn()
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO pages (key, url, data, updated_at) VALUES (?, ?, ?, ?)", rows)
+
+    def iter_items(self):
+        """yield (原本的 key 字串, data)：給沿用上一版結果用"""
+        for url, raw in self._conn().execute("SELECT url, data FROM pages").fetchall():
+            try:
+                yield url, json.loads(raw)
+            except Exception:
+                continue
+
+    def stats(self) -> dict:
+        n, size = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM pages").fetchone()
+        file_bytes = 0
+        for suffix in ["", "-wal", "-shm"]:
+            fp = self.path + suffix
+            if os.path.exists(fp):
+                file_bytes += os.path.getsize(fp)
+        return {"backend": "sqlite", "path": self.path, "entries": n, "data_bytes": size, "file_bytes": file_bytes}
+
+    def compact(self):
+        """WAL 併回主檔 + VACUUM 回收空間"""
+        conn = self._conn()
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def migrate_from(self, src: DirPageStore, batch=500) -> int:
+        """把舊資料夾搬進來（key 沿用 md5 檔名；舊檔不刪），回傳筆數"""
+        n = 0
+        rows = []
+        now = time.time()
+        for key, data in src.iter_items():
+            rows.append((key, data.get("url", ""), _dumps(data), now))
+            if len(rows) >= batch:
+                self._write(rows)
+                n += len(rows)
+                rows = []
+        self._write(rows)
+        return n + len(rows)
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def open_page_store(path: str):
+    """*.sqlite / *.db → SqlitePageStore；其他當資料夾 → DirPageStore"""
+    if path.lower().endswith((".sqlite", ".sqlite3", ".db")):
+        return SqlitePageStore(path)
+    return DirPageStore(path)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) >= 3 and argv[0] == "migrate":
+        store = SqlitePageStore(argv[2])
+        n = store.migrate_from(DirPageStore(argv[1]))
+        print(f"✅ 已搬移 {n} 筆：{argv[1]} → {argv[2]}")
+        print(store.stats())
+        return 0
+    if len(argv) >= 2 and argv[0] in ["stats", "compact"]:
+        store = open_page_store(argv[1])
+        if argv[0] == "compact":
+            before = store.stats()
+            store.compact()
+            print(f"compact 前：{before}")
+        print(store.stats())
+        return 0
+    print("用法：python page_store.py migrate <舊資料夾> <新.sqlite> | stats <路徑> | compact <路徑>")
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+# 檔案名稱：precrawl.py
+# 離線批次預抓：把 school_data.csv 所有 Rank1~3_Link 先抓好、解析好、寫進 serp_cache
+# 開會前跑一次，戰情室按「深度解析」時就直接命中快取，不用現場等
+#
+# 用法：
+#   python precrawl.py                          # 預設讀 school_data.csv
+#   python precrawl.py --csv other.csv --workers 16 --per-host 2
+#   python precrawl.py --cache /tmp/serp_cache.sqlite --limit 50
+#   python precrawl.py --record replay.jsonl                 # 順便把每個回應錄進 cassette（http_replay.py）
+#   python precrawl.py --replay replay.jsonl --cache /tmp/x.sqlite   # 不連外網：打本機重播 server
+#
+# 中斷（Ctrl+C / 當機）後再跑一次即可：快取裡還沒過期的 URL 會直接略過
+# 過期的成功頁面會用 ETag / Last-Modified 重新驗證；失敗的頁面依退避時間到了才重試
+
+import sys
+import time
+import argparse
+
+import pandas as pd
+
+import deep_analysis
+from geo_utils import domain_of
+from domain_health import DomainHealth
+from fetch_engine import FetchEngine
+from page_store import open_page_store
+from http_replay import Cassette, RecordingSession, ReplayServer
+
+LINK_COLS = ["Rank1_Link", "Rank2_Link", "Rank3_Link"]
+
+
+def collect_links(csv_path: str) -> list:
+    """讀 Rank1~3_Link，去掉空值 / # / 非 http，去重（保留出現順序）"""
+    head = pd.read_csv(csv_path, nrows=0)
+    cols = [c for c in LINK_COLS if c in head.columns]
+    if not cols:
+        return []
+    links = pd.read_csv(csv_path, usecols=cols, dtype=str)
+
+    out = []
+    for c in cols:
+        out.extend(links[c].dropna().str.strip().tolist())
+    return [u for u in dict.fromkeys(out) if u.lower().startswith(("http://", "https://"))]
+
+
+def precrawl(urls, engine: FetchEngine, log=None) -> dict:
+    """
+    抓 + 解析所有 urls（快取還新鮮的略過），回傳 throughput 報表
+    log(line) 每完成一頁呼叫一次（預設不輸出）
+    """
+    cached = deep_analysis.load_cached_pages(urls)
+    now = time.time()
+    todo = [u for u in urls if not (u in cached and deep_analysis.is_fresh(cached[u], now))]
+    report = {
+        "total": len(urls),
+        "skipped_cached": len(urls) - len(todo),
+        "fetched": 0,
+        "ok": 0,
+        "failed": 0,
+        "elapsed_sec": 0.0,
+        "pages_per_sec": 0.0,
+        "interrupted": False,
+    }
+
+    t0 = time.perf_counter()
+    try:
+        for n, (u, info) in enumerate(engine.run(todo), start=1):
+            report["fetched"] += 1
+            if info.get("ok") == 1:
+                report["ok"] += 1
+            else:
+                report["failed"] += 1
+            if log:
+                status = "ok  " if info.get("ok") == 1 else "fail"
+                log(f"[{n}/{len(todo)}] {status} {domain_of(u)}")
+    except KeyboardInterrupt:
+        # 已完成的頁面都已寫進快取，下次重跑會接著做
+        report["interrupted"] = True
+
+    elapsed = time.perf_counter() - t0
+    report["elapsed_sec"] = round(elapsed, 2)
+    report["pages_per_sec"] = round(report["fetched"] / elapsed, 2) if elapsed > 0 else 0.0
+    return report
+
+
+def format_report(report: dict) -> str:
+    lines = [
+        "===== precrawl 報表 =====",
+        f"URL 總數（去重後）：{report['total']}",
+        f"快取仍有效（略過）：{report['skipped_cached']}",
+        f"本次抓取：{report['fetched']}（成功 {report['ok']} / 失敗 {report['failed']}）",
+        f"耗時：{report['elapsed_sec']} 秒｜吞吐：{report['pages_per_sec']} 頁/秒",
+    ]
+    if report.get("interrupted"):
+        lines.append("⚠️ 中途中斷：再跑一次會從未完成的 URL 繼續")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="批次預抓 school_data.csv 的 Top3 頁面，暖好 serp_cache")
+    ap.add_argument("--csv", default="school_data.csv")
+    ap.add_argument("--cache", default=deep_analysis.CACHE_PATH, help="*.sqlite 或舊版資料夾")
+    ap.add_argument("--workers", type=int, default=16)
+    ap.add_argument("--per-host", type=int, default=2)
+    ap.add_argument("--timeout", type=float, default=10)
+    ap.add_argument("--retries", type=int, default=2, help="逾時 / 5xx / 429 重試次數（指數退避）")
+    ap.add_argument("--ttl-ok-hours", type=float, default=deep_analysis.CACHE_TTL_OK / 3600)
+    ap.add_argument("--ttl-fail-min", type=float, default=deep_analysis.CACHE_TTL_FAIL / 60)
+    ap.add_argument("--limit", type=int, default=0, help="只跑前 N 個 URL（0 = 全部）")
+    ap.add_argument("--quiet", action="store_true")
+    ap.add_argument("--record", default=None, help="把回應錄進這個 cassette（JSONL）")
+    ap.add_argument("--replay", default=None, help="不連外網，改打讀這個 cassette 的本機重播 server")
+    args = ap.parse_args(argv)
+
+    if not deep_analysis.HAS_REQUESTS:
+        print("❌ 需要 requests：pip install requests beautifulsoup4", file=sys.stderr)
+        return 2
+
+    deep_analysis.CACHE_TTL_OK = args.ttl_ok_hours * 3600
+    deep_analysis.CACHE_TTL_FAIL = args.ttl_fail_min * 60
+
+    if args.cache != deep_analysis.CACHE_PATH:
+        deep_analysis.set_page_store(open_page_store(args.cache))
+
+    urls = collect_links(args.csv)
+    if args.limit > 0:
+        urls = urls[:args.limit]
+
+    server, session, health = None, None, None
+    if args.replay:
+        server = ReplayServer(Cassette(args.replay)).start()
+        session = server.session(pool_size=args.workers)
+        # 重播的失敗是本機模擬的：記在記憶體就好，不寫進正式的 domain_health.json
+        health = DomainHealth(None)
+    elif args.record:
+        session = RecordingSession(Cassette(args.record))
+
+    engine = FetchEngine(max_workers=args.workers, per_host=args.per_host, timeout=args.timeout,
+                         retries=args.retries, session=session, health=health)
+    log = None if args.quiet else (lambda line: print(line, file=sys.stderr, flush=True))
+    try:
+        report = precrawl(urls, engine, log=log)
+    finally:
+        engine.close()
+        if server is not None:
+            server.close()
+
+    print(format_report(report))
+    return 130 if report["interrupted"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,242 @@
+# 檔案名稱：profiler.py
+# 每次 rerun 的分段計時：dashboard 慢的時候看時間花在讀 CSV、側欄篩選、彙整、畫圖、競品、抓頁 / 解析哪一段
+# - with stage("overview/figures"): ...   → 計到「目前這次 rerun」；同名多次累加（次數另計）
+# - 巢狀 stage 會串成路徑（"warroom/fetch_parse/fetch_html"）
+# - 關閉時 stage() 只查一次 contextvar 就回傳共用的空 context manager，幾乎沒有額外負擔
+# - 執行緒池裡的工作要計到同一次 rerun：用 bind(fn) 包起來再丟進去
+# - 每次 rerun 結束寫一行 JSONL（trace 檔），離線用 summarize 看各階段 p50 / p95
+#
+# 用法（命令列）：
+#   python profiler.py profile_trace.jsonl                 # 各階段耗時統計
+#   python profiler.py profile_trace.jsonl --label 總覽     # 只看某個視角的 rerun
+
+import os
+import sys
+import json
+import time
+import threading
+import argparse
+import contextvars
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+import pandas as pd
+
+TRACE_FILE = os.environ.get("POWERGEO_TRACE", "profile_trace.jsonl")
+KEEP_RUNS = 20
+
+_RUN = contextvars.ContextVar("powergeo_profile_run", default=None)
+_PATH = contextvars.ContextVar("powergeo_profile_path", default="")
+_NULL = nullcontext()
+
+
+# =========================
+# 1) 一次 rerun 的紀錄
+# =========================
+class RunTrace:
+    """stages：{路徑: [累計毫秒, 次數]}，依第一次出現的順序"""
+
+    def __init__(self, label: str, meta=None):
+        self.label = label
+        self.meta = dict(meta or {})
+        self.ts = time.time()
+        self.t0 = time.perf_counter()
+        self.t_last = self.t0
+        self.total_ms = None
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def add(self, path: str, ms: float):
+        with self._lock:
+            rec = self.stages.get(path)
+            if rec is None:
+                self.stages[path] = [ms, 1]
+            else:
+                rec[0] += ms
+                rec[1] += 1
+            self.t_last = max(self.t_last, time.perf_counter())
+
+    def finish(self, at=None):
+        if self.total_ms is None:
+            self.total_ms = ((at or time.perf_counter()) - self.t0) * 1000
+        return self
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            stages = [{"stage": k, "ms": round(v[0], 3), "calls": v[1]} for k, v in self.stages.items()]
+        total = self.total_ms if self.total_ms is not None else (time.perf_counter() - self.t0) * 1000
+        return {"ts": round(self.ts, 3), "label": self.label, "total_ms": round(total, 3),
+                "meta": self.meta, "stages": stages}
+
+
+@contextmanager
+def _timed(run: RunTrace, name: str):
+    parent = _PATH.get()
+    path = f"{parent}/{name}" if parent else name
+    token = _PATH.set(path)
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        run.add(path, (time.perf_counter() - t0) * 1000)
+        _PATH.reset(token)
+
+
+def stage(name: str):
+    """計時一段程式；沒有在記錄的 rerun 就什麼都不做"""
+    run = _RUN.get()
+    if run is None:
+        return _NULL
+    return _timed(run, name)
+
+
+def bind(fn):
+    """把「目前這次 rerun + 目前的 stage 路徑」帶進執行緒池（每次呼叫各自 set / reset，不共用 Context）"""
+    run = _RUN.get()
+    if run is None:
+        return fn
+    path = _PATH.get()
+
+    def wrapped(*args, **kwargs):
+        t1, t2 = _RUN.set(run), _PATH.set(path)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _PATH.reset(t2)
+            _RUN.reset(t1)
+    return wrapped
+
+
+# =========================
+# 2) 每個 session 一個：開 / 關、最近幾次、trace 檔
+# =========================
+class Profiler:
+    """
+    begin(label) … end()：包住一次 rerun；st.stop() 跳過 end() 的那次，下次 begin() 時補收尾
+    （總時間算到最後一個 stage 結束）
+    """
+
+    def __init__(self, trace_path=TRACE_FILE, keep=KEEP_RUNS):
+        self.trace_path = trace_path
+        self.recent = deque(maxlen=keep)
+        self.current = None
+        self._token = None
+        self._lock = threading.Lock()
+
+    def begin(self, label="", enabled=True, meta=None):
+        if self.current is not None:
+            self._close(self.current.t_last)
+        if not enabled:
+            return None
+        self.current = RunTrace(label, meta)
+        self._token = _RUN.set(self.current)
+        return self.current
+
+    def label(self, text: str):
+        """rerun 開始時還不知道視角 → 知道了再補"""
+        if self.current is not None:
+            self.current.label = text
+
+    def end(self):
+        if self.current is not None:
+            self._close()
+
+    def _close(self, at=None):
+        run = self.current.finish(at)
+        self.current = None
+        if self._token is not None:
+            try:
+                _RUN.reset(self._token)
+            except ValueError:
+                # 不同執行緒 / Context 建的 token（上一次 rerun 被 st.stop 中斷）→ 直接清掉
+                _RUN.set(None)
+            self._token = None
+        rec = run.to_dict()
+        self.recent.append(rec)
+        if self.trace_path:
+            self._write(rec)
+
+    def _write(self, rec: dict):
+        try:
+            line = json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n"
+            with self._lock, open(self.trace_path, "a", encoding="utf-8") as f:
+                f.write(line)
+        except Exception:
+            pass
+
+    def last(self):
+        return self.recent[-1] if self.recent else None
+
+    def history(self) -> pd.DataFrame:
+        """最近幾次 rerun：每次一列，欄位 = 各階段毫秒"""
+        rows = []
+        for rec in reversed(self.recent):
+            row = {"Label": rec["label"], "Total_ms": rec["total_ms"]}
+            row.update({s["stage"]: s["ms"] for s in rec["stages"] if "/" not in s["stage"]})
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+
+def run_table(rec: dict) -> pd.DataFrame:
+    """一次 rerun → Stage / ms / Calls / %（巢狀的子階段也算在父階段裡；執行緒池裡的是累計）"""
+    t = pd.DataFrame(rec["stages"], columns=["stage", "ms", "calls"])
+    t["pct"] = (t["ms"] / rec["total_ms"] * 100).round(1) if rec["total_ms"] else 0.0
+    return t.rename(columns={"stage": "Stage", "calls": "Calls", "pct": "%"})
+
+
+# =========================
+# 3) 離線分析
+# =========================
+def load_trace(path: str) -> list:
+    out = []
+    with open(path, "r", encoding="utf-8") as f:
+        for raw in f:
+            try:
+                out.append(json.loads(raw))
+            except Exception:
+                continue
+    return out
+
+def summarize(records: list, label=None) -> pd.DataFrame:
+    """每個階段：出現在幾次 rerun、平均 / p50 / p95 / 最大毫秒、平均占比"""
+    rows = []
+    for rec in records:
+        if label is not None and label not in rec.get("label", ""):
+            continue
+        total = rec.get("total_ms") or 0
+        rows.append({"stage": "(total)", "ms": total, "pct": 100.0})
+        for s in rec.get("stages", []):
+            rows.append({"stage": s["stage"], "ms": s["ms"], "pct": s["ms"] / total * 100 if total else 0.0})
+    cols = ["Stage", "Runs", "Mean_ms", "P50_ms", "P95_ms", "Max_ms", "Mean_pct"]
+    if not rows:
+        return pd.DataFrame(columns=cols)
+    t = pd.DataFrame(rows)
+    g = t.groupby("stage", sort=False)
+    size = g.size()
+    out = pd.DataFrame({
+        "Stage": size.index.to_numpy(),
+        "Runs": size.to_numpy(),
+        "Mean_ms": g["ms"].mean().round(2).to_numpy(),
+        "P50_ms": g["ms"].quantile(0.5).round(2).to_numpy(),
+        "P95_ms": g["ms"].quantile(0.95).round(2).to_numpy(),
+        "Max_ms": g["ms"].max().round(2).to_numpy(),
+        "Mean_pct": g["pct"].mean().round(1).to_numpy(),
+    })
+    return out.sort_values("Mean_ms", ascending=False, kind="stable").reset_index(drop=True)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="rerun 分段計時 trace 統計")
+    ap.add_argument("trace", nargs="?", default=TRACE_FILE)
+    ap.add_argument("--label", default=None, help="只看 label 含這個字的 rerun（例如視角名稱）")
+    args = ap.parse_args(argv)
+
+    records = load_trace(args.trace)
+    print(f"{len(records)} 次 rerun（{args.trace}）\n")
+    with pd.option_context("display.width", 200):
+        print(summarize(records, args.label).to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
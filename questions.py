@@ -0,0 +1,128 @@
+# 檔案名稱：questions.py
+# 學生決策問題 Top10（從 Keyword 來）
+# 目的：系主任要看到「學生為什麼選/不選」的原文問題類型
+# 「是不是問句」「屬於哪一類」在載入資料時就整欄算好（Is_Question / Question_Category），
+# 一頁式只剩分組計數
+
+import re
+
+import numpy as np
+import pandas as pd
+
+from geo_utils import clip_text
+
+CAT_RULES = {
+    "薪資": ["薪", "薪資", "月薪", "年薪", "起薪", "待遇", "多少錢", "幾萬", "k", "K"],
+    "分數": ["分數", "級分", "錄取", "門檻", "最低", "統測", "繁星", "甄選", "落點", "倍率", "PR"],
+    "學分": ["學分", "課程", "課表", "必修", "選修", "畢業學分", "課程地圖"],
+    "及格率": ["及格率", "通過率", "合格率", "國考", "證照", "考科", "通過", "及格", "合格"],
+    "實習": ["實習", "醫院", "機構", "臨床", "見習", "輪訓"],
+    "出路": ["出路", "工作內容", "好找工作", "就業", "職務", "能做什麼", "職涯"],
+    "生活": ["宿舍", "租屋", "交通", "通勤", "學費", "獎學金", "打工", "生活費"],
+    "社群疑慮": ["dcard", "ptt", "靠北", "心得", "評價", "很累", "爆肝", "後悔", "雷"],
+}
+
+QUESTION_TOKENS = ["嗎", "怎麼", "如何", "要不要", "值得", "好不好", "難不難", "會不會", "適合", "可以"]
+# 也把「X 分數」「X 薪水」這種算問題（決策型）
+DECISION_TOKENS = ["分數", "門檻", "錄取", "薪水", "起薪", "年薪", "國考", "及格率", "學分", "實習"]
+
+
+def _alternation(words, lower=False) -> re.Pattern:
+    """一組關鍵字 → 一條 regex（長的放前面）"""
+    words = sorted({w.lower() if lower else w for w in words}, key=len, reverse=True)
+    return re.compile("|".join(re.escape(w) for w in words))
+
+QUESTION_REGEX = _alternation(QUESTION_TOKENS + DECISION_TOKENS)
+# 每一類一條 regex（比對小寫後的字串）；類別依 CAT_RULES 順序，先中先贏
+CAT_REGEXES = [(cat, _alternation(keys, lower=True)) for cat, keys in CAT_RULES.items()]
+
+
+def categorize_question(q: str):
+    ql = q.lower()
+    for cat, rx in CAT_REGEXES:
+        if rx.search(ql):
+            return cat
+    return "其他"
+
+def looks_like_question(q: str):
+    return bool(QUESTION_REGEX.search(q))
+
+
+# =========================
+# 1) 載入時整欄算好
+# =========================
+def add_question_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Is_Question（bool）、Question_Category（category）"""
+    kw = df["Keyword"].astype(str)
+    df["Is_Question"] = kw.str.contains(QUESTION_REGEX).to_numpy(dtype=bool)
+
+    kl = kw.str.lower()
+    conds = [kl.str.contains(rx).to_numpy(dtype=bool) for _, rx in CAT_REGEXES]
+    cats = [cat for cat, _ in CAT_REGEXES]
+    df["Question_Category"] = pd.Categorical(
+        np.select(conds, cats, default="其他"), categories=cats + ["其他"]
+    )
+    return df
+
+
+# =========================
+# 2) 一頁式：Top10 原句 + 分類占比
+# =========================
+def decision_questions_top10(dept_df: pd.DataFrame):
+    """
+    優先用 Keyword_Source=autocomplete，輸入；再補其他來源
+    （同次數時先出現的排前面，所以 autocomplete 的問句會排在前面）
+    有 Canonical_Keyword（近似重複分群）就依群計數，顯示代表寫法；沒有就依原句
+    """
+    if "Is_Question" not in dept_df.columns or "Question_Category" not in dept_df.columns:
+        dept_df = add_question_columns(dept_df[["Keyword", "Keyword_Source"]].copy())
+
+    src_lower = dept_df["Keyword_Source"].astype(str).str.lower()
+    is_ac = (src_lower == "autocomplete").to_numpy()
+    order = np.concatenate([np.flatnonzero(is_ac), np.flatnonzero(~is_ac)])
+
+    qd = dept_df.iloc[order]
+    qd = qd[qd["Is_Question"].to_numpy(dtype=bool)]
+    q = qd["Keyword"].astype(str).str.strip()
+    keep = (q != "").to_numpy()
+    q = q[keep]
+    cat = qd["Question_Category"].astype(str)[keep]
+    if "Canonical_Keyword" in qd.columns:
+        q = qd["Canonical_Keyword"].astype(str).str.strip()[keep]
+
+    # 頻率（sort=False 保留第一次出現順序 → 同次數時跟 Counter.most_common 一樣）
+    counts = (
+        pd.DataFrame({"Question": q.to_numpy(), "Category": cat.to_numpy()})
+        .groupby("Question", sort=False)
+        .agg(Count=("Category", "size"), Category=("Category", "first"))
+        .sort_values("Count", ascending=False, kind="stable")
+    )
+    top = counts.head(30)
+    if "Canonical_Keyword" in qd.columns:
+        # 群的類別跟著代表寫法走（不是群裡第一筆的）
+        top = top.assign(Category=[categorize_question(x) for x in top.index])
+
+    # Top10 問題（原句）
+    top10 = [
+        {"Question": qq, "Count": int(c), "Category": cc}
+        for qq, c, cc in zip(top.index[:10], top["Count"][:10], top["Category"][:10])
+    ]
+
+    # 分類表：Top30 的次數依類別加總，每類挑第一句當代表
+    cat_tbl = (
+        top.reset_index()
+        .groupby("Category", sort=False)
+        .agg(Count=("Count", "sum"), Example=("Question", "first"))
+        .sort_values("Count", ascending=False, kind="stable")
+        .head(10)
+    )
+    total = int(top["Count"].sum())
+    cat_rows = []
+    for c, cnt, ex in zip(cat_tbl.index, cat_tbl["Count"], cat_tbl["Example"]):
+        cat_rows.append({
+            "Category": c,
+            "Share": round((int(cnt) / total) * 100, 1) if total else 0.0,
+            "Example": clip_text(ex, 80) if ex else "—"
+        })
+
+    return top10, cat_rows
@@ -0,0 +1,235 @@
+# 檔案名稱：url_index.py
+# Top3 網址倒排索引：正規化後的 URL → 哪些列（Department, Keyword, 第幾名）引用它
+# 同一頁常出現在很多關鍵字 / 很多系（例如法規頁、104 職缺頁），深度解析改成「每個不重複頁面只抓 + 解析一次」，
+# 結果再依索引分給每一列；也能列出「被最多列共用的網址」
+# 正規化：scheme / host 小寫（http、https 視為同一頁）、去掉預設 port / fragment / 追蹤參數（utm_*、fbclid…）、
+# 路徑百分比編碼統一、結尾斜線去掉、查詢參數排序；實際抓取用第一次看到的原始網址
+#
+# 用法（命令列）：
+#   python url_index.py                     # 全校最常共用的 20 個網址
+#   python url_index.py --top 50 --college 護理學院
+
+import re
+import sys
+import argparse
+from urllib.parse import parse_qsl, quote, unquote, urlencode, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from geo_utils import domain_of
+
+RANKS = (1, 2, 3)
+CLUE_KEYS = ["salary", "score", "credits", "passrate"]
+_TRACKING = re.compile(r"^(utm_\w+|fbclid|gclid|yclid|msclkid|mc_cid|mc_eid|_ga|srsltid)$", re.I)
+
+
+def normalize_url(url: str) -> str:
+    """同一頁的不同寫法 → 同一個 key；不是 http(s) 連結 → ""（不列入索引）"""
+    u = str(url).strip()
+    if not u.lower().startswith(("http://", "https://")):
+        return ""
+    try:
+        p = urlsplit(u)
+        host = (p.hostname or "").lower().rstrip(".")
+        port = p.port
+    except ValueError:
+        return ""
+    if not host:
+        return ""
+    if port and port not in (80, 443):
+        host = f"{host}:{port}"
+    path = quote(unquote(p.path), safe="/:@!$&'()*+,;=~") or "/"
+    if len(path) > 1:
+        path = path.rstrip("/") or "/"
+    query = sorted((k, v) for k, v in parse_qsl(p.query, keep_blank_values=True) if not _TRACKING.match(k))
+    q = f"?{urlencode(query)}" if query else ""
+    return f"https://{host}{path}{q}"
+
+
+class UrlIndex:
+    """
+    df：整理好的熱表（index = row id）；Rank1~3_Link 全部攤平成 (row, rank, url) 三欄陣列
+    url 編號依第一次出現（逐列 Rank1, Rank2, Rank3）；postings 依 url 排好，查一個網址 = 一段切片
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        cols = [(r, f"Rank{r}_Link") for r in RANKS if f"Rank{r}_Link" in df.columns]
+        n = len(df)
+        self._dept = df["Department"].astype(str).to_numpy() if "Department" in df.columns else np.full(n, "", dtype=object)
+        self._kw = df["Keyword"].astype(str).to_numpy() if "Keyword" in df.columns else np.full(n, "", dtype=object)
+        self._row_ids = df.index.to_numpy()
+
+        if cols and n:
+            raw = np.column_stack([df[c].astype(str).to_numpy(dtype=object) for _, c in cols]).ravel()
+            pos = np.repeat(np.arange(n), len(cols))
+            rank = np.tile(np.array([r for r, _ in cols], dtype=np.int8), n)
+        else:
+            raw = np.zeros(0, dtype=object)
+            pos = np.zeros(0, dtype=np.int64)
+            rank = np.zeros(0, dtype=np.int8)
+
+        # 不同的原始網址沒那麼多：每種只正規化一次
+        uniq_raw, inv = np.unique(raw, return_inverse=True) if len(raw) else (raw, np.zeros(0, dtype=np.int64))
+        norm = np.array([normalize_url(u) for u in uniq_raw], dtype=object)[inv]
+        keep = norm != ""
+        raw, norm, pos, rank = raw[keep], norm[keep], pos[keep], rank[keep]
+
+        codes, self.urls = pd.factorize(norm)
+        self.urls = list(self.urls)
+        self._code = {u: i for i, u in enumerate(self.urls)}
+        # 實際抓取用的原始網址：第一次出現的寫法
+        first = pd.Series(np.arange(len(codes))).groupby(codes).first().to_numpy() if len(codes) else []
+        self.fetch_urls = list(raw[first]) if len(codes) else []
+
+        order = np.argsort(codes, kind="stable")
+        self._ref_code = codes[order].astype(np.int64)
+        self._ref_pos = pos[order]
+        self._ref_rank = rank[order]
+        self._starts = np.searchsorted(self._ref_code, np.arange(len(self.urls) + 1))
+        self.share = np.diff(self._starts)   # 每個網址被幾個 (row, rank) 引用
+
+    def __len__(self) -> int:
+        return len(self.urls)
+
+    def __contains__(self, url) -> bool:
+        return normalize_url(url) in self._code
+
+    # ---- 單一網址 ----
+    def _slice(self, url: str):
+        i = self._code.get(normalize_url(url))
+        if i is None:
+            return slice(0, 0)
+        return slice(self._starts[i], self._starts[i + 1])
+
+    def fetch_url(self, url: str) -> str:
+        """抓這一頁要用的原始網址（沒在索引裡就原樣回傳）"""
+        i = self._code.get(normalize_url(url))
+        return url if i is None else self.fetch_urls[i]
+
+    def refs(self, url: str) -> pd.DataFrame:
+        """引用這個網址的列 → Row_Id / Department / Keyword / Rank"""
+        s = self._slice(url)
+        pos = self._ref_pos[s]
+        return pd.DataFrame({"Row_Id": self._row_ids[pos], "Department": self._dept[pos],
+                             "Keyword": self._kw[pos], "Rank": self._ref_rank[s].astype(int)})
+
+    def share_info(self, url: str) -> dict:
+        """{"rows": 幾列, "departments": 幾系}"""
+        pos = self._ref_pos[self._slice(url)]
+        return {"rows": int(len(np.unique(pos))), "departments": int(len(set(self._dept[pos])))}
+
+    # ---- 範圍 ----
+    def _scope(self, rows=None) -> np.ndarray:
+        """rows：row id 的集合（None = 全部）→ 每個引用是否在範圍內"""
+        if rows is None:
+            return np.ones(len(self._ref_pos), dtype=bool)
+        return np.isin(self._row_ids[self._ref_pos], np.asarray(rows))
+
+    def plan(self, urls=None, rows=None) -> list:
+        """
+        要抓的不重複頁面（正規化網址），被越多列共用的越先抓
+        urls：只排這些網址（原始或正規化都行）；rows：只算這些 row id 的引用
+        """
+        in_scope = self._scope(rows)
+        counts = np.bincount(self._ref_code[in_scope], minlength=len(self.urls))
+        if urls is None:
+            cand = np.flatnonzero(counts)
+        else:
+            cand = np.array(list(dict.fromkeys(i for i in (self._code.get(normalize_url(u)) for u in urls)
+                                               if i is not None)), dtype=np.int64)
+        order = np.lexsort((cand, -counts[cand])) if len(cand) else cand
+        return [self.urls[i] for i in cand[order]]
+
+    def top_shared(self, n=20, rows=None) -> pd.DataFrame:
+        """最常被共用的網址：URL / Domain / Rows / Departments / Best_Rank / Examples"""
+        cols = ["URL", "Domain", "Rows", "Departments", "Best_Rank", "Examples"]
+        in_scope = self._scope(rows)
+        if not in_scope.any():
+            return pd.DataFrame(columns=cols)
+        ref = pd.DataFrame({"code": self._ref_code[in_scope], "pos": self._ref_pos[in_scope],
+                            "rank": self._ref_rank[in_scope]})
+        ref["dept"] = self._dept[ref["pos"].to_numpy()]
+        g = ref.groupby("code", sort=False)
+        out = pd.DataFrame({"Rows": g["pos"].nunique(), "Departments": g["dept"].nunique(),
+                            "Best_Rank": g["rank"].min().astype(int)})
+        out = out.sort_values(["Rows", "Departments"], ascending=False, kind="stable").head(n)
+        pos_by_code = g["pos"]
+        examples = {c: "、".join(list(dict.fromkeys(self._kw[pos_by_code.get_group(c).to_numpy()]))[:3])
+                    for c in out.index}
+        out.insert(0, "URL", [self.fetch_urls[c] for c in out.index])
+        out.insert(1, "Domain", [domain_of(self.urls[c]) for c in out.index])
+        out["Examples"] = [examples[c] for c in out.index]
+        return out[cols].reset_index(drop=True)
+
+    # ---- 結果分給每一列 ----
+    def fan_out(self, results: dict, rows=None) -> pd.DataFrame:
+        """
+        results：{網址（原始或正規化）: parse_competitor_page 結果}
+        → 每列一筆：Row_Id / Department / Keyword / Pages（有抓的 Top3 頁數）/ OK / 各類數字線索筆數 / Max_Share
+        """
+        info_by_code = {}
+        for u, info in results.items():
+            i = self._code.get(normalize_url(u))
+            if i is not None:
+                info_by_code[i] = info
+        cols = ["Row_Id", "Department", "Keyword", "Pages", "OK"] + [f"{k}_clues" for k in CLUE_KEYS] + ["Max_Share"]
+        in_scope = self._scope(rows)
+        sel = np.flatnonzero(in_scope & np.isin(self._ref_code, np.fromiter(info_by_code, dtype=np.int64)))
+        if len(sel) == 0:
+            return pd.DataFrame(columns=cols)
+
+        # 每個頁面只算一次，再依引用展開
+        def page_row(info):
+            ok = info.get("ok") == 1
+            nc = (info.get("number_clues") or {}) if ok else {}
+            return [int(ok)] + [len(nc.get(k, [])) for k in CLUE_KEYS]
+
+        codes = self._ref_code[sel]
+        uniq = np.unique(codes)
+        per_url = pd.DataFrame([page_row(info_by_code[c]) for c in uniq], index=uniq,
+                               columns=["OK"] + [f"{k}_clues" for k in CLUE_KEYS])
+        ref = per_url.loc[codes].reset_index(drop=True)
+        ref["pos"] = self._ref_pos[sel]
+        ref["Pages"] = 1
+        ref["Max_Share"] = self.share[codes]
+        agg = {c: "sum" for c in ["Pages", "OK"] + [f"{k}_clues" for k in CLUE_KEYS]}
+        agg["Max_Share"] = "max"
+        out = ref.groupby("pos", sort=True).agg(agg)
+        pos = out.index.to_numpy()
+        out.insert(0, "Row_Id", self._row_ids[pos])
+        out.insert(1, "Department", self._dept[pos])
+        out.insert(2, "Keyword", self._kw[pos])
+        return out[cols].reset_index(drop=True)
+
+    def stats(self, rows=None) -> dict:
+        in_scope = self._scope(rows)
+        refs = int(in_scope.sum())
+        unique = int(len(np.unique(self._ref_code[in_scope])))
+        return {"references": refs, "unique_pages": unique,
+                "dedup_ratio": round(refs / unique, 2) if unique else 0.0}
+
+
+def main(argv=None):
+    from data_loader import DATA_FILE, load_school_data
+
+    ap = argparse.ArgumentParser(description="Top3 網址倒排索引：最常共用的網址")
+    ap.add_argument("--csv", default=DATA_FILE)
+    ap.add_argument("--college", default=None)
+    ap.add_argument("--top", type=int, default=20)
+    args = ap.parse_args(argv)
+
+    df, _ = load_school_data(args.csv)
+    idx = UrlIndex(df)
+    rows = None
+    if args.college is not None:
+        rows = df.index[df["College"].astype(str) == args.college].to_numpy()
+    s = idx.stats(rows)
+    print(f"{s['references']} 個 Top3 引用 → {s['unique_pages']} 個不重複頁面（平均每頁 {s['dedup_ratio']} 次）\n")
+    with pd.option_context("display.max_colwidth", 80, "display.width", 200):
+        print(idx.top_shared(args.top, rows).to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())